@@ -1,33 +1,69 @@
+import sqlite3
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
 from flask_migrate import Migrate
 from flask_cors import CORS
 from config import Config
+from app.routing import RoutingSession
+from app.json_provider import JSONProvider
 
 # Base class for models
 class Base(DeclarativeBase):
     pass
 
 # Initialize the database and migration instances
-db = SQLAlchemy(model_class=Base)
+# The routing session sends GET reads to the replica bind (if configured) and writes to the primary
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 migrate = Migrate()
 
-def create_app():
+# Origins allowed to call the API from a browser
+CORS_ORIGINS = "http://localhost:3000"
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """
+    SQLite ignores foreign keys (and ON DELETE CASCADE) unless enabled on each connection.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+def create_app(config=Config):
     """
     Factory function to create and configure the Flask application.
 
+    Args:
+        config (object, optional): The configuration object to load. Defaults to Config from config.py.
+
     Returns:
         app: The configured Flask application instance.
     """
     app = Flask(__name__)
-    app.config.from_object(Config)  # Configurations loaded from config.py
-    CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})  # Enable CORS for specific routes
+    app.config.from_object(config)  # Configurations loaded from config.py by default
+    app.json = JSONProvider(app)  # Decimal prices as numbers and dates in ISO format
+    CORS(app, resources={r"/api/*": {"origins": CORS_ORIGINS}})  # Enable CORS for specific routes
 
     # Initialize the extensions
     db.init_app(app)  # Set up the database
     migrate.init_app(app, db)  # Set up migration
 
+    from app import routing, soft_delete
+    from app.idempotency import decorators as idempotency
+    from app.profiling import profiler, slow_queries
+    from app.throttling import limiter, shedding
+    shedding.init_app(app)  # Answer 503 while the database pool is saturated
+    limiter.init_app(app)  # Limit each client (token subject or IP) to the budget of the route
+    with app.app_context():
+        slow_queries.init_app(app, db.engines.values())  # Time every statement and log the slow ones
+    profiler.init_app(app)  # Profile sampled or ADMIN-requested requests (opt-in with PROFILING_ENABLED)
+    routing.init_app(app)  # Route GET reads to the replica and writes to the primary
+    soft_delete.init_app(app)  # Register the purge command for soft-deleted rows
+    idempotency.init_app(app)  # Register the prune command for expired idempotency keys
+
     # Importing models for use in the app
     from app.users.models import User
     from app.category.models import Category
@@ -35,6 +71,15 @@ def create_app():
     from app.company.models import Company
     from app.product.models import Product
     from app.order.models import Order
+    from app.changes.models import Change
+    from app.stats.models import CompanyStats, CategoryStats
+    from app.analytics.models import AnalyticsVersion
+    from app.imports.models import ImportJob, ImportRowError
+    from app.email.models import EmailJob
+    from app.idempotency.models import IdempotencyKey
+    from app.warehouse.models import Warehouse, StockLocation
+    from app.ledger.models import StockMovement, StockRollup
+    from app.reports.models import ReportSubscription
 
     # Importing controllers (blueprints) for routing
     from app.users.user_controller import user_bp
@@ -44,6 +89,17 @@ def create_app():
     from app.client.client_controller import client_bp
     from app.product.product_controller import product_bp
     from app.email.email_controller import email_bp
+    from app.changes.changes_controller import changes_bp
+    from app.stock.stock_controller import stock_bp
+    from app.analytics.analytics_controller import analytics_bp
+    from app.stats.stats_controller import stats_bp
+    from app.imports.imports_controller import imports_bp
+    from app.warehouse.warehouse_controller import warehouse_bp
+    from app.ledger.ledger_controller import ledger_bp
+    from app.profiling.profiling_controller import profiling_bp
+    from app.profiling.queries_controller import queries_bp
+    from app.batch.batch_controller import batch_bp
+    from app.reports.reports_controller import reports_bp
     
     # Registering the blueprints with the app
     app.register_blueprint(user_bp)
@@ -53,9 +109,28 @@ def create_app():
     app.register_blueprint(client_bp) 
     app.register_blueprint(product_bp)
     app.register_blueprint(email_bp)
+    app.register_blueprint(changes_bp)
+    app.register_blueprint(stock_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(stats_bp)
+    app.register_blueprint(imports_bp)
+    app.register_blueprint(warehouse_bp)
+    app.register_blueprint(ledger_bp)
+    app.register_blueprint(profiling_bp)
+    app.register_blueprint(queries_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(reports_bp)
 
     # Create all the tables defined by models
     with app.app_context(): 
         db.create_all()
 
+        # A local replica (e.g. a second SQLite file) needs the same schema to be readable
+        replica = db.engines.get(app.config['SQLALCHEMY_REPLICA_BIND'])
+        if replica is not None and replica.dialect.name == 'sqlite':
+            db.metadata.create_all(replica)
+
+    from app.reports import scheduler
+    scheduler.init_app(app)  # Send the scheduled reports from this process (opt-in with REPORTS_SCHEDULER_ENABLED)
+
     return app
@@ -0,0 +1,92 @@
+from flask import Blueprint, current_app, request, jsonify
+from app.analytics.inventory import get_inventory_partitions
+from app.product.models import cents_to_price
+
+# Maximum number of most valuable products returned
+MAX_TOP = 100
+
+# Maximum number of low-stock products returned per company
+LOW_STOCK_LIMIT = 100
+
+# Blueprint for the analytics endpoints
+analytics_bp = Blueprint('analytics_controller', __name__, url_prefix='/api/analytics')
+
+
+def _with_price(totals):
+    """
+    Adds the value in currency units next to each amount in cents.
+    """
+    totals = dict(totals)
+    for key in [key for key in totals if key.endswith('_cents')]:
+        totals[key[:-len('_cents')]] = cents_to_price(totals[key])
+    return totals
+
+
+# Get the inventory analytics
+@analytics_bp.route('/inventory', methods=['GET'])
+def get_inventory_analytics():
+    """
+    Returns the inventory value and stock alerts per company and per category.
+
+    The aggregates are computed per company with SQL GROUP BY and window
+    functions and cached for ANALYTICS_CACHE_SECONDS (0 disables the cache).
+    When products change, only the companies they belong to are recomputed.
+
+    Query parameters:
+        threshold (int, optional): Reorder level of products without their own
+            'reorder_level'. Defaults to LOW_STOCK_THRESHOLD (10).
+        top (int, optional): The number of most valuable products, up to MAX_TOP. Defaults to 10.
+        company_nit (str, optional): Restricts the analytics to one company.
+
+    Returns:
+        JSON response with the totals, per-company and per-category values,
+        the low-stock products and the top products by value.
+    """
+    threshold = request.args.get('threshold', current_app.config.get('LOW_STOCK_THRESHOLD', 10), type=int)
+    top = min(request.args.get('top', 10, type=int), MAX_TOP)
+    nit = request.args.get('company_nit')
+    if threshold < 0 or top < 1:
+        return jsonify({'error': 'threshold must be non-negative and top positive'}), 400
+
+    partitions = get_inventory_partitions(
+        threshold, top, LOW_STOCK_LIMIT,
+        ttl=current_app.config.get('ANALYTICS_CACHE_SECONDS', 300),
+        nit=nit
+    )
+    if nit is not None and not partitions:
+        return jsonify({'error': 'Company not found'}), 404
+
+    # Merge the companies' partitions
+    totals = {'product_count': 0, 'total_quantity': 0, 'total_value_cents': 0, 'low_stock_count': 0}
+    categories = {}
+    for partition in partitions:
+        for key in totals:
+            totals[key] += partition['company'][key]
+        for category in partition['categories']:
+            merged = categories.setdefault(category['id'], {
+                'id': category['id'], 'name': category['name'],
+                'product_count': 0, 'total_quantity': 0, 'total_value_cents': 0
+            })
+            for key in ('product_count', 'total_quantity', 'total_value_cents'):
+                merged[key] += category[key]
+
+    top_by_value = sorted(
+        (product for partition in partitions for product in partition['top_by_value']),
+        key=lambda product: (-product['value_cents'], product['id'])
+    )[:top]
+    low_stock = sorted(
+        (product for partition in partitions for product in partition['low_stock']),
+        key=lambda product: (-product['shortage'], product['id'])
+    )
+
+    return jsonify({
+        'threshold': threshold,
+        'totals': _with_price(totals),
+        'companies': [_with_price(partition['company']) for partition in partitions],
+        'categories': [
+            _with_price(category)
+            for category in sorted(categories.values(), key=lambda category: -category['total_value_cents'])
+        ],
+        'low_stock': low_stock,
+        'top_by_value': [_with_price(product) for product in top_by_value]
+    }), 200
@@ -0,0 +1,274 @@
+from sqlalchemy import event, inspect
+from app import db
+from app.cache import cache
+from app.analytics.models import ALL_COMPANIES, AnalyticsVersion
+from app.routing import RoutingSession
+from app.category.models import Category
+from app.company.models import Company
+from app.product.models import Product, product_category
+
+# Tables whose changes can alter the analytics
+ANALYTICS_TABLES = ('products', 'product_category', 'categories', 'companies')
+
+
+def _threshold(threshold):
+    """
+    The reorder level of a product: its own, or the global threshold.
+    """
+    return db.func.coalesce(Product.reorder_level, threshold)
+
+
+def _value():
+    """
+    The stock value of a product in cents.
+    """
+    return Product.price_cents * Product.quantity
+
+
+def _company_totals(nits, threshold):
+    """
+    Product count, quantity, value and low-stock count of each company.
+    """
+    query = (
+        db.select(
+            Product.company_nit,
+            db.func.count(Product.id).label('product_count'),
+            db.func.sum(Product.quantity).label('total_quantity'),
+            db.func.sum(_value()).label('total_value_cents'),
+            db.func.sum(db.case((Product.quantity < _threshold(threshold), 1), else_=0)).label('low_stock_count')
+        )
+        .where(Product.company_nit.in_(nits))
+        .group_by(Product.company_nit)
+    )
+    return {row.company_nit: row._asdict() for row in db.session.execute(query)}
+
+
+def _category_totals(nits):
+    """
+    Product count, quantity and value of each (company, category) pair.
+    """
+    query = (
+        db.select(
+            Product.company_nit,
+            Category.id,
+            Category.name,
+            db.func.count(Product.id).label('product_count'),
+            db.func.sum(Product.quantity).label('total_quantity'),
+            db.func.sum(_value()).label('total_value_cents')
+        )
+        .join(product_category, product_category.c.product_id == Product.id)
+        .join(Category, Category.id == product_category.c.category_id)
+        .where(Product.company_nit.in_(nits))
+        .group_by(Product.company_nit, Category.id, Category.name)
+    )
+    return db.session.execute(query).all()
+
+
+def _top_by_value(nits, top):
+    """
+    The `top` most valuable products of each company, with their share of the company's value.
+    """
+    ranked = (
+        db.select(
+            Product.id,
+            Product.code,
+            Product.name,
+            Product.company_nit,
+            Product.price_cents,
+            Product.quantity,
+            _value().label('value_cents'),
+            db.func.row_number().over(
+                partition_by=Product.company_nit, order_by=(_value().desc(), Product.id)
+            ).label('company_rank'),
+            db.func.sum(_value()).over(partition_by=Product.company_nit).label('company_value_cents')
+        )
+        .where(Product.company_nit.in_(nits))
+        .subquery()
+    )
+    query = db.select(ranked).where(ranked.c.company_rank <= top).order_by(ranked.c.value_cents.desc())
+    return db.session.execute(query).all()
+
+
+def _low_stock(nits, threshold, limit):
+    """
+    Up to `limit` products per company below their reorder level, largest shortage first.
+    """
+    level = _threshold(threshold)
+    ranked = (
+        db.select(
+            Product.id,
+            Product.code,
+            Product.name,
+            Product.company_nit,
+            Product.quantity,
+            level.label('reorder_level'),
+            (level - Product.quantity).label('shortage'),
+            db.func.row_number().over(
+                partition_by=Product.company_nit, order_by=((level - Product.quantity).desc(), Product.id)
+            ).label('company_rank')
+        )
+        .where(Product.company_nit.in_(nits), Product.quantity < level)
+        .subquery()
+    )
+    query = db.select(ranked).where(ranked.c.company_rank <= limit).order_by(ranked.c.shortage.desc())
+    return db.session.execute(query).all()
+
+
+def _compute(companies, threshold, top, low_stock_limit):
+    """
+    Computes the analytics of some companies with one query per section.
+
+    Args:
+        companies (dict): NIT -> name of the companies to compute.
+
+    Returns:
+        dict: NIT -> the company's partition of the analytics.
+    """
+    nits = list(companies)
+    totals = _company_totals(nits, threshold)
+    partitions = {
+        nit: {
+            'company': {
+                'nit': nit,
+                'name': name,
+                'product_count': totals.get(nit, {}).get('product_count', 0),
+                'total_quantity': totals.get(nit, {}).get('total_quantity') or 0,
+                'total_value_cents': totals.get(nit, {}).get('total_value_cents') or 0,
+                'low_stock_count': totals.get(nit, {}).get('low_stock_count') or 0
+            },
+            'categories': [],
+            'top_by_value': [],
+            'low_stock': []
+        } for nit, name in companies.items()
+    }
+    for row in _category_totals(nits):
+        partitions[row.company_nit]['categories'].append({
+            'id': row.id,
+            'name': row.name,
+            'product_count': row.product_count,
+            'total_quantity': row.total_quantity,
+            'total_value_cents': row.total_value_cents
+        })
+    for row in _top_by_value(nits, top):
+        partitions[row.company_nit]['top_by_value'].append({
+            'id': row.id,
+            'code': row.code,
+            'name': row.name,
+            'company_nit': row.company_nit,
+            'price_cents': row.price_cents,
+            'quantity': row.quantity,
+            'value_cents': row.value_cents,
+            'share_of_company': row.value_cents / row.company_value_cents if row.company_value_cents else 0
+        })
+    for row in _low_stock(nits, threshold, low_stock_limit):
+        partitions[row.company_nit]['low_stock'].append({
+            'id': row.id,
+            'code': row.code,
+            'name': row.name,
+            'company_nit': row.company_nit,
+            'quantity': row.quantity,
+            'reorder_level': row.reorder_level,
+            'shortage': row.shortage
+        })
+    return partitions
+
+
+def get_inventory_partitions(threshold, top, low_stock_limit, ttl, nit=None):
+    """
+    Returns the analytics of every company (or one), recomputing only the
+    companies whose products changed since they were cached (see `AnalyticsVersion`).
+
+    Args:
+        threshold (int): Reorder level of the products without their own.
+        top (int): The number of most valuable products kept per company.
+        low_stock_limit (int): The maximum number of low-stock products kept per company.
+        ttl (float): Seconds a company's analytics stay cached.
+        nit (str, optional): Restricts the result to one company.
+
+    Returns:
+        list[dict]: One partition per company, in NIT order.
+    """
+    query = db.select(Company.nit, Company.name).order_by(Company.nit)
+    if nit is not None:
+        query = query.where(Company.nit == nit)
+    companies = dict(db.session.execute(query).all())
+
+    # One entry per company and parameters, holding the version it was computed at.
+    # The versions are read from the database, so a change committed by any worker is seen
+    current = AnalyticsVersion.get_versions(companies)
+    partitions = {}
+    for company_nit in companies:
+        entry = cache.get(('inventory_analytics', company_nit, threshold, top, low_stock_limit))
+        if entry is not None and entry[0] == current[company_nit]:
+            partitions[company_nit] = entry[1]
+    stale = {company_nit: name for company_nit, name in companies.items() if company_nit not in partitions}
+    if stale:
+        computed = _compute(stale, threshold, top, low_stock_limit)
+        for company_nit, partition in computed.items():
+            partitions[company_nit] = partition
+            if ttl > 0:
+                key = ('inventory_analytics', company_nit, threshold, top, low_stock_limit)
+                cache.set(key, (current[company_nit], partition), ttl)
+    return [partitions[company_nit] for company_nit in companies]
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def collect_changed_companies(session, flush_context):
+    """
+    Collects the companies whose analytics are affected by the flushed rows.
+    """
+    changed = session.info.setdefault('analytics_changed', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table == 'products':
+            history = inspect(instance).attrs.company_nit.history
+            changed.update(nit for nit in (*history.deleted, instance.company_nit) if nit is not None)
+        elif table == 'companies':
+            changed.add(instance.nit)
+        elif table == 'categories':
+            session.info['analytics_changed_all'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def collect_bulk_changes(execute_state):
+    """
+    Collects the companies a set-based write to the analytics tables changes.
+
+    The affected rows are never loaded, so the companies come from the `stats`
+    execution option the writer declares (see `app.stats.models`); a write that
+    declares none (e.g. category changes) marks every company as changed.
+    Purges only remove rows that are already excluded.
+    """
+    if execute_state.execution_options.get('purge'):
+        return
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        table = getattr(execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in ANALYTICS_TABLES:
+            nits = (execute_state.execution_options.get('stats') or {}).get('companies')
+            if nits:
+                execute_state.session.info.setdefault('analytics_changed', set()).update(nits)
+            else:
+                execute_state.session.info['analytics_changed_all'] = True
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def bump_changed_companies(session):
+    """
+    Bumps the analytics versions of the changed companies inside the committing
+    transaction, so the cached analytics are invalidated in every worker exactly
+    when the changes become visible.
+    """
+    session.flush()
+    changed = session.info.pop('analytics_changed', set())
+    if session.info.pop('analytics_changed_all', False):
+        changed = {ALL_COMPANIES}
+    AnalyticsVersion.bump(nit for nit in changed if nit is not None)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def discard_changed_companies(session):
+    """
+    Forgets the changes of a rolled back transaction.
+    """
+    session.info.pop('analytics_changed', None)
+    session.info.pop('analytics_changed_all', None)
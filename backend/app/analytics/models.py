@@ -0,0 +1,80 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+
+# Key of the version that makes the analytics of every company stale
+ALL_COMPANIES = '*'
+
+
+class AnalyticsVersion(db.Model):
+    """
+    Version of the cached analytics of a company, or of all of them (ALL_COMPANIES).
+
+    The versions are bumped in the same transaction as the changes, so every
+    worker process sees a change as soon as it is committed and stops serving
+    the analytics it cached before.
+
+    Attributes:
+        key (str): The company NIT, or ALL_COMPANIES (primary key).
+        version (int): Incremented on every committed change of the company.
+    """
+    __tablename__ = 'analytics_versions'
+
+    key = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        """
+        String representation of the version.
+        """
+        return f'<AnalyticsVersion {self.key} {self.version}>'
+
+    @classmethod
+    def get_versions(cls, nits):
+        """
+        Returns the (all companies, company) version pair of each company.
+
+        Args:
+            nits (iterable): The NITs of the companies.
+
+        Returns:
+            dict: NIT -> (global version, company version); 0 for versions never bumped.
+        """
+        nits = list(nits)
+        rows = dict(db.session.execute(
+            db.select(cls.key, cls.version).where(cls.key.in_([ALL_COMPANIES, *nits]))
+        ).all())
+        everything = rows.get(ALL_COMPANIES, 0)
+        return {nit: (everything, rows.get(nit, 0)) for nit in nits}
+
+    @classmethod
+    def bump(cls, keys):
+        """
+        Increments the versions of some companies (or ALL_COMPANIES) in the current transaction.
+
+        The rows are written in key order so concurrent transactions lock them in the same order.
+
+        Args:
+            keys (iterable): The NITs, and/or ALL_COMPANIES.
+        """
+        rows = [{'key': key, 'version': 1} for key in sorted(keys)]
+        if not rows:
+            return
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert(cls.__table__)
+            db.session.execute(insert.on_conflict_do_update(
+                index_elements=['key'],
+                set_={'version': cls.__table__.c.version + 1}
+            ), rows)
+        else:
+            # Databases without ON CONFLICT create the missing rows first
+            existing = set(db.session.scalars(db.select(cls.key).where(cls.key.in_([row['key'] for row in rows]))))
+            db.session.execute(
+                db.update(cls.__table__)
+                .where(cls.key == db.bindparam('match_key'))
+                .values(version=cls.__table__.c.version + 1),
+                [{'match_key': row['key']} for row in rows if row['key'] in existing]
+            )
+            created = [row for row in rows if row['key'] not in existing]
+            if created:
+                db.session.execute(cls.__table__.insert(), created)
@@ -0,0 +1,7 @@
+from app import create_app
+from app.async_api import AsyncAPI
+
+app = create_app()
+
+# ASGI entry point: async product and company reads, everything else served by Flask
+application = AsyncAPI(app)
@@ -0,0 +1,364 @@
+import asyncio
+import time
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from app import CORS_ORIGINS
+from app.coalesce import COALESCED_HEADER
+from app.routing import STICKY_COOKIE, is_client_pinned
+from app.auth.decorators import client_key, decode_token
+from app.throttling import limiter, shedding
+from app.company.models import Company
+from app.product.models import Product
+
+# Async driver used for each database backend
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def to_async_url(url):
+    """
+    Converts a synchronous database URL to the matching asyncio driver.
+
+    Args:
+        url (str): A URL such as 'postgresql://...' or 'sqlite:///app.db'.
+
+    Returns:
+        URL: The same database with an async driver, e.g. 'postgresql+asyncpg://...'.
+    """
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def _product(product):
+    """
+    Serializes a product with the same fields as the synchronous product routes.
+    """
+    return {
+        'id': product.id,
+        'code': product.code,
+        'name': product.name,
+        'description': product.description,
+        'price': product.price,
+        'quantity': product.quantity,
+        'company_nit': product.company_nit,
+        'company_name': product.company.name
+    }
+
+
+def _company(company):
+    """
+    Serializes a company with the same fields as the synchronous company routes.
+    """
+    return {
+        'nit': company.nit,
+        'name': company.name,
+        'address': company.address,
+        'phone': company.phone
+    }
+
+
+def _active_products():
+    """
+    Builds the query of active products with their company loaded in the same statement.
+    """
+    return (
+        select(Product)
+        .options(joinedload(Product.company))
+        .where(Product.deleted_at.is_(None))
+        .order_by(Product.id)
+    )
+
+
+async def get_all_products(session):
+    products = (await session.scalars(_active_products())).all()
+    if not products:
+        return HTTPStatus.NOT_FOUND, {'error': 'No products found'}
+    return HTTPStatus.OK, [_product(product) for product in products]
+
+
+async def get_product(session, product_id):
+    product = await session.scalar(_active_products().where(Product.id == int(product_id)))
+    if product is None:
+        return HTTPStatus.NOT_FOUND, {'error': 'Product not found'}
+    return HTTPStatus.OK, _product(product)
+
+
+async def get_all_companies(session):
+    companies = (await session.scalars(select(Company).where(Company.deleted_at.is_(None)))).all()
+    if not companies:
+        return HTTPStatus.NOT_FOUND, {'error': 'No companies found'}
+    return HTTPStatus.OK, [_company(company) for company in companies]
+
+
+async def get_company(session, nit):
+    company = await session.scalar(select(Company).where(Company.nit == nit, Company.deleted_at.is_(None)))
+    if company is None:
+        return HTTPStatus.NOT_FOUND, {'error': 'Company not found'}
+    return HTTPStatus.OK, _company(company)
+
+
+async def get_products_for_company(session, nit):
+    company = await session.scalar(select(Company).where(Company.nit == nit, Company.deleted_at.is_(None)))
+    if company is None:
+        return HTTPStatus.NOT_FOUND, {'error': 'Company not found'}
+    products = (await session.scalars(_active_products().where(Product.company_nit == nit))).all()
+    return HTTPStatus.OK, [_product(product) for product in products]
+
+
+# Read routes served natively by the async mode, by the endpoint of the Flask route they replace.
+# Requests are matched with the Flask URL map, so a path that Flask routes elsewhere
+# (e.g. GET /api/companies/valuation) keeps reaching Flask.
+ENDPOINTS = {
+    'product_controller.get_all_products': get_all_products,
+    'product_controller.get_product': get_product,
+    'company_controller.get_all_companies': get_all_companies,
+    'company_controller.get_products_for_company': get_products_for_company,
+    'company_controller.get_company': get_company,
+}
+
+# Hot list routes whose concurrent identical requests share one query (see `app.coalesce`)
+COALESCED_HANDLERS = (get_all_products, get_products_for_company)
+
+# List routes whose multi-get parameter (`app.multi_get`) is resolved by the Flask app
+MULTI_GET_PARAMS = {get_all_products: 'ids', get_all_companies: 'nits'}
+
+
+class AsyncAPI:
+    """
+    ASGI application that serves the product and company read routes with
+    SQLAlchemy's asyncio extension and hands every other request to the Flask app.
+
+    A slow read then only holds a coroutine instead of a whole worker. Reads
+    use the replica bind when one is configured, with the same read-your-writes
+    cookie as the synchronous routing session, and go through the same load
+    shedding and rate limits as the Flask routes (`app.throttling`), whose
+    before_request hooks they skip. The waits for async connections feed the
+    same pool wait monitor.
+
+    Configuration:
+        SQLALCHEMY_ASYNC_DATABASE_URI (str, optional): Async URL of the primary database.
+            Derived from SQLALCHEMY_DATABASE_URI when not set.
+        SQLALCHEMY_ASYNC_POOL_SIZE (int): Connections per async engine. Defaults to 10.
+    """
+
+    def __init__(self, flask_app):
+        """
+        Wraps a Flask application.
+
+        Args:
+            flask_app (Flask): The application created by `create_app`.
+        """
+        missing = set(ENDPOINTS) - set(flask_app.view_functions)
+        if missing:
+            raise RuntimeError(f'Async routes without a Flask route: {", ".join(sorted(missing))}')
+        self.flask_app = flask_app
+        self.urls = flask_app.url_map.bind('localhost')
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.sessions = None
+        self.in_flight = {}
+
+    def _create_sessions(self):
+        """
+        Creates one async session factory per bind (the primary and, if configured, the replica).
+        """
+        config = self.flask_app.config
+        urls = {None: config.get('SQLALCHEMY_ASYNC_DATABASE_URI') or to_async_url(config['SQLALCHEMY_DATABASE_URI'])}
+        replica_bind = config['SQLALCHEMY_REPLICA_BIND']
+        if replica_bind in config.get('SQLALCHEMY_BINDS', {}):
+            urls[replica_bind] = to_async_url(config['SQLALCHEMY_BINDS'][replica_bind])
+
+        sessions = {}
+        for bind, url in urls.items():
+            options = {}
+            if make_url(url).database not in (None, '', ':memory:'):
+                options = {'pool_size': config.get('SQLALCHEMY_ASYNC_POOL_SIZE', 10)}
+            engine = create_async_engine(url, **options)
+            sessions[bind] = async_sessionmaker(engine, expire_on_commit=False)
+        return sessions
+
+    def _client_key(self, scope, headers):
+        """
+        Identifies the client like `app.auth.decorators.get_client_key`: by its token's subject or its IP.
+        """
+        claims = decode_token(headers.get(b'authorization', b'').decode('latin-1'))
+        return client_key(claims.get('sub') if claims else None, (scope.get('client') or (None,))[0])
+
+    def _is_pinned(self, scope, headers):
+        """
+        Whether the client wrote recently, like `routing.route_request`.
+        """
+        cookie = SimpleCookie(headers.get(b'cookie', b'').decode('latin-1'))
+        cookie_value = cookie[STICKY_COOKIE].value if STICKY_COOKIE in cookie else None
+        return is_client_pinned(self.flask_app, self._client_key(scope, headers), cookie_value)
+
+    def _session_for(self, pinned):
+        """
+        Picks the replica, if configured, unless the client is pinned to the primary.
+        """
+        replica = self.sessions.get(self.flask_app.config['SQLALCHEMY_REPLICA_BIND'])
+        if replica is None or pinned:
+            return self.sessions[None]
+        return replica
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            endpoint, args = self._match(scope['path'])
+            handler = ENDPOINTS.get(endpoint)
+            if handler is not None:
+                query = parse_qs(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+                if MULTI_GET_PARAMS.get(handler) not in query:
+                    await self._handle(scope, send, endpoint, handler, args)
+                    return
+
+        await self.wsgi(scope, receive, send)
+
+    def _match(self, path):
+        """
+        The Flask endpoint and view arguments of a GET to `path`, or (None, None)
+        if Flask would not serve it directly (unknown route or redirect).
+        """
+        try:
+            return self.urls.match(path, method='GET')
+        except HTTPException:
+            return None, None
+
+    async def _lifespan(self, receive, send):
+        """
+        Creates the async engines at startup and closes their connections at shutdown.
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.sessions = self._create_sessions()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for factory in self.sessions.values():
+                    await factory.kw['bind'].dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _render(self, factory, handler, args):
+        """
+        Runs an async read handler in a new session and serializes its response.
+
+        Returns:
+            tuple: (status, JSON payload as bytes).
+        """
+        async with factory() as session:
+            # Check out the connection first so its wait feeds the load shedder like the synchronous sessions
+            started = time.perf_counter()
+            await session.connection()
+            shedding.monitor.observe(time.perf_counter() - started)
+            status, body = await handler(session, **args)
+        return status, self.flask_app.json.dumps(body).encode()
+
+    def _overloaded(self, message, response_headers):
+        """
+        503 response asking the client to come back after LOAD_SHED_RETRY_AFTER seconds, like `shedding._overloaded`.
+        """
+        retry_after = self.flask_app.config.get('LOAD_SHED_RETRY_AFTER', 2)
+        response_headers.append((b'retry-after', str(retry_after).encode()))
+        return HTTPStatus.SERVICE_UNAVAILABLE, {'error': message, 'retry_after': retry_after}
+
+    def _admit(self, scope, headers, endpoint, response_headers):
+        """
+        Applies the load shedding and the rate limit of the Flask route `endpoint`,
+        in the order of its before_request hooks, adding the rate limit headers to
+        `response_headers`.
+
+        Returns:
+            tuple: The (status, body) of the 503 or 429 response, or None if the request may run.
+        """
+        if self.flask_app.config.get('LOAD_SHED_ENABLED', True) and shedding.pool_saturated(self.flask_app):
+            return self._overloaded('Service overloaded, database connections are busy', response_headers)
+        if 'ratelimit' not in self.flask_app.extensions:
+            return None
+
+        taken = limiter.take_token(self.flask_app, endpoint, endpoint.rpartition('.')[0] or None,
+                                   self._client_key(scope, headers))
+        if taken is None:
+            return None
+        allowed, capacity, tokens, rate = taken
+        response_headers += [(b'x-ratelimit-limit', str(capacity).encode()),
+                             (b'x-ratelimit-remaining', str(int(tokens)).encode())]
+        if allowed:
+            return None
+        seconds = limiter.retry_after(tokens, rate)
+        response_headers.append((b'retry-after', str(seconds).encode()))
+        return HTTPStatus.TOO_MANY_REQUESTS, {'error': 'Too many requests', 'retry_after': seconds}
+
+    def _check_client(self, scope, headers, endpoint, response_headers):
+        """
+        Admits the request (see `_admit`) and, if admitted, tells whether its client is pinned to the primary.
+
+        The limiter and pin stores may be on Redis, so this runs in a worker thread
+        to keep their round trips out of the event loop.
+
+        Returns:
+            tuple: (the (status, body) of the rejection or None, pinned).
+        """
+        rejected = self._admit(scope, headers, endpoint, response_headers)
+        return rejected, rejected is None and self._is_pinned(scope, headers)
+
+    async def _handle(self, scope, send, endpoint, handler, args):
+        """
+        Runs an async read handler and sends its JSON response.
+        """
+        if self.sessions is None:
+            self.sessions = self._create_sessions()
+
+        headers = dict(scope['headers'])
+        response_headers = []
+        shared = False
+        rejected, pinned = await asyncio.to_thread(self._check_client, scope, headers, endpoint, response_headers)
+        if rejected is not None:
+            status, payload = rejected[0], self.flask_app.json.dumps(rejected[1]).encode()
+        else:
+            factory = self._session_for(pinned)
+            try:
+                if handler in COALESCED_HANDLERS and not pinned and self.flask_app.config.get('COALESCE_ENABLED', True):
+                    # Identical requests arriving while one is running await its task instead of querying again
+                    # (not those of pinned clients, which must see their own writes)
+                    key = (scope['path'], factory)  # The coalesced handlers read no query arguments
+                    task = self.in_flight.get(key)
+                    shared = task is not None
+                    if task is None:
+                        task = self.in_flight[key] = asyncio.ensure_future(self._render(factory, handler, args))
+                        task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+                    # Shielded so a client that disconnects doesn't cancel the query the others wait for
+                    status, payload = await asyncio.shield(task)
+                else:
+                    status, payload = await self._render(factory, handler, args)
+            except PoolTimeoutError:
+                # Like `shedding.handle_pool_timeout`: giving up on a connection is an overload
+                shedding.monitor.observe(self.flask_app.config.get('LOAD_SHED_WAIT_MS', 500) / 1000 * 2)
+                status, body = self._overloaded('Service overloaded, no database connection available',
+                                                response_headers)
+                payload = self.flask_app.json.dumps(body).encode()
+
+        response_headers += [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+        ]
+        if shared:
+            response_headers.append((COALESCED_HEADER.lower().encode(), b'true'))
+        origin = headers.get(b'origin', b'').decode('latin-1')
+        if origin and origin == CORS_ORIGINS:
+            response_headers += [(b'access-control-allow-origin', origin.encode()), (b'vary', b'Origin')]
+
+        await send({'type': 'http.response.start', 'status': int(status), 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else payload})
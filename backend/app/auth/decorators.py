@@ -0,0 +1,95 @@
+from functools import wraps
+import jwt
+from flask import g, request, jsonify
+from app.auth.auth_controller import SECRET_KEY
+from app.users.models import RoleEnum
+
+
+def decode_token(authorization):
+    """
+    Decodes an `Authorization: Bearer <token>` header value.
+
+    Returns:
+        dict: The token's claims, or None if the header is missing or the token is invalid or expired.
+    """
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    try:
+        return jwt.decode(token.strip(), SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+
+
+def get_token_claims():
+    """
+    Decodes the request's `Authorization: Bearer <token>` header, once per request.
+
+    Returns:
+        dict: The token's claims, or None if the header is missing or the token is invalid or expired.
+    """
+    if 'token_claims' not in g:
+        g.token_claims = decode_token(request.headers.get('Authorization'))
+    return g.token_claims
+
+
+def get_token_subject():
+    """
+    The subject (the user's email) of the request's token, or None without a valid token.
+    """
+    claims = get_token_claims()
+    return claims.get('sub') if claims else None
+
+
+def client_key(subject, remote_addr):
+    """
+    Identifies a client: by the subject of its token, or by its IP address without a valid token.
+    """
+    if subject:
+        return f'user:{subject}'
+    return f'ip:{remote_addr}'
+
+
+def get_client_key():
+    """
+    Identifies the client of the request (see `client_key`).
+    """
+    return client_key(get_token_subject(), request.remote_addr)
+
+
+def get_token_roles():
+    """
+    Reads the roles of the user from the request's `Authorization: Bearer <token>` header.
+
+    Returns:
+        set: The user's roles, or None if the header is missing or the token is invalid or expired.
+    """
+    claims = get_token_claims()
+    if claims is None:
+        return None
+    # Tokens carry the user's comma-separated roles string in a list
+    return {role.strip() for roles in claims.get('roles', []) for role in str(roles).split(',') if role.strip()}
+
+
+def is_admin_request():
+    """
+    Whether the request carries a valid token of an ADMIN user.
+    """
+    roles = get_token_roles()
+    return roles is not None and RoleEnum.ADMIN.value in roles
+
+
+def admin_required(view):
+    """
+    Restricts a route to requests with a valid ADMIN token: 401 without a valid token, 403 for other roles.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        roles = get_token_roles()
+        if roles is None:
+            return jsonify({'error': 'Missing or invalid token'}), 401
+        if RoleEnum.ADMIN.value not in roles:
+            return jsonify({'error': 'Admin role required'}), 403
+        return view(*args, **kwargs)
+
+    return wrapper
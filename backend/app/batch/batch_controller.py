@@ -0,0 +1,107 @@
+from flask import Blueprint, current_app, request, jsonify
+from app.batch.executor import BATCH_METHODS, open_atomic_session, resolve_references, run_subrequest
+
+# Default maximum number of sub-requests in one batch
+MAX_REQUESTS = 50
+
+# Blueprint for batches of API requests
+batch_bp = Blueprint('batch_controller', __name__, url_prefix='/api/batch')
+
+
+def _validate(item, position):
+    """
+    Checks one sub-request of a batch.
+
+    Returns:
+        str: The error message, or None if the sub-request is valid.
+    """
+    if not isinstance(item, dict):
+        return f'Request {position} must be an object'
+    method, path = item.get('method', 'GET'), item.get('path')
+    if not isinstance(method, str) or method.upper() not in BATCH_METHODS:
+        return f'Request {position}: method must be one of {", ".join(BATCH_METHODS)}'
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        return f'Request {position}: path must start with /api/'
+    if path.split('?')[0].rstrip('/') == batch_bp.url_prefix:
+        return f'Request {position}: batches cannot be nested'
+    if not isinstance(item.get('headers', {}), dict):
+        return f'Request {position}: headers must be an object'
+    return None
+
+
+def _skipped(position):
+    """
+    The response of a sub-request that was not run because an earlier one failed.
+    """
+    return {'status': 424, 'headers': {}, 'body': {'error': f'Not run: request {position} failed'}}
+
+# Run a batch of requests
+@batch_bp.route('', methods=['POST'])
+def run_batch():
+    """
+    Runs a list of API requests in-process, in order, and returns their responses,
+    so a client can make a sequence of calls in one round-trip.
+
+    Each sub-request inherits the Authorization and Cookie headers of the batch.
+    Strings in its path, body or headers may use `{{index.field}}` placeholders
+    (e.g. `{{0.id}}` or `{{1.results.0.id}}`) for values of earlier responses.
+
+    Expected data fields:
+        - requests: List of {method, path, body, headers} (required, up to BATCH_MAX_REQUESTS)
+        - atomic: If true, all sub-requests share one database transaction that is
+          only committed if all of them succeed (optional, default false)
+
+    Returns:
+        - A JSON list with the {status, headers, body} of every sub-request.
+        - Status code 200 if the batch ran, 400 if it is invalid, or 409 if an atomic
+          batch was rolled back. In a rolled back batch the sub-requests after the
+          failed one are not run (status 424), and the ones before it are marked 'rolled_back'.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('requests'), list) or not data['requests']:
+        return jsonify({'error': 'Missing required field: requests (a non-empty list)'}), 400
+    limit = current_app.config.get('BATCH_MAX_REQUESTS', MAX_REQUESTS)
+    if len(data['requests']) > limit:
+        return jsonify({'error': f'A batch can have at most {limit} requests'}), 400
+    for position, item in enumerate(data['requests']):
+        error = _validate(item, position)
+        if error:
+            return jsonify({'error': error}), 400
+
+    atomic = bool(data.get('atomic', False))
+    session = open_atomic_session() if atomic else None
+    responses, cookies = [], {}
+    failed = None
+    try:
+        for position, item in enumerate(data['requests']):
+            if failed is not None:
+                responses.append(_skipped(failed))
+                continue
+            try:
+                path = resolve_references(item['path'], responses)
+                body = resolve_references(item.get('body'), responses)
+                headers = resolve_references(item.get('headers'), responses)
+            except ValueError as error:
+                result = {'status': 424, 'headers': {}, 'body': {'error': str(error)}}
+            else:
+                result, set_cookies = run_subrequest(item.get('method', 'GET').upper(), str(path), body=body,
+                                                     headers=headers, session=session)
+                # Like a browser, keep the last value of each cookie (e.g. the replica pin)
+                cookies.update((cookie.split('=', 1)[0], cookie) for cookie in set_cookies)
+            responses.append(result)
+            if atomic and (result['status'] >= 400 or session.rolled_back):
+                failed = position
+
+        if atomic and failed is None:
+            session.commit_batch()
+    finally:
+        if session is not None:
+            session.close()
+
+    if failed is not None:
+        for result in responses[:failed]:
+            result['rolled_back'] = True
+    response = jsonify(responses)
+    for cookie in cookies.values():
+        response.headers.add('Set-Cookie', cookie)
+    return response, 409 if failed is not None else 200
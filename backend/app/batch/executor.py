@@ -0,0 +1,190 @@
+import re
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from werkzeug.test import EnvironBuilder
+from app import db
+from app.routing import RoutingSession
+
+# Methods a sub-request may use
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Headers of the batch request that every sub-request inherits unless it sets its own
+INHERITED_HEADERS = ('Authorization', 'Cookie', 'Accept-Language')
+
+# Response headers returned with each sub-response
+RETURNED_HEADERS = ('Location', 'Retry-After', 'Idempotent-Replayed', 'X-Coalesced')
+
+# Environ flag of the sub-requests, which run within the batch request (see `app.throttling.shedding`)
+SUBREQUEST_ENVIRON = 'app.batch_subrequest'
+
+# Placeholders for values of earlier responses, e.g. {{0.id}} or {{1.results.0.id}}
+REFERENCE = re.compile(r'\{\{\s*(\d+)((?:\.[\w-]+)*)\s*\}\}')
+
+
+class AtomicSession(RoutingSession):
+    """
+    Session shared by the sub-requests of an all-or-nothing batch.
+
+    The commits of the sub-requests only run the before_commit hooks and flush
+    (and expire the loaded objects, like a real commit), so every write stays in
+    one transaction that the batch commits or rolls back at the end; the
+    after_commit hooks (e.g. stock events) run once, when the batch commits. Reads always go to the primary, since the
+    replica can't see the batch's own writes.
+
+    Attributes:
+        rolled_back (bool): Whether a sub-request rolled the transaction back.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Initializes the session with the options of `db.session`.
+        """
+        super().__init__(*args, **kwargs)
+        self.rolled_back = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        """
+        Select the engine by bind key only, skipping the replica routing.
+        """
+        return Session.get_bind(self, mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        """
+        Flushes a sub-request's changes instead of committing them.
+        """
+        self.dispatch.before_commit(self)
+        self.flush()
+        if self.expire_on_commit:
+            self.expire_all()
+
+    def rollback(self):
+        """
+        Rolls the whole batch back; the batch then fails even if the sub-request responds successfully.
+        """
+        self.rolled_back = True
+        super().rollback()
+
+    def commit_batch(self):
+        """
+        Commits the writes of every sub-request.
+        """
+        super().commit()
+
+
+def open_atomic_session():
+    """
+    Creates a session for an all-or-nothing batch, configured like `db.session`.
+    """
+    return AtomicSession(**db.session.session_factory.kw)
+
+
+def _lookup(responses, index, fields):
+    """
+    Reads a value from the body of an earlier sub-response.
+
+    Raises:
+        ValueError: If the sub-request hasn't run, failed, or its body has no such value.
+    """
+    reference = f'{{{{{index}{fields}}}}}'
+    if index >= len(responses) or responses[index]['status'] >= 400:
+        raise ValueError(f'{reference} refers to a request that did not succeed')
+    value = responses[index]['body']
+    for field in fields.split('.')[1:]:
+        if isinstance(value, list) and field.isdigit() and int(field) < len(value):
+            value = value[int(field)]
+        elif isinstance(value, dict) and field in value:
+            value = value[field]
+        else:
+            raise ValueError(f'{reference} does not exist')
+    return value
+
+
+def resolve_references(value, responses):
+    """
+    Replaces the {{index.field...}} placeholders of a sub-request with values of
+    earlier sub-responses. A string that is only a placeholder takes the value
+    as is (e.g. an integer ID); otherwise the value is formatted into the string.
+
+    Args:
+        value: The path, body or headers of a sub-request.
+        responses (list[dict]): The sub-responses so far.
+
+    Returns:
+        The value with its placeholders resolved.
+
+    Raises:
+        ValueError: If a placeholder can't be resolved.
+    """
+    if isinstance(value, dict):
+        return {key: resolve_references(item, responses) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, responses) for item in value]
+    if not isinstance(value, str) or '{{' not in value:
+        return value
+    whole = REFERENCE.fullmatch(value.strip())
+    if whole:
+        return _lookup(responses, int(whole.group(1)), whole.group(2))
+    return REFERENCE.sub(lambda match: str(_lookup(responses, int(match.group(1)), match.group(2))), value)
+
+
+def _read_body(response):
+    """
+    The body of a sub-response: parsed JSON, text, or None for files and streams.
+    """
+    if response.is_streamed or response.direct_passthrough:
+        return None
+    if response.is_json:
+        return response.get_json(silent=True)
+    if response.mimetype and response.mimetype.startswith('text/'):
+        return response.get_data(as_text=True)
+    return None
+
+
+def run_subrequest(method, path, body=None, headers=None, session=None):
+    """
+    Dispatches one sub-request to the application in-process, with its own
+    request and application contexts, so it runs the same hooks, decorators and
+    error handlers as a separate HTTP request.
+
+    Args:
+        method (str): The HTTP method.
+        path (str): The path, with its query string.
+        body (optional): The JSON body.
+        headers (dict, optional): Headers added to the ones inherited from the batch request.
+        session (AtomicSession, optional): The session to use instead of a session of its own.
+
+    Returns:
+        tuple: (dict with the status, headers and body of the sub-response, list of its Set-Cookie headers).
+    """
+    app = current_app._get_current_object()
+    inherited = {name: request.headers[name] for name in INHERITED_HEADERS if name in request.headers}
+    builder = EnvironBuilder(
+        path=path, method=method, base_url=request.host_url, json=body,
+        headers={**inherited, **{name: str(value) for name, value in (headers or {}).items()}},
+        environ_overrides={'REMOTE_ADDR': request.remote_addr, SUBREQUEST_ENVIRON: True}
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    with app.app_context():
+        if session is not None:
+            db.session.registry.set(session)
+        try:
+            with app.request_context(environ):
+                try:
+                    response = app.full_dispatch_request()
+                except Exception as error:
+                    response = app.make_response(app.handle_exception(error))
+                try:
+                    returned = {name: response.headers[name] for name in RETURNED_HEADERS if name in response.headers}
+                    result = {'status': response.status_code, 'headers': returned, 'body': _read_body(response)}
+                    cookies = response.headers.getlist('Set-Cookie')
+                finally:
+                    response.close()
+        finally:
+            if session is not None:
+                # Keep the shared session open when this context ends
+                db.session.registry.clear()
+    return result, cookies
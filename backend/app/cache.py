@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache whose entries expire after a number of seconds.
+
+    Each worker process keeps its own copy, so cached values may be slightly stale
+    across workers until they expire.
+    """
+
+    # Seconds between sweeps of the expired entries
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        """
+        Initializes an empty cache.
+        """
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    def get(self, key):
+        """
+        Returns the cached value for `key`, or None if it is missing or expired.
+
+        Args:
+            key (hashable): The cache key.
+
+        Returns:
+            object: The cached value, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        """
+        Stores `value` under `key` for `ttl` seconds. Every SWEEP_INTERVAL seconds
+        it also drops the expired entries, which are otherwise only removed when
+        their key is read again.
+
+        Args:
+            key (hashable): The cache key.
+            value (object): The value to cache.
+            ttl (float): The number of seconds the value stays valid.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            if now >= self._next_sweep:
+                self._entries = {cached: entry for cached, entry in self._entries.items() if entry[0] > now}
+                self._next_sweep = now + self.SWEEP_INTERVAL
+
+    def invalidate(self, prefix):
+        """
+        Removes every entry whose key is a tuple starting with `prefix`.
+
+        Args:
+            prefix (str): The first element of the keys to remove.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if isinstance(key, tuple) and key[0] == prefix]:
+                del self._entries[key]
+
+
+# Cache shared by the application in this process
+cache = TTLCache()
@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify
 from app.category.models import Category
 
+# Maximum page size accepted by paginated endpoints
+MAX_PER_PAGE = 100
+
+# Maximum number of product or category IDs accepted by the batch endpoints
+MAX_BATCH_IDS = 1000
+
 # Blueprint configuration for category operations
-category_bp = Blueprint('category_controller', __name__, url_prefix='/api/categories')
+category_bp = Blueprint('category_controller', __name__, url_prefix='/api/categories', cli_group='categories')
 
 # Create a new category
 @category_bp.route('/', methods=['POST'])
@@ -10,19 +16,29 @@ def create_category():
     """
     Endpoint to create a new category.
 
-    Expects a JSON body with a 'name' field.
+    Expects a JSON body with a 'name' field and an optional 'parent_id' field
+    to create it as a subcategory.
 
     Returns:
-        JSON response with the newly created category's ID and name.
+        JSON response with the newly created category's ID, name and position in the hierarchy.
+        Returns 404 if the parent category is not found.
     """
     data = request.get_json()
     if not data or not data.get('name'):
         return jsonify({'error': 'Missing required field: name'}), 400
 
-    category = Category.create_category(name=data['name'])
+    parent = None
+    if data.get('parent_id') is not None:
+        parent = Category.get_category_by_id(data['parent_id'])
+        if parent is None:
+            return jsonify({'error': 'Parent category not found'}), 404
+
+    category = Category.create_category(name=data['name'], parent=parent)
     return jsonify({
         'id': category.id,
-        'name': category.name
+        'name': category.name,
+        'parent_id': category.parent_id,
+        'path': category.path
     }), 201
 
 # Get a category by ID
@@ -44,33 +60,50 @@ def get_category(category_id):
 
     return jsonify({
         'id': category.id,
-        'name': category.name
+        'name': category.name,
+        'parent_id': category.parent_id,
+        'path': category.path
     })
 
 # Update a category
 @category_bp.route('/<int:category_id>', methods=['PUT'])
 def update_category(category_id):
     """
-    Endpoint to update an existing category's name.
+    Endpoint to update an existing category's name or move it in the hierarchy.
+
+    Expects a JSON body with an optional 'name' field and an optional 'parent_id'
+    field (null moves the category to the root).
 
     Args:
         category_id (int): The ID of the category to update.
 
     Returns:
         JSON response with the updated category's details.
-        Returns 404 if the category is not found.
+        Returns 404 if the category or the new parent is not found.
+        Returns 400 if the new parent is inside the category's own subtree.
     """
     data = request.get_json()
     category = Category.get_category_by_id(category_id)
     if category is None:
         return jsonify({'error': 'Category not found'}), 404
 
+    if 'parent_id' in data and data['parent_id'] != category.parent_id:
+        parent = None
+        if data['parent_id'] is not None:
+            parent = Category.get_category_by_id(data['parent_id'])
+            if parent is None:
+                return jsonify({'error': 'Parent category not found'}), 404
+        if not category.move_category(parent):
+            return jsonify({'error': 'A category cannot be moved inside its own subtree'}), 400
+
     updated_category = category.update_category(name=data.get('name'))
     return jsonify({
         'message': 'Category updated successfully',
         'category': {
             'id': updated_category.id,
-            'name': updated_category.name
+            'name': updated_category.name,
+            'parent_id': updated_category.parent_id,
+            'path': updated_category.path
         }
     })
 
@@ -79,6 +112,7 @@ def update_category(category_id):
 def delete_category(category_id):
     """
     Endpoint to delete a category by its ID.
+    Its subcategories are attached to the deleted category's parent.
 
     Args:
         category_id (int): The ID of the category to delete.
@@ -99,10 +133,27 @@ def get_all_categories():
     """
     Endpoint to retrieve all categories.
 
+    Query parameters:
+        with_counts (int, optional): When set to 1, each category includes a
+            'product_count' field computed with a single aggregated query.
+
     Returns:
         JSON response with a list of all categories.
         Returns 404 if no categories are found.
     """
+    if request.args.get('with_counts') == '1':
+        categories = Category.get_all_categories_with_counts()
+        if not categories:
+            return jsonify({'error': 'No categories found'}), 404
+
+        return jsonify([{
+            'id': category.id,
+            'name': category.name,
+            'parent_id': category.parent_id,
+            'path': category.path,
+            'product_count': product_count
+        } for category, product_count in categories]), 200
+
     categories = Category.get_all_categories()
     if not categories:
         return jsonify({'error': 'No categories found'}), 404
@@ -112,7 +163,125 @@ def get_all_categories():
     for category in categories:
         categories_list.append({
             'id': category.id,
-            'name': category.name
+            'name': category.name,
+            'parent_id': category.parent_id,
+            'path': category.path
         })
 
     return jsonify(categories_list), 200
+
+# Get the products of a category
+@category_bp.route('/<int:category_id>/products', methods=['GET'])
+def get_category_products(category_id):
+    """
+    Endpoint to retrieve a page of the products that belong to a category.
+
+    Args:
+        category_id (int): The ID of the category.
+
+    Query parameters:
+        page (int, optional): The page number, starting at 1. Defaults to 1.
+        per_page (int, optional): The page size, up to MAX_PER_PAGE. Defaults to 20.
+        include_subcategories (int, optional): When set to 1, also includes the
+            products of every descendant category.
+
+    Returns:
+        JSON response with the products of the page and the pagination details.
+        Returns 404 if the category is not found.
+    """
+    category = Category.get_category_by_id(category_id)
+    if category is None:
+        return jsonify({'error': 'Category not found'}), 404
+
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE)
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+
+    if request.args.get('include_subcategories') == '1':
+        pagination = category.get_subtree_products_page(page=page, per_page=per_page)
+    else:
+        pagination = category.get_products_page(page=page, per_page=per_page)
+    return jsonify({
+        'items': [{
+            'id': product.id,
+            'code': product.code,
+            'name': product.name,
+            'description': product.description,
+            'price': product.price,
+            'quantity': product.quantity,
+            'company_nit': product.company_nit,
+            'company_name': product.company.name if product.company else None
+        } for product in pagination.items],
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }), 200
+
+def _get_batch_ids(data):
+    """
+    Validate the body of the batch assignment endpoints.
+
+    Args:
+        data (dict): The JSON body with 'product_ids' and 'category_ids' lists.
+
+    Returns:
+        tuple: (product_ids, category_ids, error) where error is None when the body is valid.
+    """
+    if not data:
+        return None, None, 'Missing required fields (product_ids, category_ids)'
+    product_ids = data.get('product_ids')
+    category_ids = data.get('category_ids')
+    for ids in (product_ids, category_ids):
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return None, None, 'product_ids and category_ids must be non-empty lists of integers'
+        if len(ids) > MAX_BATCH_IDS:
+            return None, None, f'At most {MAX_BATCH_IDS} IDs are allowed per list'
+    return product_ids, category_ids, None
+
+# Link many products to many categories
+@category_bp.route('/assign', methods=['POST'])
+def assign_products():
+    """
+    Endpoint to link every given product to every given category.
+
+    Expects a JSON body with 'product_ids' and 'category_ids' lists.
+    Links that already exist and IDs that do not exist are skipped.
+
+    Returns:
+        JSON response with the number of links created.
+    """
+    product_ids, category_ids, error = _get_batch_ids(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+
+    assigned = Category.assign_products(product_ids, category_ids)
+    return jsonify({'message': 'Products assigned successfully', 'assigned': assigned}), 200
+
+# Unlink many products from many categories
+@category_bp.route('/unassign', methods=['POST'])
+def unassign_products():
+    """
+    Endpoint to remove the links between the given products and categories.
+
+    Expects a JSON body with 'product_ids' and 'category_ids' lists.
+
+    Returns:
+        JSON response with the number of links removed.
+    """
+    product_ids, category_ids, error = _get_batch_ids(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+
+    unassigned = Category.unassign_products(product_ids, category_ids)
+    return jsonify({'message': 'Products unassigned successfully', 'unassigned': unassigned}), 200
+
+# Recompute the materialized paths of all categories
+@category_bp.cli.command('rebuild-paths')
+def rebuild_paths_command():
+    """
+    Recompute the materialized path of every category (flask categories rebuild-paths).
+    """
+    count = Category.rebuild_paths()
+    print(f'Rebuilt the path of {count} categories')
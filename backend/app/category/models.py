@@ -1,22 +1,38 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
 from app import db
+from app.soft_delete import SoftDeleteMixin
+from app.product.models import Product, product_category
+from app.changes.models import Change
 
-class Category(db.Model):
+class Category(SoftDeleteMixin, db.Model):
     """
     The Category model represents a product category.
 
     Attributes:
         id (int): The primary key for the category.
         name (str): The name of the category.
+        parent_id (int): The ID of the parent category, or None for a root category.
+        path (str): The materialized path of IDs from the root, e.g. '/1/4/9/'.
+        parent (relationship): The parent category.
+        children (relationship): The direct subcategories.
         products (relationship): A many-to-many relationship with the Product model.
     """
     __tablename__ = 'categories'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('categories.id'), index=True)
+    # Every descendant's path starts with its ancestor's path, so a subtree is one indexed prefix match
+    path = db.Column(db.String(500), index=True)
+
+    # Self-referential hierarchy
+    parent = db.relationship('Category', remote_side=[id], back_populates='children')
+    children = db.relationship('Category', back_populates='parent', passive_deletes=True)
 
     # Many-to-many relationship with products
-    products = db.relationship('Product', secondary='product_category', back_populates='categories')
+    products = db.relationship('Product', secondary='product_category', back_populates='categories', passive_deletes=True)
 
     def __repr__(self):
         """
@@ -25,21 +41,38 @@ class Category(db.Model):
         return f'<Category {self.name}>'
 
     @classmethod
-    def create_category(cls, name):
+    def create_category(cls, name, parent=None):
         """
         Create a new category and save it to the database.
 
         Args:
             name (str): The name of the new category.
+            parent (Category, optional): The parent category. Defaults to None (root category).
 
         Returns:
             Category: The newly created category object.
         """
-        category = cls(name=name)
+        category = cls(name=name, parent_id=parent.id if parent else None)
         db.session.add(category)
+        db.session.flush()  # Assigns the ID used in the path
+        category.path = cls._child_path(parent, category.id)
         db.session.commit()
         return category
 
+    @staticmethod
+    def _child_path(parent, category_id):
+        """
+        Build the materialized path of a category placed under `parent`.
+
+        Args:
+            parent (Category or None): The parent category, or None for a root category.
+            category_id (int): The ID of the category.
+
+        Returns:
+            str: The path of the category.
+        """
+        return f"{parent.path if parent else '/'}{category_id}/"
+
     @classmethod
     def get_category_by_id(cls, category_id):
         """
@@ -63,6 +96,220 @@ class Category(db.Model):
         """
         return cls.query.all()
 
+    @classmethod
+    def get_all_categories_with_counts(cls):
+        """
+        Retrieve all categories together with the number of products in each one.
+
+        The counts come from a single aggregated query over `product_category`,
+        so no product rows are loaded. Deleted products are left out by the
+        soft-delete criteria on the join.
+
+        Returns:
+            list[tuple[Category, int]]: Pairs of category and product count.
+        """
+        product_count = db.func.count(Product.id)
+        return (
+            db.session.query(cls, product_count)
+            .outerjoin(product_category, product_category.c.category_id == cls.id)
+            .outerjoin(Product, Product.id == product_category.c.product_id)
+            .group_by(cls.id)
+            .order_by(cls.id)
+            .all()
+        )
+
+    def get_products_page(self, page=1, per_page=20):
+        """
+        Retrieve one page of the products that belong to this category.
+
+        The company of each product is loaded in the same query to avoid one
+        extra query per product when serializing.
+
+        Args:
+            page (int, optional): The page number, starting at 1. Defaults to 1.
+            per_page (int, optional): The number of products per page. Defaults to 20.
+
+        Returns:
+            Pagination: The requested page of products.
+        """
+        query = (
+            Product.query
+            .join(product_category, product_category.c.product_id == Product.id)
+            .filter(product_category.c.category_id == self.id)
+            .options(joinedload(Product.company))
+            .order_by(Product.id)
+        )
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+    def get_subtree_products_page(self, page=1, per_page=20):
+        """
+        Retrieve one page of the products of this category and all its descendants.
+
+        The subtree is resolved with a prefix match on the indexed `path` column
+        inside a single statement, so the depth of the hierarchy does not add queries.
+
+        Args:
+            page (int, optional): The page number, starting at 1. Defaults to 1.
+            per_page (int, optional): The number of products per page. Defaults to 20.
+
+        Returns:
+            Pagination: The requested page of products.
+        """
+        subtree_products = (
+            db.select(product_category.c.product_id)
+            .join(Category, Category.id == product_category.c.category_id)
+            .where(Category.path.like(f'{self.path}%'))
+        )
+        query = (
+            Product.query
+            .filter(Product.id.in_(subtree_products))
+            .options(joinedload(Product.company))
+            .order_by(Product.id)
+        )
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+    def is_ancestor_of(self, category):
+        """
+        Check whether `category` is this category or one of its descendants.
+
+        Args:
+            category (Category): The category to check.
+
+        Returns:
+            bool: True if `category` is inside this category's subtree.
+        """
+        return category.path.startswith(self.path)
+
+    def move_category(self, parent):
+        """
+        Move the category, with its whole subtree, under a new parent.
+
+        The paths of all descendants are rewritten with one set-based UPDATE.
+
+        Args:
+            parent (Category or None): The new parent, or None to make it a root category.
+
+        Returns:
+            bool: True if the category was moved, False if `parent` is inside its own subtree.
+        """
+        if parent is not None and self.is_ancestor_of(parent):
+            return False
+
+        old_prefix = self.path
+        new_prefix = self._child_path(parent, self.id)
+        self._replace_path_prefix(old_prefix, new_prefix)
+        self.parent_id = parent.id if parent else None
+        db.session.commit()
+        return True
+
+    @classmethod
+    def _replace_path_prefix(cls, old_prefix, new_prefix):
+        """
+        Replace `old_prefix` with `new_prefix` in the path of every category under it.
+
+        Args:
+            old_prefix (str): The path prefix to replace.
+            new_prefix (str): The path prefix to put in its place.
+        """
+        Change.record_query('category', 'update', db.select(cls.id).where(cls.path.like(f'{old_prefix}%')))
+        # Paths are not summarized, so the move leaves the category summaries as they are
+        cls.query.filter(cls.path.like(f'{old_prefix}%')).execution_options(stats={}).update(
+            {cls.path: db.literal(new_prefix) + db.func.substr(cls.path, len(old_prefix) + 1)},
+            synchronize_session=False
+        )
+
+    @classmethod
+    def rebuild_paths(cls):
+        """
+        Recompute the materialized path of every category from the parent links.
+
+        Used to backfill categories created before the hierarchy existed.
+
+        Returns:
+            int: The number of categories updated.
+        """
+        parents = dict(db.session.query(cls.id, cls.parent_id).all())
+        paths = {}
+
+        def build(category_id):
+            if category_id not in paths:
+                parent_id = parents[category_id]
+                prefix = build(parent_id) if parent_id else '/'
+                paths[category_id] = f'{prefix}{category_id}/'
+            return paths[category_id]
+
+        for category_id in parents:
+            build(category_id)
+        db.session.execute(db.update(cls), [{'id': category_id, 'path': path} for category_id, path in paths.items()],
+                           execution_options={'stats': {}})
+        db.session.commit()
+        return len(paths)
+
+    @classmethod
+    def assign_products(cls, product_ids, category_ids):
+        """
+        Link every given product to every given category in one set-based statement.
+
+        Runs `INSERT ... SELECT ... ON CONFLICT DO NOTHING` on `product_category`,
+        so existing links are skipped, unknown IDs are ignored and no ORM
+        collection is loaded.
+
+        Args:
+            product_ids (list[int]): The IDs of the products to link.
+            category_ids (list[int]): The IDs of the categories to link them to.
+
+        Returns:
+            int: The number of new links created.
+        """
+        pairs = (
+            db.select(Product.id, cls.id)
+            .join_from(Product, cls, db.true())  # Every product with every category
+            .where(
+                Product.id.in_(product_ids), cls.id.in_(category_ids),
+                Product.deleted_at.is_(None), cls.deleted_at.is_(None)
+            )
+        )
+        columns = ['product_id', 'category_id']
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            statement = postgresql.insert(product_category).from_select(columns, pairs).on_conflict_do_nothing()
+        elif dialect == 'sqlite':
+            statement = sqlite.insert(product_category).from_select(columns, pairs).on_conflict_do_nothing()
+        else:
+            # Databases without ON CONFLICT skip existing links explicitly
+            existing = db.select(product_category.c.product_id).where(
+                product_category.c.product_id == Product.id,
+                product_category.c.category_id == cls.id
+            )
+            statement = product_category.insert().from_select(columns, pairs.where(~existing.exists()))
+        result = db.session.execute(statement, execution_options={'stats': {'categories': category_ids}})
+        Change.record('product_category', 'assign', data={'product_ids': product_ids, 'category_ids': category_ids})
+        db.session.commit()
+        return result.rowcount
+
+    @classmethod
+    def unassign_products(cls, product_ids, category_ids):
+        """
+        Remove the links between the given products and categories in one DELETE.
+
+        Args:
+            product_ids (list[int]): The IDs of the products to unlink.
+            category_ids (list[int]): The IDs of the categories to unlink them from.
+
+        Returns:
+            int: The number of links removed.
+        """
+        result = db.session.execute(
+            product_category.delete().where(
+                product_category.c.product_id.in_(product_ids),
+                product_category.c.category_id.in_(category_ids)
+            ),
+            execution_options={'stats': {'categories': category_ids}}
+        )
+        Change.record('product_category', 'unassign', data={'product_ids': product_ids, 'category_ids': category_ids})
+        db.session.commit()
+        return result.rowcount
+
     def update_category(self, name=None):
         """
         Update the category's attributes.
@@ -81,7 +328,9 @@ class Category(db.Model):
     @classmethod
     def delete_category(cls, category_id):
         """
-        Delete a category by its ID.
+        Soft-delete a category by its ID. It is hard-deleted later by the purge job.
+
+        Its subcategories move up one level, keeping their own subtrees.
 
         Args:
             category_id (int): The ID of the category to delete.
@@ -91,7 +340,12 @@ class Category(db.Model):
         """
         category = cls.query.get(category_id)
         if category:
-            db.session.delete(category)
-            db.session.commit()
+            # Subcategories are kept and attached to the deleted category's parent
+            parent_path = category.parent.path if category.parent else '/'
+            cls.query.filter_by(parent_id=category.id).execution_options(stats={}).update(
+                {cls.parent_id: category.parent_id}, synchronize_session=False
+            )
+            cls._replace_path_prefix(category.path, parent_path)
+            category.soft_delete()
             return True
         return False
@@ -0,0 +1,119 @@
+import json
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app import db
+from app.changes.models import Change
+
+# Maximum number of changes returned per request
+MAX_LIMIT = 1000
+
+# Maximum number of seconds a long-polling request waits for new changes
+MAX_WAIT = 30
+
+# Blueprint for the change feed
+changes_bp = Blueprint('changes_controller', __name__, url_prefix='/api/changes', cli_group='changes')
+
+
+def _poll_interval():
+    """
+    Seconds between two reads of the change log while waiting for new changes.
+    """
+    return current_app.config.get('CHANGES_POLL_INTERVAL', 0.5)
+
+
+def _read_changes(since, limit):
+    """
+    Reads the changes after `since` that can no longer be overtaken by a late
+    commit (see `Change.get_changes_since`) and ends the read transaction,
+    so the next poll sees rows committed in the meantime.
+    """
+    safety_lag = current_app.config.get('CHANGES_SAFETY_LAG_SECONDS', 30)
+    changes = [change.to_dict() for change in Change.get_changes_since(since, limit, safety_lag)]
+    db.session.rollback()
+    return changes
+
+
+# Get the changes after a sequence number
+@changes_bp.route('', methods=['GET'])
+def get_changes():
+    """
+    Returns the changes recorded after a sequence number.
+
+    Query parameters:
+        since (int, optional): The last sequence number already processed. Defaults to 0.
+        limit (int, optional): The maximum number of changes, up to MAX_LIMIT. Defaults to 100.
+        wait (int, optional): Seconds to wait for new changes when there are none
+            (long-polling), up to MAX_WAIT. Defaults to 0.
+
+    Returns:
+        JSON response with the changes and the sequence number to use as the next 'since'.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', 100, type=int), MAX_LIMIT)
+    wait = min(request.args.get('wait', 0, type=int), MAX_WAIT)
+    if since < 0 or limit < 1 or wait < 0:
+        return jsonify({'error': 'since and wait must be non-negative and limit positive'}), 400
+
+    deadline = time.monotonic() + wait
+    changes = _read_changes(since, limit)
+    while not changes and time.monotonic() < deadline:
+        time.sleep(_poll_interval())
+        changes = _read_changes(since, limit)
+
+    return jsonify({
+        'changes': changes,
+        'last_seq': changes[-1]['seq'] if changes else since
+    }), 200
+
+# Stream the changes as Server-Sent Events
+@changes_bp.route('/stream', methods=['GET'])
+def stream_changes():
+    """
+    Streams the changes recorded after a sequence number as Server-Sent Events.
+
+    The starting point is the 'since' query parameter, or the 'Last-Event-ID'
+    header sent by browsers when they reconnect. Each event carries the change
+    as JSON and its sequence number as the event ID. A comment is sent every
+    CHANGES_HEARTBEAT_SECONDS to keep idle connections open.
+
+    Each open stream holds a worker thread, so run it under a threaded or gevent server.
+
+    Returns:
+        A text/event-stream response.
+    """
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+    heartbeat = current_app.config.get('CHANGES_HEARTBEAT_SECONDS', 15)
+
+    def events(since):
+        last_sent = time.monotonic()
+        while True:
+            changes = _read_changes(since, MAX_LIMIT)
+            for change in changes:
+                since = change['seq']
+                yield f"id: {since}\nevent: change\ndata: {json.dumps(change)}\n\n"
+            if changes:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield ': heartbeat\n\n'
+            if len(changes) < MAX_LIMIT:
+                time.sleep(_poll_interval())
+
+    return Response(
+        stream_with_context(events(since)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Delete old changes
+@changes_bp.cli.command('prune')
+def prune_command():
+    """
+    Delete changes older than CHANGES_RETENTION_DAYS days (flask changes prune).
+    """
+    days = current_app.config.get('CHANGES_RETENTION_DAYS', 7)
+    pruned = Change.prune(datetime.utcnow() - timedelta(days=days))
+    print(f'Pruned {pruned} changes older than {days} days')
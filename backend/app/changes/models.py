@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import event, inspect
+from app import db
+from app.routing import RoutingSession
+
+# Tables whose changes are captured: table name -> (entity name, primary key, captured columns)
+TRACKED_TABLES = {
+    'products': ('product', 'id', ('id', 'code', 'name', 'description', 'price', 'quantity', 'company_nit')),
+    'companies': ('company', 'nit', ('nit', 'name', 'address', 'phone')),
+    'categories': ('category', 'id', ('id', 'name', 'parent_id', 'path')),
+}
+
+
+class Change(db.Model):
+    """
+    Append-only log of inventory changes, written in the same transaction as the change itself.
+
+    Consumers read it in `seq` order and remember the last `seq` they processed.
+    A transaction that commits late can make a lower `seq` appear after a higher
+    one; `get_changes_since` holds back the rows after such a gap, so the last
+    `seq` it returned is always a safe cursor.
+
+    Attributes:
+        seq (int): Monotonic sequence number (primary key).
+        entity (str): The kind of row that changed ('product', 'company', 'category' or 'product_category').
+        entity_id (str): The primary key of the changed row.
+        operation (str): 'create', 'update', 'delete', 'restore', 'assign' or 'unassign'.
+        data (dict): The row after the change; None for deletes and set-based changes.
+        created_at (datetime): When the change was recorded.
+    """
+    __tablename__ = 'changes'
+
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.String(50))
+    operation = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        """
+        String representation of the change.
+        """
+        return f'<Change {self.seq} {self.operation} {self.entity} {self.entity_id}>'
+
+    def to_dict(self):
+        """
+        Serializes the change for the API.
+
+        Returns:
+            dict: The change as a JSON-compatible dictionary.
+        """
+        return {
+            'seq': self.seq,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'operation': self.operation,
+            'data': self.data,
+            'created_at': self.created_at.isoformat()
+        }
+
+    @classmethod
+    def get_changes_since(cls, since, limit=100, safety_lag=30):
+        """
+        Retrieves the changes recorded after a sequence number that can no longer be overtaken.
+
+        Sequence numbers are assigned when a change is inserted, not when it
+        commits, so a missing `seq` may belong to a transaction still running.
+        The changes after a gap are held back until it is filled, or until they
+        are older than `safety_lag` seconds, when the gap is taken for a rolled
+        back transaction (or pruned rows). Without gaps nothing is delayed.
+
+        Args:
+            since (int): The last sequence number the consumer has seen.
+            limit (int, optional): The maximum number of changes to return. Defaults to 100.
+            safety_lag (float, optional): Seconds a gap is waited for. Defaults to 30.
+
+        Returns:
+            list[Change]: The changes in sequence order, up to the first gap still waited for.
+        """
+        changes = cls.query.filter(cls.seq > since).order_by(cls.seq).limit(limit).all()
+        cutoff = datetime.utcnow() - timedelta(seconds=safety_lag)
+        expected = since + 1
+        for index, change in enumerate(changes):
+            if change.seq != expected and change.created_at > cutoff:
+                return changes[:index]
+            expected = change.seq + 1
+        return changes
+
+    @classmethod
+    def get_last_seq(cls):
+        """
+        Returns the highest sequence number recorded so far, or 0 if the log is empty.
+        """
+        return db.session.scalar(db.select(db.func.max(cls.seq))) or 0
+
+    @classmethod
+    def record(cls, entity, operation, entity_id=None, data=None):
+        """
+        Adds a change to the current transaction. It is committed with the caller's changes.
+
+        Args:
+            entity (str): The kind of row that changed.
+            operation (str): The operation applied.
+            entity_id (str, optional): The primary key of the changed row.
+            data (dict, optional): The row after the change.
+        """
+        db.session.add(cls(entity=entity, entity_id=entity_id, operation=operation, data=data))
+
+    @classmethod
+    def record_query(cls, entity, operation, ids):
+        """
+        Records one change per row selected by `ids` with a single INSERT ... SELECT.
+
+        Used by set-based updates that never load the affected rows, so `data` is left empty.
+
+        Args:
+            entity (str): The kind of row that changed.
+            operation (str): The operation applied.
+            ids (Select): A SELECT returning the primary keys of the changed rows.
+        """
+        ids = ids.subquery()
+        rows = db.select(
+            db.literal(entity),
+            db.cast(ids.c[0], db.String),
+            db.literal(operation),
+            db.literal(datetime.utcnow())
+        )
+        db.session.execute(
+            cls.__table__.insert().from_select(['entity', 'entity_id', 'operation', 'created_at'], rows)
+        )
+
+    @classmethod
+    def prune(cls, before):
+        """
+        Deletes the changes recorded before a given moment.
+
+        Args:
+            before (datetime): Changes older than this are deleted.
+
+        Returns:
+            int: The number of changes deleted.
+        """
+        result = db.session.execute(db.delete(cls).where(cls.created_at < before))
+        db.session.commit()
+        return result.rowcount
+
+
+def _snapshot(instance, columns):
+    """
+    Copies the captured columns of a row into a JSON-compatible dictionary.
+    """
+    snapshot = {column: getattr(instance, column) for column in columns}
+    return {column: float(value) if isinstance(value, Decimal) else value for column, value in snapshot.items()}
+
+
+def _operation(session, instance):
+    """
+    Works out which operation a flushed instance represents, or None if nothing captured changed.
+    """
+    if instance in session.new:
+        return 'create'
+    if instance in session.deleted:
+        return 'delete'
+
+    state = inspect(instance)
+    if 'deleted_at' in state.attrs:
+        history = state.attrs.deleted_at.history
+        if history.has_changes():
+            return 'delete' if instance.deleted_at is not None else 'restore'
+    if session.is_modified(instance, include_collections=False):
+        return 'update'
+    return None
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def record_flushed_changes(session, flush_context):
+    """
+    Writes a change for every tracked row created, updated or deleted through the ORM.
+
+    Runs inside the flush, so the changes are committed or rolled back together
+    with the rows they describe.
+    """
+    rows = []
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        tracked = TRACKED_TABLES.get(getattr(instance, '__tablename__', None))
+        if tracked is None:
+            continue
+        entity, key, columns = tracked
+        operation = _operation(session, instance)
+        if operation is None:
+            continue
+        rows.append({
+            'entity': entity,
+            'entity_id': str(getattr(instance, key)),
+            'operation': operation,
+            'data': None if operation == 'delete' else _snapshot(instance, columns),
+            'created_at': datetime.utcnow()
+        })
+    if rows:
+        session.connection().execute(Change.__table__.insert(), rows)
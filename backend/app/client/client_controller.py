@@ -1,5 +1,12 @@
-from flask import Blueprint, request, jsonify
+from datetime import date
+from flask import Blueprint, current_app, request, jsonify
+from app.cache import cache
 from app.client.models import Client
+from app.multi_get import get_requested_keys, multi_get_response
+from app.product.models import cents_to_price
+
+# Maximum page size accepted by paginated endpoints
+MAX_PER_PAGE = 100
 
 client_bp = Blueprint('client_controller', __name__, url_prefix='/api/clients')
 
@@ -56,11 +63,14 @@ def get_client(client_id):
 @client_bp.route('/', methods=['GET'])
 def get_all_clients():
     """
-    Get all clients.
+    Get all clients, or with `?ids=3,1,2` only those clients (see `lookup_clients`).
 
     Returns:
         JSON: A list of all clients or an error message if no clients are found.
     """
+    if 'ids' in request.args:
+        return _get_clients_by_ids()
+
     clients = Client.get_all_clients()
     if not clients:
         return jsonify({'error': 'No clients found'}), 404
@@ -75,6 +85,45 @@ def get_all_clients():
 
     return jsonify(clients_list), 200
 
+def _client(client):
+    """
+    Serializes a client with the fields returned by the client routes.
+    """
+    return {
+        'id': client.id,
+        'name': client.name,
+        'email': client.email
+    }
+
+def _get_clients_by_ids():
+    """
+    Resolves the client IDs of a multi-get request with one IN query.
+
+    Returns:
+        JSON: The clients found, in request order, and the missing IDs, or an error message if the IDs are invalid.
+    """
+    try:
+        client_ids = get_requested_keys('ids', int)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return multi_get_response(client_ids, Client.get_clients_by_ids(client_ids), lambda client: client.id, _client)
+
+# Get several clients by ID, for lists too long for ?ids=
+@client_bp.route('/lookup', methods=['POST'])
+def lookup_clients():
+    """
+    Get the clients whose IDs are listed in the request body.
+
+    Expected request body:
+    {
+        "ids": [3, 1, 2]
+    }
+
+    Returns:
+        JSON: The clients found, in request order, and the missing IDs, or an error message if the IDs are invalid.
+    """
+    return _get_clients_by_ids()
+
 # Update a client
 @client_bp.route('/<int:client_id>', methods=['PUT'])
 def update_client(client_id):
@@ -121,3 +170,120 @@ def delete_client(client_id):
     if not success:
         return jsonify({'error': 'Client not found'}), 404
     return jsonify({'message': 'Client deleted successfully'}), 200
+
+def _get_page_args():
+    """
+    Reads the 'page' and 'per_page' query parameters.
+
+    Returns:
+        tuple: (page, per_page), or (None, None) if they are not positive integers.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE)
+    if page < 1 or per_page < 1:
+        return None, None
+    return page, per_page
+
+def _get_date_arg(name):
+    """
+    Reads an optional ISO 8601 date query parameter ('2024-01-31').
+
+    Returns:
+        date: The parsed date, or None if the parameter is missing.
+
+    Raises:
+        ValueError: If the parameter is not a valid date.
+    """
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+# Get the order history of a client
+@client_bp.route('/<int:client_id>/orders', methods=['GET'])
+def get_client_orders(client_id):
+    """
+    Get a page of a client's orders, newest first, with the totals of each order
+    and of the client.
+
+    Query parameters:
+        page (int, optional): The page number, starting at 1. Defaults to 1.
+        per_page (int, optional): The page size, up to MAX_PER_PAGE. Defaults to 20.
+        from (str, optional): Only orders placed on or after this date (YYYY-MM-DD).
+        to (str, optional): Only orders placed on or before this date (YYYY-MM-DD).
+
+    Returns:
+        JSON: The client's totals and the page of orders, or an error message if the client is not found.
+    """
+    client = Client.get_client_by_id(client_id)
+    if client is None:
+        return jsonify({'error': 'Client not found'}), 404
+
+    page, per_page = _get_page_args()
+    if page is None:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+
+    try:
+        start, end = _get_date_arg('from'), _get_date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+
+    stats = client.get_order_stats()
+    pagination = client.get_orders_page(page=page, per_page=per_page, start=start, end=end)
+    return jsonify({
+        'client_id': client.id,
+        'order_count': stats.order_count,
+        'total_spent': cents_to_price(stats.total_spent_cents),
+        'last_order_date': stats.last_order_date,
+        'orders': [{
+            'id': order.id,
+            'order_date': order.order_date,
+            'item_count': item_count,
+            'total': cents_to_price(total_cents)
+        } for order, item_count, total_cents in pagination.items],
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }), 200
+
+# Get the order summary of all clients
+@client_bp.route('/summary', methods=['GET'])
+def get_clients_summary():
+    """
+    Get a page of clients with their order count, total spent and last order date.
+
+    The result is cached for CLIENT_SUMMARY_CACHE_SECONDS seconds (0 disables the cache).
+
+    Query parameters:
+        page (int, optional): The page number, starting at 1. Defaults to 1.
+        per_page (int, optional): The page size, up to MAX_PER_PAGE. Defaults to 20.
+
+    Returns:
+        JSON: The page of client summaries.
+    """
+    page, per_page = _get_page_args()
+    if page is None:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+
+    cache_key = ('client_summary', page, per_page)
+    summary = cache.get(cache_key)
+    if summary is None:
+        pagination = Client.get_order_summary_page(page=page, per_page=per_page)
+        summary = {
+            'clients': [{
+                'id': client.id,
+                'name': client.name,
+                'email': client.email,
+                'order_count': order_count,
+                'total_spent': cents_to_price(total_spent_cents),
+                'last_order_date': last_order_date
+            } for client, order_count, total_spent_cents, last_order_date in pagination.items],
+            'page': pagination.page,
+            'per_page': pagination.per_page,
+            'total': pagination.total,
+            'pages': pagination.pages
+        }
+        ttl = current_app.config.get('CLIENT_SUMMARY_CACHE_SECONDS', 0)
+        if ttl:
+            cache.set(cache_key, summary, ttl)
+
+    return jsonify(summary), 200
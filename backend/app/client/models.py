@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from app import db
+from app.soft_delete import SoftDeleteMixin
+from app.order.models import Order
+from app.product.models import Product, order_product
 
-class Client(db.Model):
+class Client(SoftDeleteMixin, db.Model):
     """
     The `Client` class represents a client in the database. It contains fields 
     for the client's personal information, such as `name` and `email`, and has 
@@ -11,11 +14,15 @@ class Client(db.Model):
     """
     
     __tablename__ = 'clients'
+    __table_args__ = (
+        # Emails only need to be unique among active clients
+        SoftDeleteMixin.active_index('uq_clients_email_active', 'email', unique=True),
+    )
     
     # Database Columns
     id = db.Column(db.Integer, primary_key=True)  # Unique identifier for the client
     name = db.Column(db.String(100), nullable=False)  # Name of the client
-    email = db.Column(db.String(120), unique=True, nullable=False)  # Email of the client (must be unique)
+    email = db.Column(db.String(120), nullable=False)  # Email of the client (must be unique among active clients)
 
     # Relationship: A client can have many orders
     orders = db.relationship('Order', back_populates='client', cascade='all, delete')
@@ -74,6 +81,116 @@ class Client(db.Model):
         """
         return cls.query.all()
 
+    @classmethod
+    def get_clients_by_ids(cls, client_ids):
+        """
+        Retrieves several clients by their IDs with one IN query.
+
+        Args:
+            client_ids (list[int]): The unique identifiers of the clients.
+
+        Returns:
+            list: The Client objects found, in no particular order.
+        """
+        return cls.query.filter(cls.id.in_(client_ids)).all()
+
+    @staticmethod
+    def _order_totals(client_id=None):
+        """
+        Builds a subquery with the number of products and the total value of each order in cents.
+
+        Args:
+            client_id (int, optional): Restricts the subquery to the orders of one client.
+
+        Returns:
+            Subquery: Rows of (order_id, item_count, total_cents) computed with GROUP BY.
+        """
+        query = (
+            db.select(
+                Order.id.label('order_id'),
+                db.func.count(order_product.c.product_id).label('item_count'),
+                db.func.coalesce(db.func.sum(Product.price_cents), 0).label('total_cents')
+            )
+            .outerjoin(order_product, order_product.c.order_id == Order.id)
+            .outerjoin(Product, Product.id == order_product.c.product_id)
+            .group_by(Order.id)
+        )
+        if client_id is not None:
+            query = query.where(Order.client_id == client_id)
+        return query.subquery()
+
+    def get_orders_page(self, page=1, per_page=20, start=None, end=None):
+        """
+        Retrieves one page of the client's orders, newest first, with their totals.
+
+        Args:
+            page (int, optional): The page number, starting at 1. Defaults to 1.
+            per_page (int, optional): The number of orders per page. Defaults to 20.
+            start (date, optional): Only orders placed on or after this date.
+            end (date, optional): Only orders placed on or before this date.
+
+        Returns:
+            Pagination: Rows of (Order, item_count, total_cents).
+        """
+        totals = self._order_totals(client_id=self.id)
+        query = (
+            db.session.query(Order, totals.c.item_count, totals.c.total_cents)
+            .join(totals, totals.c.order_id == Order.id)
+            .filter(Order.client_id == self.id)
+            .order_by(Order.order_date.desc(), Order.id.desc())
+        )
+        if start is not None:
+            query = query.filter(Order.order_date >= start)
+        if end is not None:
+            query = query.filter(Order.order_date <= end)
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+    def get_order_stats(self):
+        """
+        Computes the client's order count, total spent and last order date in one query.
+
+        Returns:
+            Row: A row with order_count, total_spent_cents and last_order_date.
+        """
+        totals = self._order_totals(client_id=self.id)
+        return db.session.execute(
+            db.select(
+                db.func.count(Order.id).label('order_count'),
+                db.func.coalesce(db.func.sum(totals.c.total_cents), 0).label('total_spent_cents'),
+                db.func.max(Order.order_date).label('last_order_date')
+            )
+            .join(totals, totals.c.order_id == Order.id)
+            .where(Order.client_id == self.id)
+        ).one()
+
+    @classmethod
+    def get_order_summary_page(cls, page=1, per_page=20):
+        """
+        Retrieves one page of clients with their order count, total spent and last
+        order date, aggregated in the database with GROUP BY.
+
+        Args:
+            page (int, optional): The page number, starting at 1. Defaults to 1.
+            per_page (int, optional): The number of clients per page. Defaults to 20.
+
+        Returns:
+            Pagination: Rows of (Client, order_count, total_spent_cents, last_order_date).
+        """
+        totals = cls._order_totals()
+        query = (
+            db.session.query(
+                cls,
+                db.func.count(Order.id).label('order_count'),
+                db.func.coalesce(db.func.sum(totals.c.total_cents), 0).label('total_spent_cents'),
+                db.func.max(Order.order_date).label('last_order_date')
+            )
+            .outerjoin(Order, Order.client_id == cls.id)
+            .outerjoin(totals, totals.c.order_id == Order.id)
+            .group_by(cls.id)
+            .order_by(cls.id)
+        )
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
     def update_client(self, name=None, email=None):
         """
         Updates the client's information.
@@ -98,7 +215,8 @@ class Client(db.Model):
     @classmethod
     def delete_client(cls, client_id):
         """
-        Deletes a client from the database by their unique identifier (ID).
+        Soft-deletes a client, and their orders, by their unique identifier (ID).
+        The rows are hard-deleted later by the purge job.
 
         Args:
             client_id (int): The unique identifier of the client to delete.
@@ -110,9 +228,12 @@ class Client(db.Model):
         # Retrieve the client by ID
         client = cls.query.get(client_id)
         
-        # If the client exists, delete them and commit the transaction
+        # If the client exists, mark them and their orders as deleted in one transaction
         if client:
-            db.session.delete(client)
+            client.soft_delete(commit=False)
+            Order.query.filter_by(client_id=client.id, deleted_at=None).update(
+                {Order.deleted_at: client.deleted_at}, synchronize_session=False
+            )
             db.session.commit()
             return True
         
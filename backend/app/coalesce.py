@@ -0,0 +1,255 @@
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+
+try:
+    import fcntl
+except ImportError:  # Windows: requests are only coalesced within a process
+    fcntl = None
+
+# Header added to responses shared from another request's computation
+COALESCED_HEADER = 'X-Coalesced'
+
+# Seconds between sweeps of the stale files in COALESCE_DIR
+SWEEP_INTERVAL = 60
+
+
+class _Call:
+    """
+    A computation in flight and the requests waiting for it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time; concurrent callers with the same
+    key wait for it and share its result instead of running it again.
+
+    Results are not kept once the computation ends: a caller that arrives
+    afterwards starts a new one, so nothing is served staler than a request
+    that was already running when the caller arrived.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty registry of computations in flight.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        """
+        Runs `func()` unless a computation for `key` is in flight, in which case
+        waits for it and returns its result (or raises its error).
+
+        Args:
+            key (hashable): Identifies identical computations.
+            func (callable): The computation.
+            timeout (float, optional): Seconds to wait for another caller's computation
+                before running `func` anyway. Defaults to waiting until it ends.
+
+        Returns:
+            tuple: (result, shared). `shared` is True when the result came from another caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            return func(), False
+
+        try:
+            call.result = func()
+            return call.result, False
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+# Computations in flight in this process
+flights = SingleFlight()
+
+
+def _lock_file(path, timeout):
+    """
+    Takes an exclusive lock on a file, waiting up to `timeout` seconds.
+
+    Returns:
+        int: The locked file descriptor, or None if the lock was not acquired in time.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                os.close(fd)
+                return None
+            time.sleep(0.005)
+
+
+def _read_result(path, since):
+    """
+    Reads a result another worker finished at or after `since`, or None.
+    """
+    try:
+        with open(path, 'rb') as file:
+            finished_at, status, content_type = file.readline().decode().rstrip('\n').split(' ', 2)
+            if float(finished_at) < since:
+                return None
+            return int(status), content_type, file.read()
+    except (OSError, ValueError):
+        return None
+
+
+def _write_result(path, result):
+    """
+    Atomically replaces the shared result file of a key.
+    """
+    status, content_type, body = result
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}'
+    with open(temporary, 'wb') as file:
+        file.write(f'{time.time()} {status} {content_type}\n'.encode())
+        file.write(body)
+    os.replace(temporary, path)
+
+
+# When this process sweeps COALESCE_DIR next
+_next_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def _sweep(folder, max_age):
+    """
+    Deletes the result files older than `max_age` seconds, which no waiting
+    request can use anymore (followers wait at most COALESCE_TIMEOUT), and the
+    lock files of the keys not requested since then.
+    """
+    global _next_sweep
+    now = time.time()
+    with _sweep_lock:
+        if now < _next_sweep:
+            return
+        _next_sweep = now + SWEEP_INTERVAL
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(folder, name)
+        try:
+            if now - os.path.getmtime(path) <= max_age:
+                continue
+            if name.endswith('.lock'):
+                # Only unlink a lock nobody holds; a request still opening it at worst computes on its own
+                fd = _lock_file(path, 0)
+                if fd is not None:
+                    os.unlink(path)
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+            elif name.endswith('.result'):
+                os.unlink(path)
+        except OSError:
+            pass  # Removed by another worker's sweep
+
+
+def _across_workers(folder, key, func, arrived_at, timeout):
+    """
+    Coalesces a computation with the other worker processes through a lock file.
+
+    The first worker holding the lock computes and publishes the result; the
+    others wait for the lock and use that result if it finished after they arrived.
+    """
+    name = os.path.join(folder, hashlib.sha256(repr(key).encode()).hexdigest())
+    fd = _lock_file(f'{name}.lock', timeout)
+    if fd is None:
+        return func(), False
+    try:
+        os.utime(fd)  # Keeps the lock of a key in use from being swept
+        result = _read_result(f'{name}.result', arrived_at)
+        if result is not None:
+            return result, True
+        result = func()
+        _write_result(f'{name}.result', result)
+        return result, False
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def coalesce(view=None, params=(), bypass=()):
+    """
+    Makes concurrent identical GET requests share one execution of the route.
+
+    Requests for the same path and `params` (the query arguments the view reads;
+    any other argument is ignored) and the same database, primary or replica,
+    that arrive while one is running wait for it and get a copy of its
+    serialized response. Requests with a `bypass` argument, and requests of
+    clients pinned to the primary after a write (see `app.routing`), run on
+    their own, so a client never gets a result computed before its own write.
+
+    With COALESCE_DIR set, workers on the same host also coalesce through lock
+    files in that folder; result files are deleted once they are older than the
+    wait. COALESCE_TIMEOUT (30 seconds by default) bounds the wait;
+    COALESCE_ENABLED = False turns it off.
+
+    Args:
+        params (tuple, optional): The query arguments that are part of the key.
+        bypass (tuple, optional): Query arguments whose requests are not coalesced (e.g. multi-gets).
+    """
+    if view is None:
+        return lambda view: coalesce(view, params=params, bypass=bypass)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        config = current_app.config
+        if not config.get('COALESCE_ENABLED', True) or g.get('pinned_to_primary'):
+            return view(*args, **kwargs)
+        if any(name in request.args for name in bypass):
+            return view(*args, **kwargs)
+
+        arrived_at = time.time()
+        timeout = config.get('COALESCE_TIMEOUT', 30)
+        folder = config.get('COALESCE_DIR')
+        key = (request.path, tuple((name, tuple(request.args.getlist(name))) for name in params),
+               bool(g.get('use_replica')))
+
+        def render():
+            response = current_app.make_response(view(*args, **kwargs))
+            return response.status_code, response.content_type, response.get_data()
+
+        def run():
+            if folder and fcntl is not None:
+                os.makedirs(folder, exist_ok=True)
+                _sweep(folder, timeout)
+                return _across_workers(folder, key, render, arrived_at, timeout)
+            return render(), False
+
+        (result, shared_across), shared = flights.do(key, run, timeout)
+        status, content_type, body = result
+        response = current_app.response_class(body, status=status, content_type=content_type)
+        if shared or shared_across:
+            response.headers[COALESCED_HEADER] = 'true'
+        return response
+
+    return wrapper
@@ -1,7 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy.exc import IntegrityError
+from app import db
 from app.company.models import Company
+from app.idempotency.decorators import idempotent
+from app.coalesce import coalesce
+from app.multi_get import get_requested_keys, multi_get_response
+from app.tasks import run_in_background
 from app.order.models import Order
-from app.product.models import Product
+from app.product.models import cents_to_price
 
 # Initialize the Blueprint for company routes
 company_bp = Blueprint('company_controller', __name__, url_prefix='/api/companies')
@@ -20,8 +26,8 @@ def create_company():
     if not data or not data.get('nit') or not data.get('name'):
         return jsonify({'error': 'Missing required fields (nit, name)'}), 400
 
-    # Check if the NIT is already registered
-    existing_company = Company.get_company_by_nit(data['nit'])
+    # Check if the NIT is already registered (deleted companies keep their NIT until purged)
+    existing_company = Company.get_company_by_nit(data['nit']) or Company.get_deleted(data['nit'])
     if existing_company:
         return jsonify({'error': 'NIT already in use'}), 400
 
@@ -63,7 +69,11 @@ def get_all_companies():
     """
     Retrieves all companies registered.
     If no companies exist, an error is returned.
+    With `?nits=900123,800456` only those companies are returned, as with POST /lookup.
     """
+    if 'nits' in request.args:
+        return _get_companies_by_nits()
+
     companies = Company.get_all_companies()
     if not companies:
         return jsonify({'error': 'No companies found'}), 404
@@ -77,6 +87,71 @@ def get_all_companies():
 
     return jsonify(companies_list), 200
 
+def _company(company):
+    """
+    Serializes a company with the fields returned by the company routes.
+    """
+    return {
+        'nit': company.nit,
+        'name': company.name,
+        'address': company.address,
+        'phone': company.phone
+    }
+
+def _get_companies_by_nits():
+    """
+    Resolves the NITs of a multi-get request with one IN query.
+    Returns the companies found, in request order, and the missing NITs.
+    """
+    try:
+        nits = get_requested_keys('nits')
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return multi_get_response(nits, Company.get_companies_by_nits(nits), lambda company: company.nit, _company)
+
+# Get several companies by NIT, for lists too long for ?nits=
+@company_bp.route('/lookup', methods=['POST'])
+def lookup_companies():
+    """
+    Retrieves the companies whose NITs are listed in the 'nits' field of the request body.
+    Returns the companies found, in request order, and the missing NITs.
+    """
+    return _get_companies_by_nits()
+
+def _valuation(row):
+    """
+    Serializes a row of Company.get_inventory_valuation.
+    """
+    return {
+        'nit': row.nit,
+        'name': row.name,
+        'product_count': row.product_count,
+        'total_quantity': row.total_quantity,
+        'total_value': cents_to_price(row.total_value_cents),
+        'total_value_cents': row.total_value_cents
+    }
+
+# Get the inventory value of every company
+@company_bp.route('/valuation', methods=['GET'])
+def get_companies_valuation():
+    """
+    Retrieves the inventory value (price * quantity of the active products) of every company.
+    The totals are computed by the database in integer cents, so they are exact.
+    """
+    return jsonify([_valuation(row) for row in Company.get_inventory_valuation()]), 200
+
+# Get the inventory value of a company
+@company_bp.route('/<string:nit>/valuation', methods=['GET'])
+def get_company_valuation(nit):
+    """
+    Retrieves the inventory value of a company by its NIT.
+    If the company does not exist, an error is returned.
+    """
+    rows = Company.get_inventory_valuation(nit)
+    if not rows:
+        return jsonify({'error': 'Company not found'}), 404
+    return jsonify(_valuation(rows[0])), 200
+
 # Update a company
 @company_bp.route('/<string:nit>', methods=['PUT'])
 def update_company(nit):
@@ -111,16 +186,47 @@ def update_company(nit):
 def delete_company(nit):
     """
     Deletes a company by its NIT.
+    The company and its products are soft-deleted and purged later.
+    With '?background=1', its products are deleted in batches of
+    COMPANY_DELETE_BATCH_SIZE in a background thread and 202 is returned.
     If the company is not found, an error is returned.
     """
+    if request.args.get('background') == '1':
+        if not Company.get_company_by_nit(nit):
+            return jsonify({'error': 'Company not found'}), 404
+
+        batch_size = current_app.config.get('COMPANY_DELETE_BATCH_SIZE', 5000)
+        run_in_background(Company.delete_company_in_batches, nit, batch_size=batch_size)
+        return jsonify({'message': 'Company deletion started'}), 202
+
     success = Company.delete_company(nit)
     if not success:
         return jsonify({'error': 'Company not found'}), 404
 
     return jsonify({'message': 'Company deleted successfully'}), 200
 
+# Restore a deleted company
+@company_bp.route('/<string:nit>/restore', methods=['POST'])
+def restore_company(nit):
+    """
+    Restores a soft-deleted company and the products deleted with it.
+    If there is no deleted company with that NIT, or one of its product codes
+    is now used by another product, an error is returned.
+    """
+    company = Company.get_deleted(nit)
+    if not company:
+        return jsonify({'error': 'Deleted company not found'}), 404
+
+    try:
+        company.restore_company()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Some product codes of the company are already in use'}), 409
+    return jsonify({'message': 'Company restored successfully'}), 200
+
 # Create a new order for a company
 @company_bp.route('/<string:nit>/orders', methods=['POST'])
+@idempotent
 def create_order_for_company(nit):
     """
     Creates a new order for a company specified by its NIT.
@@ -134,7 +240,11 @@ def create_order_for_company(nit):
     if not company:
         return jsonify({'error': 'Company not found'}), 404
 
-    order = Order.create_order(order_date=data['order_date'], client_id=data['client_id'])
+    try:
+        order = Order.create_order(order_date=data['order_date'], client_id=data['client_id'])
+    except ValueError:
+        db.session.rollback()
+        return jsonify({'error': 'order_date must be a date in YYYY-MM-DD format'}), 400
     return jsonify({
         'id': order.id,
         'order_date': order.order_date,
@@ -184,6 +294,7 @@ def delete_order_for_company(nit, order_id):
 
 # Get products associated with a company
 @company_bp.route('/<string:nit>/products', methods=['GET'])
+@coalesce
 def get_products_for_company(nit):
     """
     Retrieves all products associated with a company by its NIT.
@@ -1,7 +1,11 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from app import db
+from app.soft_delete import SoftDeleteMixin
+from app.product.models import Product, product_category
+from app.changes.models import Change
 
-class Company(db.Model):
+class Company(SoftDeleteMixin, db.Model):
     """
     Model representing a company in the database.
     The class handles CRUD operations (create, read, update, delete) and
@@ -14,7 +18,9 @@ class Company(db.Model):
     phone = db.Column(db.String(20))
 
     # One-to-Many relationship with products
-    products = db.relationship('Product', back_populates='company', cascade='all, delete')
+    # passive_deletes leaves the deletion of products to the database's ON DELETE CASCADE,
+    # so they are not loaded into memory and deleted one by one
+    products = db.relationship('Product', back_populates='company', cascade='all, delete', passive_deletes=True)
 
     def __repr__(self):
         """
@@ -64,6 +70,47 @@ class Company(db.Model):
         """
         return cls.query.all()
 
+    @classmethod
+    def get_companies_by_nits(cls, nits):
+        """
+        Retrieves several companies by their NITs with one IN query.
+
+        Args:
+            nits (list[str]): The NITs of the companies to search for.
+
+        Returns:
+            list: The companies found, in no particular order.
+        """
+        return cls.query.filter(cls.nit.in_(nits)).all()
+
+    @classmethod
+    def get_inventory_valuation(cls, nit=None):
+        """
+        Computes the inventory value of each company, SUM(price * quantity) of its
+        active products, with one GROUP BY query over the integer cent prices.
+
+        Args:
+            nit (str, optional): Restricts the valuation to one company.
+
+        Returns:
+            list[Row]: Rows of (nit, name, product_count, total_quantity, total_value_cents).
+        """
+        query = (
+            db.select(
+                cls.nit,
+                cls.name,
+                db.func.count(Product.id).label('product_count'),
+                db.func.coalesce(db.func.sum(Product.quantity), 0).label('total_quantity'),
+                db.func.coalesce(db.func.sum(Product.price_cents * Product.quantity), 0).label('total_value_cents')
+            )
+            .outerjoin(Product, Product.company_nit == cls.nit)
+            .group_by(cls.nit, cls.name)
+            .order_by(cls.nit)
+        )
+        if nit is not None:
+            query = query.where(cls.nit == nit)
+        return db.session.execute(query).all()
+
     def update_company(self, name=None, address=None, phone=None):
         """
         Updates a company's data in the database.
@@ -88,7 +135,11 @@ class Company(db.Model):
     @classmethod
     def delete_company(cls, nit):
         """
-        Deletes a company from the database using its NIT.
+        Soft-deletes a company and its products using its NIT.
+
+        The products are marked with one set-based UPDATE. The rows are
+        hard-deleted later by the purge job, where the database removes the
+        products and their order/category links with ON DELETE CASCADE.
         
         Args:
             nit (str): The NIT of the company to delete.
@@ -98,7 +149,79 @@ class Company(db.Model):
         """
         company = cls.query.get(nit)
         if company:
-            db.session.delete(company)
+            company.soft_delete(commit=False)
+            Product.query.filter_by(company_nit=nit, deleted_at=None).execution_options(
+                stats={'companies': [nit], 'categories': cls._product_categories(nit)}
+            ).update({Product.deleted_at: company.deleted_at}, synchronize_session=False)
+            Change.record_query('product', 'delete', db.select(Product.id).where(
+                Product.company_nit == nit, Product.deleted_at == company.deleted_at
+            ))
             db.session.commit()
             return True
         return False
+
+    @classmethod
+    def delete_company_in_batches(cls, nit, batch_size=5000):
+        """
+        Soft-deletes a company by first soft-deleting its products in batches.
+
+        Each batch is committed on its own, so locks are held only for the
+        duration of one batch instead of the whole catalog. Meant for companies
+        with very large catalogs, usually run in the background.
+
+        Args:
+            nit (str): The NIT of the company to delete.
+            batch_size (int, optional): The number of products deleted per transaction. Defaults to 5000.
+
+        Returns:
+            bool: True if the company was deleted, False if the company was not found.
+        """
+        company = cls.query.get(nit)
+        if company is None:
+            return False
+
+        deleted_at = datetime.utcnow()
+        while True:
+            ids = db.session.scalars(
+                db.select(Product.id)
+                .where(Product.company_nit == nit, Product.deleted_at.is_(None))
+                .limit(batch_size)
+            ).all()
+            db.session.execute(
+                db.update(Product).where(Product.id.in_(ids)).values(deleted_at=deleted_at),
+                execution_options={'synchronize_session': False, 'stats': {'companies': [nit], 'products': ids}}
+            )
+            Change.record_query('product', 'delete', db.select(Product.id).where(Product.id.in_(ids)))
+            db.session.commit()
+            if len(ids) < batch_size:
+                break
+
+        company.deleted_at = deleted_at
+        db.session.commit()
+        return True
+
+    def restore_company(self):
+        """
+        Restores a soft-deleted company together with the products deleted along with it.
+
+        Returns:
+            Company: The restored company.
+        """
+        restored = db.select(Product.id).where(Product.company_nit == self.nit, Product.deleted_at == self.deleted_at)
+        Change.record_query('product', 'restore', restored)
+        Product.query.filter(Product.company_nit == self.nit, Product.deleted_at == self.deleted_at).execution_options(
+            stats={'companies': [self.nit], 'categories': self._product_categories(self.nit)}
+        ).update({Product.deleted_at: None}, synchronize_session=False)
+        self.restore()
+        return self
+
+    @staticmethod
+    def _product_categories(nit):
+        """
+        The IDs of the categories linked to the products of a company, whose summaries change with its catalog.
+        """
+        return db.session.scalars(
+            db.select(product_category.c.category_id).distinct()
+            .join(Product, Product.id == product_category.c.product_id)
+            .where(Product.company_nit == nit)
+        ).all()
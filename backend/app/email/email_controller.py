@@ -1,76 +1,82 @@
-from flask import Blueprint, request, jsonify
-import boto3
-import base64
-from app.config import Config
-from botocore.exceptions import BotoCoreError, ClientError
+from flask import Blueprint, current_app, request, jsonify
+from app.idempotency.decorators import idempotent
+from app.email.mailer import build_message, parse_recipients, run_email_job
+from app.email.models import EmailJob
+from app.tasks import run_in_background
 
-email_bp = Blueprint('email_controller', __name__, url_prefix='/api/email')
-
-# Initialize the SES client
-SES = boto3.client(
-    'ses',
-    region_name=Config.SES_REGION_NAME,
-    aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY
-)
+# Default maximum number of recipients of one request
+MAX_RECIPIENTS = 500
 
-sender = Config.SES_EMAIL_SOURCE
+email_bp = Blueprint('email_controller', __name__, url_prefix='/api/email')
 
+# Route to email a PDF report in the background
 @email_bp.route('/send-email', methods=['POST'])
+@idempotent
 def send_email():
+    """
+    Emails an uploaded PDF report to one or more recipients.
+
+    Expected form fields:
+        - file: The PDF file (required)
+        - email: A recipient; may be repeated or hold comma-separated addresses (required)
+
+    The message, with the PDF encoded once, is sent to each recipient separately
+    through SES in a background job, within the account's send rate (see
+    `app.email.mailer.SendQuota`). Its progress and the result of each recipient
+    are available at GET /api/email/jobs/<job_id>.
+
+    Returns:
+        - A JSON response with the email job.
+        - Status code 202 if the job was created, 400 if the data is invalid.
+    """
+    # Check if required data is provided in the request
+    if 'file' not in request.files or 'email' not in request.form:
+        return jsonify({'error': 'Missing email or file data'}), 400
+
+    pdf_file = request.files['file']
     try:
-        # Check if required data is provided in the request
-        if 'file' not in request.files or 'email' not in request.form:
-            return jsonify({'error': 'Missing email or file data'}), 400
-        
-        pdf_file = request.files['file']
-        to_email = request.form['email']
-
-        if not pdf_file or not to_email:
-            return jsonify({'error': 'Invalid email or file data'}), 400
-
-        # Read the PDF file content
-        pdf_content = pdf_file.read()
-
-        # Encode the PDF content to base64
-        encoded_pdf = base64.b64encode(pdf_content).decode('utf-8')
-
-        # Create the raw email message
-        subject = "Reporte de Inventario"
-        body_text = "Adjunto encontrarás el reporte de inventario en formato PDF."
-        raw_email = f"""From: {sender}
-To: {to_email}
-Subject: {subject}
-MIME-Version: 1.0
-Content-Type: multipart/mixed; boundary="NextPart"
-
---NextPart
-Content-Type: text/plain; charset="UTF-8"
-Content-Transfer-Encoding: 7bit
-
-{body_text}
-
---NextPart
-Content-Type: application/pdf; name="inventory_report.pdf"
-Content-Transfer-Encoding: base64
-Content-Disposition: attachment; filename="inventory_report.pdf"
-
-{encoded_pdf}
---NextPart--"""
-
-        # Send the email using SES
-        response = SES.send_raw_email(
-            Source=sender,
-            Destinations=[to_email],
-            RawMessage={'Data': raw_email}
-        )
-
-        return jsonify({'message': 'Email sent successfully', 'message_id': response['MessageId']}), 200
-
-    except (BotoCoreError, ClientError) as error:
-        print(error)
-        return jsonify({'error': str(error)}), 500
-
-    except Exception as e:
-        print(e)
-        return jsonify({'error': str(e)}), 500
+        recipients = parse_recipients([address for value in request.form.getlist('email')
+                                       for address in value.split(',')])
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    if not pdf_file:
+        return jsonify({'error': 'Invalid email or file data'}), 400
+
+    limit = current_app.config.get('EMAIL_MAX_RECIPIENTS', MAX_RECIPIENTS)
+    if len(recipients) > limit:
+        return jsonify({'error': f'At most {limit} recipients per request'}), 400
+
+    # Build the message once; with several recipients the To header doesn't list them
+    raw_email = build_message(
+        subject='Reporte de Inventario',
+        body_text='Adjunto encontrarás el reporte de inventario en formato PDF.',
+        attachment=pdf_file.read(),
+        filename='inventory_report.pdf',
+        to=recipients[0] if len(recipients) == 1 else None
+    )
+    job = EmailJob.create_job(recipients)
+    run_in_background(run_email_job, job.id, raw_email)
+    return jsonify(job.to_dict()), 202
+
+# Route to get the progress of an email job
+@email_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_email_job(job_id):
+    """
+    Retrieves the status of an email job and the result of each recipient sent so far.
+
+    A job that stopped recording progress (its process exited) is reported as failed,
+    with the recipients it didn't reach.
+
+    Args:
+        job_id (int): The ID of the email job.
+
+    Returns:
+        - A JSON response with the job, including `results`: {email, status: 'sent',
+          message_id} or {email, status: 'failed', error} per recipient.
+        - Status code 200 if successful, 404 if the job is not found.
+    """
+    job = EmailJob.get_job_by_id(job_id)
+    if not job:
+        return jsonify({'error': 'Email job not found'}), 404
+    job.fail_if_abandoned()
+    return jsonify(job.to_dict())
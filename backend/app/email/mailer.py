@@ -0,0 +1,257 @@
+import re
+import threading
+import time
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+from flask import current_app
+from app import db
+from app.config import Config
+from app.email.models import EmailJob
+
+# SES accepts at most 50 recipients per message
+MAX_RECIPIENTS_PER_MESSAGE = 50
+
+# Loose check of an email address; SES rejects the invalid ones that pass
+EMAIL = re.compile(r'^[^@\s,;]+@[^@\s,;]+\.[^@\s,;]+$')
+
+# Initialize the SES client
+SES = boto3.client(
+    'ses',
+    region_name=Config.SES_REGION_NAME,
+    aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+    aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY
+)
+
+sender = Config.SES_EMAIL_SOURCE
+
+
+class SendQuota:
+    """
+    Rate limiter that keeps this process within the account's SES sending quotas:
+    a token bucket refilled at MaxSendRate recipients per second, and the
+    recipients left of the 24-hour quota (Max24HourSend - SentLast24Hours).
+
+    The quotas are read with GetSendQuota and refreshed every SES_QUOTA_REFRESH_SECONDS
+    (300 by default). Each worker process has its own bucket, so with several
+    workers sending at once SES_SEND_RATE_SHARE should be set to the fraction of
+    the rate each one may use (1.0 by default).
+    """
+
+    def __init__(self, client):
+        """
+        Initializes the limiter; the quotas are read on first use.
+        """
+        self.client = client
+        self._lock = threading.Lock()
+        self._rate = None
+        self._tokens = 0.0
+        self._remaining = None
+        self._updated_at = 0.0
+        self._refreshed_at = None
+
+    def _refresh(self, now):
+        """
+        Reads the current quotas from SES. Keeps the previous ones if the call fails.
+        """
+        try:
+            quota = self.client.get_send_quota()
+        except (BotoCoreError, ClientError):
+            if self._rate is None:
+                raise
+            return
+        self._rate = max(quota['MaxSendRate'] * current_app.config.get('SES_SEND_RATE_SHARE', 1.0), 0.1)
+        # A Max24HourSend of -1 means unlimited
+        self._remaining = None if quota['Max24HourSend'] < 0 else quota['Max24HourSend'] - quota['SentLast24Hours']
+        if self._refreshed_at is None:
+            self._tokens = self._rate
+            self._updated_at = now
+        self._refreshed_at = now
+
+    def acquire(self, recipients):
+        """
+        Waits until a message to `recipients` recipients can be sent within the send rate.
+
+        The recipients are taken from the bucket at once, leaving it in debt if
+        needed, and the caller then sleeps outside the lock until the bucket
+        would have held them, so concurrent senders queue up without blocking
+        each other. A message may have more recipients than the bucket holds;
+        it is sent once the bucket is full and the next ones wait for the deficit.
+
+        Args:
+            recipients (int): The number of recipients of the message.
+
+        Returns:
+            bool: True when the message may be sent, False if the 24-hour quota is used up.
+        """
+        with self._lock:
+            now = time.monotonic()
+            refresh_seconds = current_app.config.get('SES_QUOTA_REFRESH_SECONDS', 300)
+            if self._refreshed_at is None or now - self._refreshed_at >= refresh_seconds:
+                self._refresh(now)
+            if self._remaining is not None and recipients > self._remaining:
+                return False
+            self._tokens = min(self._rate, self._tokens + (now - self._updated_at) * self._rate)
+            self._updated_at = now
+            wait = max(0.0, (min(recipients, self._rate) - self._tokens) / self._rate)
+            self._tokens -= recipients
+            if self._remaining is not None:
+                self._remaining -= recipients
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+# Sending quotas of this process
+quota = SendQuota(SES)
+
+
+def build_message(subject, body_text, attachment=None, filename=None, to=None):
+    """
+    Builds a raw email with a text body and an optional PDF attachment.
+
+    Args:
+        subject (str): The subject.
+        body_text (str): The plain text body.
+        attachment (bytes, optional): The PDF to attach.
+        filename (str, optional): The name of the attachment.
+        to (str, optional): The To header. Defaults to 'undisclosed-recipients:;', so the
+            recipients of a shared message don't see each other.
+
+    Returns:
+        bytes: The raw MIME message.
+    """
+    message = MIMEMultipart()
+    message['Subject'] = subject
+    message['From'] = sender
+    message['To'] = to or 'undisclosed-recipients:;'
+    message.attach(MIMEText(body_text, 'plain', 'utf-8'))
+    if attachment is not None:
+        part = MIMEApplication(attachment, 'pdf', Name=filename)
+        part['Content-Disposition'] = f'attachment; filename="{filename}"'
+        message.attach(part)
+    return message.as_bytes()
+
+
+def parse_recipients(recipients):
+    """
+    Validates a list of recipients (or a comma-separated string of them).
+
+    Returns:
+        list[str]: The addresses, lowercased, without duplicates.
+
+    Raises:
+        ValueError: If the list is empty or an address is invalid.
+    """
+    if isinstance(recipients, str):
+        recipients = recipients.split(',')
+    if not isinstance(recipients, list):
+        raise ValueError('recipients must be a list of email addresses')
+    addresses = list(dict.fromkeys(str(address).strip().lower() for address in recipients if str(address).strip()))
+    if not addresses:
+        raise ValueError('recipients must have at least one email address')
+    invalid = [address for address in addresses if not EMAIL.match(address)]
+    if invalid:
+        raise ValueError(f'Invalid email address: {invalid[0]}')
+    return addresses
+
+
+def group_by_domain(recipients):
+    """
+    Groups email addresses by domain, in chunks of at most MAX_RECIPIENTS_PER_MESSAGE,
+    so each message goes to one receiving mail server.
+
+    Returns:
+        list[list[str]]: The chunks of recipients, ordered by domain.
+    """
+    domains = {}
+    for address in dict.fromkeys(address.strip().lower() for address in recipients):
+        domains.setdefault(address.rpartition('@')[2], []).append(address)
+    return [addresses[start:start + MAX_RECIPIENTS_PER_MESSAGE]
+            for _, addresses in sorted(domains.items())
+            for start in range(0, len(addresses), MAX_RECIPIENTS_PER_MESSAGE)]
+
+
+def send_raw(destinations, raw_message):
+    """
+    Sends a raw message through SES, waiting for the send rate.
+
+    Returns:
+        str: The SES MessageId.
+
+    Raises:
+        RuntimeError: If the 24-hour sending quota is used up.
+        BotoCoreError, ClientError: If SES rejects the message.
+    """
+    if not quota.acquire(len(destinations)):
+        raise RuntimeError('The SES 24-hour sending quota is used up')
+    response = SES.send_raw_email(Source=sender, Destinations=destinations, RawMessage={'Data': raw_message})
+    return response['MessageId']
+
+
+def send_to_each(recipients, raw_message, progress=None):
+    """
+    Sends the same raw message to each recipient separately, so a rejected
+    address doesn't affect the others, waiting for the send rate. Once the
+    24-hour quota is used up the remaining recipients are not tried.
+
+    Args:
+        recipients (list[str]): The email addresses.
+        raw_message (bytes): The message, built once (e.g. with its attachment encoded once).
+        progress (callable, optional): Called with the results so far after each recipient.
+
+    Returns:
+        list[dict]: {email, status: 'sent', message_id} or {email, status: 'failed', error} per recipient.
+    """
+    results = []
+    quota_error = None
+    for address in recipients:
+        if quota_error is not None:
+            results.append({'email': address, 'status': 'failed', 'error': quota_error})
+        else:
+            try:
+                results.append({'email': address, 'status': 'sent', 'message_id': send_raw([address], raw_message)})
+            except RuntimeError as error:
+                quota_error = str(error)
+                results.append({'email': address, 'status': 'failed', 'error': quota_error})
+            except (BotoCoreError, ClientError) as error:
+                current_app.logger.warning('Email to %s failed: %s', address, error)
+                results.append({'email': address, 'status': 'failed', 'error': str(error)})
+        if progress is not None:
+            progress(results)
+    return results
+
+
+def run_email_job(job_id, raw_message):
+    """
+    Sends the message of an email job, recording the result of each recipient
+    as it goes so the status endpoint shows its progress and an interrupted job
+    knows exactly who got the email (see `EmailJob.fail_if_abandoned`).
+
+    Args:
+        job_id (int): The email job to run.
+        raw_message (bytes): The message, built once.
+
+    Returns:
+        EmailJob: The finished job.
+    """
+    job = EmailJob.get_job_by_id(job_id)
+    job.status = 'running'
+    db.session.commit()
+
+    try:
+        results = send_to_each(job.recipients, raw_message, job.record_results)
+    except Exception as error:
+        db.session.rollback()
+        job.status = 'failed'
+        job.message = str(error)[:1000]
+        db.session.commit()
+        raise
+
+    sent = any(result['status'] == 'sent' for result in results)
+    if not sent and results:
+        job.message = results[0]['error']
+    job.record_results(results, status='completed' if sent else 'failed')
+    return job
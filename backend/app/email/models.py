@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+from app import db
+
+# A pending or running job that has not recorded progress for this long was abandoned (e.g. by a restart)
+STALE_AFTER = timedelta(minutes=5)
+
+
+class EmailJob(db.Model):
+    """
+    An email sent in the background to a list of recipients.
+
+    Attributes:
+        id (int): The unique identifier of the job (Primary key).
+        status (str): 'pending', 'running', 'completed' or 'failed' (no recipient got the email,
+            or the job was abandoned).
+        recipients (list[str]): The email addresses.
+        results (list[dict]): The result of each recipient sent so far: {email, status: 'sent',
+            message_id} or {email, status: 'failed', error}.
+        sent (int): The number of recipients that got the email.
+        failed (int): The number of recipients the email could not be sent to.
+        message (str): The error that stopped the job.
+        created_at (datetime): When the job was created.
+        updated_at (datetime): When the job last recorded its progress.
+    """
+    __tablename__ = 'email_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    recipients = db.Column(db.JSON, nullable=False)
+    results = db.Column(db.JSON, nullable=False, default=list)
+    sent = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        """
+        String representation of the email job.
+        """
+        return f'<EmailJob {self.id} {self.status}>'
+
+    def to_dict(self, with_results=True):
+        """
+        Serializes the job's progress for the API.
+
+        Args:
+            with_results (bool, optional): Whether to include the result of each recipient. Defaults to True.
+
+        Returns:
+            dict: The job as a JSON-compatible dictionary.
+        """
+        job = {
+            'id': self.id,
+            'status': self.status,
+            'recipients': len(self.recipients),
+            'sent': self.sent,
+            'failed': self.failed,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+        if with_results:
+            job['results'] = self.results
+        return job
+
+    @classmethod
+    def create_job(cls, recipients):
+        """
+        Creates a pending email job.
+
+        Args:
+            recipients (list[str]): The validated email addresses.
+
+        Returns:
+            EmailJob: The new job.
+        """
+        job = cls(recipients=recipients, results=[])
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @classmethod
+    def get_job_by_id(cls, job_id):
+        """
+        Fetches an email job by its ID.
+
+        Returns:
+            EmailJob: The job if found, otherwise None.
+        """
+        return db.session.get(cls, job_id)
+
+    def record_results(self, results, status=None):
+        """
+        Stores the results so far and commits.
+
+        Args:
+            results (list[dict]): The result of each recipient sent so far.
+            status (str, optional): The new status of the job.
+        """
+        self.results = list(results)
+        self.sent = sum(1 for result in results if result['status'] == 'sent')
+        self.failed = len(results) - self.sent
+        if status is not None:
+            self.status = status
+        db.session.commit()
+
+    def fail_if_abandoned(self):
+        """
+        Marks the job as failed if it stopped recording progress for STALE_AFTER,
+        which happens when the process sending it exits. The recipients without a
+        result are reported as not sent; progress is recorded after each recipient,
+        so at most the one being sent when the process exited may have got it.
+
+        Returns:
+            bool: Whether the job was abandoned.
+        """
+        if self.status not in ('pending', 'running') or datetime.utcnow() - self.updated_at < STALE_AFTER:
+            return False
+        done = {result['email'] for result in self.results}
+        results = self.results + [{'email': address, 'status': 'failed', 'error': 'Not sent: the job was interrupted'}
+                                  for address in self.recipients if address not in done]
+        self.message = 'The job was interrupted before sending to every recipient'
+        self.record_results(results, status='failed')
+        return True
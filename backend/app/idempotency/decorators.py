@@ -0,0 +1,142 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+import click
+from flask import current_app, request, jsonify, make_response
+from flask.cli import AppGroup
+from app import db
+from app.auth.decorators import get_client_key
+from app.idempotency.models import IdempotencyKey
+
+# Header carrying the client's key
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# Header added to replayed responses
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Maximum length of a key
+MAX_KEY_LENGTH = 255
+
+# Form content types whose fields are fingerprinted instead of the raw body (the multipart boundary changes on retries)
+FORM_MIMETYPES = ('multipart/form-data', 'application/x-www-form-urlencoded')
+
+
+def _fingerprint():
+    """
+    Hashes the parts of the request a retry must repeat: method, query string and body.
+
+    JSON bodies are hashed in canonical form and form bodies by their fields and
+    file contents, so a retry that serializes the same data differently still matches.
+
+    Returns:
+        str: The hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'?' + request.query_string)
+    if request.mimetype in FORM_MIMETYPES:
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f'\0{name}={value}'.encode())
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f'\0{name}:{file.filename}:'.encode())
+            digest.update(file.read())
+            file.seek(0)
+    else:
+        data = request.get_json(silent=True) if request.is_json else None
+        if data is not None:
+            digest.update(json.dumps(data, sort_keys=True, separators=(',', ':')).encode())
+        else:
+            digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _replay(record):
+    """
+    Builds the response of a completed key.
+    """
+    response = current_app.response_class(record.body, status=record.status_code, content_type=record.content_type)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Makes a POST route safe to retry with an `Idempotency-Key` header.
+
+    The first request with a key runs normally and its response is stored for
+    IDEMPOTENCY_TTL_SECONDS (24 hours by default). A retry with the same key on
+    the same path from the same client (token subject or IP) gets the stored
+    response back without running the route again.
+    Requests without the header are not affected.
+
+    Responses with a 5xx status, and routes that raise, release the key so the
+    client can retry. Reusing a key with a different request returns 422, and a
+    retry that arrives while the first request is still running returns 409.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be between 1 and {MAX_KEY_LENGTH} characters'}), 400
+
+        config = current_app.config
+        fingerprint = _fingerprint()
+        record, claimed = IdempotencyKey.claim(
+            key=key,
+            path=request.path,
+            client=get_client_key(),
+            fingerprint=fingerprint,
+            ttl=timedelta(seconds=config.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60)),
+            lock_timeout=timedelta(seconds=config.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+        )
+
+        if not claimed:
+            if record is not None and record.fingerprint != fingerprint:
+                return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'}), 422
+            if record is None or not record.completed:
+                response = jsonify({'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            return _replay(record)
+
+        record_id = record.id
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.release(record_id)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            db.session.rollback()
+            IdempotencyKey.release(record_id)
+        else:
+            IdempotencyKey.complete(record_id, response.status_code, response.content_type, response.get_data())
+        return response
+
+    return wrapper
+
+
+# CLI commands: flask idempotency prune
+idempotency_cli = AppGroup('idempotency', help='Manage stored idempotency keys.')
+
+
+@idempotency_cli.command('prune')
+@click.option('--batch-size', default=1000, show_default=True, help='Keys deleted per transaction.')
+def prune_command(batch_size):
+    """
+    Delete the idempotency keys whose TTL has expired.
+    """
+    pruned = IdempotencyKey.prune(batch_size=batch_size)
+    print(f'Pruned {pruned} expired idempotency keys')
+
+
+def init_app(app):
+    """
+    Register the idempotency CLI commands on the application.
+    """
+    app.cli.add_command(idempotency_cli)
@@ -0,0 +1,150 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    The stored outcome of a POST request sent with an `Idempotency-Key` header.
+
+    A retry with the same key and path from the same client gets the stored
+    response back instead of running the request again; another client using
+    the same key gets a key of its own. Rows expire after a TTL; expired keys can be
+    reused and are deleted by `flask idempotency prune`.
+
+    Attributes:
+        id (int): The unique identifier of the row (Primary key).
+        key (str): The value of the Idempotency-Key header.
+        path (str): The request path the key was used on.
+        client (str): The client that sent the key (see `app.auth.decorators.client_key`).
+        fingerprint (str): SHA-256 of the request method, query string and body.
+        status_code (int): The stored response status; None while the request is running.
+        content_type (str): The stored response content type.
+        body (bytes): The stored response body.
+        locked_at (datetime): When the request that owns the key started running.
+        created_at (datetime): When the key was first used.
+        expires_at (datetime): When the key stops being replayed.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (db.UniqueConstraint('key', 'path', 'client', name='uq_idempotency_keys_key_path_client'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    client = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    content_type = db.Column(db.String(100))
+    body = db.Column(db.LargeBinary)
+    locked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        """
+        String representation of the idempotency key.
+        """
+        return f'<IdempotencyKey {self.key} {self.path}>'
+
+    @property
+    def completed(self):
+        """
+        Whether the response of the request has been stored.
+        """
+        return self.status_code is not None
+
+    @classmethod
+    def claim(cls, key, path, client, fingerprint, ttl, lock_timeout):
+        """
+        Reserves a key for the current request, or returns the request that already holds it.
+
+        The reservation is committed before the request runs, so a concurrent retry
+        finds it (the unique constraint on key, path and client decides which one wins). A
+        key still running after `lock_timeout` is considered abandoned, e.g. by a
+        crashed worker, and is taken over.
+
+        Args:
+            key (str): The value of the Idempotency-Key header.
+            path (str): The request path.
+            client (str): The client key of the request.
+            fingerprint (str): The fingerprint of the request.
+            ttl (timedelta): How long the stored response is replayed.
+            lock_timeout (timedelta): How long a running request keeps the key.
+
+        Returns:
+            tuple: (IdempotencyKey or None, claimed). `claimed` is True when the
+            current request must run and store its response.
+        """
+        now = datetime.utcnow()
+        record = cls.query.filter_by(key=key, path=path, client=client).first()
+        if record is not None and record.expires_at <= now:
+            db.session.delete(record)
+            db.session.commit()
+            record = None
+
+        if record is None:
+            record = cls(key=key, path=path, client=client, fingerprint=fingerprint, locked_at=now, created_at=now,
+                         expires_at=now + ttl)
+            db.session.add(record)
+            try:
+                db.session.commit()
+                return record, True
+            except IntegrityError:
+                # A concurrent request with the same key committed first
+                db.session.rollback()
+                return cls.query.filter_by(key=key, path=path, client=client).first(), False
+
+        if not record.completed and record.fingerprint == fingerprint and record.locked_at <= now - lock_timeout:
+            taken = db.session.execute(
+                db.update(cls)
+                .where(cls.id == record.id, cls.status_code.is_(None), cls.locked_at == record.locked_at)
+                .values(locked_at=now)
+            ).rowcount
+            db.session.commit()
+            return record, taken == 1
+        return record, False
+
+    @classmethod
+    def complete(cls, record_id, status_code, content_type, body):
+        """
+        Stores the response of a claimed key so retries replay it.
+        """
+        db.session.execute(
+            db.update(cls)
+            .where(cls.id == record_id)
+            .values(status_code=status_code, content_type=content_type, body=body)
+        )
+        db.session.commit()
+
+    @classmethod
+    def release(cls, record_id):
+        """
+        Deletes a claimed key whose request failed, so a retry runs it again.
+        """
+        db.session.execute(db.delete(cls).where(cls.id == record_id))
+        db.session.commit()
+
+    @classmethod
+    def prune(cls, before=None, batch_size=1000):
+        """
+        Deletes the keys that expired before a given moment, in batches.
+
+        Args:
+            before (datetime, optional): Keys expired before this are deleted. Defaults to now.
+            batch_size (int, optional): The number of rows deleted per transaction. Defaults to 1000.
+
+        Returns:
+            int: The number of keys deleted.
+        """
+        before = before or datetime.utcnow()
+        pruned = 0
+        while True:
+            batch = db.select(cls.id).where(cls.expires_at < before).limit(batch_size)
+            result = db.session.execute(
+                db.delete(cls).where(cls.id.in_(batch)),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            pruned += result.rowcount
+            if result.rowcount < batch_size:
+                return pruned
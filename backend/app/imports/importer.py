@@ -0,0 +1,224 @@
+import csv
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from app import db
+from app.company.models import Company
+from app.imports.models import ImportJob, ImportRowError
+from app.product.models import Product, parse_price
+
+# File types that can be imported
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+# Maximum length of the text columns
+MAX_LENGTHS = {'code': 100, 'name': 100}
+
+
+def read_rows(path):
+    """
+    Streams the data rows of a CSV or Excel file as dictionaries keyed by the header.
+
+    Args:
+        path (str): The file to read; its extension selects the format.
+
+    Yields:
+        dict: One row per line after the header.
+
+    Raises:
+        ValueError: If the file type is not supported or openpyxl is missing for Excel files.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            yield from csv.DictReader(file)
+    elif extension == '.xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError('Importing Excel files requires the openpyxl package')
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else '' for cell in next(rows, ())]
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f'Unsupported file type {extension!r}, expected one of {", ".join(SUPPORTED_EXTENSIONS)}')
+
+
+def _text(value):
+    """
+    Converts a cell to stripped text; whole numbers from spreadsheets lose their '.0'.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _integer(value, column, required=True):
+    """
+    Converts a cell to a non-negative integer.
+
+    Raises:
+        ValueError: If the cell is missing (when required) or not a whole non-negative number.
+    """
+    text = _text(value)
+    if not text:
+        if required:
+            raise ValueError(f'Missing {column}')
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        raise ValueError(f'Invalid {column}: {text}')
+    if not number.is_integer() or number < 0:
+        raise ValueError(f'Invalid {column}: {text}')
+    return int(number)
+
+
+def validate_rows(first_row, rows, company_nit=None):
+    """
+    Validates and normalizes a chunk of rows. Runs in the worker processes.
+
+    Args:
+        first_row (int): The number of the chunk's first data row in the file.
+        rows (list[dict]): The raw rows, keyed by the file's header.
+        company_nit (str, optional): The company of rows without a company_nit column.
+
+    Returns:
+        tuple: (products, errors). Products are dicts ready for `Product.upsert_by_code`
+        plus their 'row' number; errors are dicts with row, code and message.
+    """
+    products, errors = [], []
+    for number, raw in enumerate(rows, start=first_row):
+        row = {str(key).strip().lower(): value for key, value in raw.items() if key is not None}
+        code = _text(row.get('code'))
+        try:
+            for column in ('code', 'name'):
+                if not _text(row.get(column)):
+                    raise ValueError(f'Missing {column}')
+                if len(_text(row.get(column))) > MAX_LENGTHS[column]:
+                    raise ValueError(f'{column} is longer than {MAX_LENGTHS[column]} characters')
+            if not _text(row.get('price')):
+                raise ValueError('Missing price')
+            products.append({
+                'row': number,
+                'code': code,
+                'name': _text(row.get('name')),
+                'description': _text(row.get('description')) or None,
+                'price': parse_price(_text(row.get('price'))),
+                'quantity': _integer(row.get('quantity'), 'quantity'),
+                'company_nit': _text(row.get('company_nit')) or company_nit,
+                'reorder_level': _integer(row.get('reorder_level'), 'reorder_level', required=False)
+            })
+        except ValueError as error:
+            errors.append({'row': number, 'code': code[:100] or None, 'message': str(error)[:500]})
+    return products, errors
+
+
+def _chunks(rows, size, start):
+    """
+    Groups rows into lists of `size`, numbered from `start`.
+
+    Yields:
+        tuple: (number of the chunk's first row, list of rows).
+    """
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _write_batch(job, count, products, errors):
+    """
+    Upserts a validated chunk and commits it together with the job's progress.
+
+    Rows of unknown companies are rejected here, since workers can't query the
+    database. When a code appears more than once in the chunk, its last row wins.
+    """
+    nits = {product['company_nit'] for product in products if product['company_nit']}
+    known = set(db.session.scalars(db.select(Company.nit).where(Company.nit.in_(nits)))) if nits else set()
+
+    rows = {}
+    for product in products:
+        if product['company_nit'] and product['company_nit'] not in known:
+            errors.append({'row': product['row'], 'code': product['code'],
+                           'message': f"Company not found: {product['company_nit']}"})
+        else:
+            rows[product['code']] = {key: value for key, value in product.items() if key != 'row'}
+
+    created, updated = Product.upsert_by_code(list(rows.values())) if rows else (0, 0)
+    if errors:
+        db.session.execute(db.insert(ImportRowError), [dict(error, job_id=job.id) for error in errors])
+
+    job.processed_rows += count
+    job.created += created
+    job.updated += updated
+    job.error_count += len(errors)
+    db.session.commit()
+
+
+def run_import(job_id, workers=None, batch_size=1000, progress=None, remove_file=False):
+    """
+    Runs or resumes an import job.
+
+    The main process streams the file in chunks of `batch_size` rows and hands
+    them to a pool of `workers` processes that parse and validate them. The
+    validated chunks are written back in file order, one upsert and one commit
+    per chunk. A job that stops can be resumed: the rows already committed
+    (`processed_rows`) are skipped.
+
+    Args:
+        job_id (int): The import job to run.
+        workers (int, optional): Validation processes. Defaults to the number of CPUs.
+        batch_size (int, optional): Rows per chunk and per transaction. Defaults to 1000.
+        progress (callable, optional): Called with the job after each committed chunk.
+        remove_file (bool, optional): Whether to delete the file once the job completes.
+
+    Returns:
+        ImportJob: The finished job.
+    """
+    workers = workers or os.cpu_count() or 1
+    job = ImportJob.get_job_by_id(job_id)
+    job.status = 'running'
+    job.message = None
+    db.session.commit()
+
+    try:
+        rows = itertools.islice(read_rows(job.path), job.processed_rows, None)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Keep a few chunks in flight per worker without reading the whole file ahead
+            in_flight = 2 * workers
+            pending = deque()
+            for first_row, chunk in _chunks(rows, batch_size, start=job.processed_rows + 1):
+                pending.append((len(chunk), pool.submit(validate_rows, first_row, chunk, job.company_nit)))
+                while len(pending) >= in_flight or (pending and pending[0][1].done()):
+                    count, future = pending.popleft()
+                    _write_batch(job, count, *future.result())
+                    if progress:
+                        progress(job)
+            while pending:
+                count, future = pending.popleft()
+                _write_batch(job, count, *future.result())
+                if progress:
+                    progress(job)
+    except Exception as error:
+        db.session.rollback()
+        job.status = 'failed'
+        job.message = str(error)[:1000]
+        db.session.commit()
+        raise
+
+    job.status = 'completed'
+    db.session.commit()
+    if remove_file and os.path.exists(job.path):
+        os.remove(job.path)
+    return job
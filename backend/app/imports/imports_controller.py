@@ -0,0 +1,168 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.utils import secure_filename
+from app.imports.importer import SUPPORTED_EXTENSIONS, run_import
+from app.imports.models import ImportJob
+from app.tasks import run_in_background
+
+# Maximum page size of the error listing
+MAX_PER_PAGE = 1000
+
+# A running job that has not committed a batch for this long is considered interrupted
+STALE_AFTER = timedelta(minutes=5)
+
+# Blueprint for bulk imports
+imports_bp = Blueprint('imports_controller', __name__, url_prefix='/api/imports', cli_group='import')
+
+
+def _import_options():
+    """
+    The worker count and batch size configured for imports.
+    """
+    return {
+        'workers': current_app.config.get('IMPORT_WORKERS'),
+        'batch_size': current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    }
+
+# Upload a file of products
+@imports_bp.route('/products', methods=['POST'])
+def upload_products():
+    """
+    Starts importing the products of an uploaded CSV or Excel (.xlsx) file.
+
+    Expected form data:
+        - file: The file, with a header row (code, name, price, quantity and
+          optionally description, company_nit, reorder_level).
+        - company_nit: The company of rows without a company_nit column (optional).
+
+    The file is stored in IMPORT_FOLDER and imported in the background; products
+    are created or updated by code.
+
+    Returns:
+        JSON response with the job, status 202. Poll /api/imports/<id> for progress.
+    """
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return jsonify({'error': 'Missing file'}), 400
+    filename = secure_filename(file.filename)
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        return jsonify({'error': f'Unsupported file type, expected one of {", ".join(SUPPORTED_EXTENSIONS)}'}), 400
+
+    folder = current_app.config.get('IMPORT_FOLDER', os.path.join(current_app.instance_path, 'imports'))
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{uuid.uuid4().hex}{extension}')
+    file.save(path)
+
+    job = ImportJob.create_job(filename=filename, path=path, company_nit=request.form.get('company_nit') or None)
+    run_in_background(run_import, job.id, remove_file=True, **_import_options())
+    return jsonify(job.to_dict()), 202
+
+# Get the progress of an import
+@imports_bp.route('/<int:job_id>', methods=['GET'])
+def get_import(job_id):
+    """
+    Returns the status and counters of an import job.
+    """
+    job = ImportJob.get_job_by_id(job_id)
+    if job is None:
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+# Get the rejected rows of an import
+@imports_bp.route('/<int:job_id>/errors', methods=['GET'])
+def get_import_errors(job_id):
+    """
+    Returns a page of the rows rejected by an import job, in file order.
+
+    Query parameters:
+        page (int, optional): The page number, starting at 1. Defaults to 1.
+        per_page (int, optional): The page size, up to MAX_PER_PAGE. Defaults to 100.
+    """
+    job = ImportJob.get_job_by_id(job_id)
+    if job is None:
+        return jsonify({'error': 'Import not found'}), 404
+
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 100, type=int), MAX_PER_PAGE)
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+
+    pagination = job.get_errors_page(page=page, per_page=per_page)
+    return jsonify({
+        'errors': [error.to_dict() for error in pagination.items],
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }), 200
+
+# Resume an interrupted import
+@imports_bp.route('/<int:job_id>/resume', methods=['POST'])
+def resume_import(job_id):
+    """
+    Resumes a failed or interrupted import job from its last committed batch.
+
+    Returns:
+        JSON response with the job, status 202; 409 if the job is completed or still running.
+    """
+    job = ImportJob.get_job_by_id(job_id)
+    if job is None:
+        return jsonify({'error': 'Import not found'}), 404
+    if job.status == 'completed':
+        return jsonify({'error': 'Import already completed'}), 409
+    if job.status == 'running' and datetime.utcnow() - job.updated_at < STALE_AFTER:
+        return jsonify({'error': 'Import is still running'}), 409
+    if not os.path.exists(job.path):
+        return jsonify({'error': 'The imported file is no longer available'}), 409
+
+    run_in_background(run_import, job.id, remove_file=True, **_import_options())
+    return jsonify(job.to_dict()), 202
+
+
+def _print_progress(job):
+    """
+    Prints the counters of an import job.
+    """
+    click.echo(f'{job.processed_rows} rows: {job.created} created, {job.updated} updated, {job.error_count} errors')
+
+
+def _print_result(job):
+    """
+    Prints the outcome of an import job and where to find its rejected rows.
+    """
+    click.echo(f'Import job {job.id} {job.status}')
+    if job.error_count:
+        click.echo(f'See the rejected rows with GET /api/imports/{job.id}/errors')
+
+# Import products from a file
+@imports_bp.cli.command('products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--company-nit', help='Company of rows without a company_nit column.')
+@click.option('--workers', type=int, help='Validation processes (default: number of CPUs).')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows per transaction.')
+def import_products_command(path, company_nit, workers, batch_size):
+    """
+    Import products from a CSV or Excel file (flask import products <file>).
+    """
+    job = ImportJob.create_job(filename=os.path.basename(path), path=os.path.abspath(path), company_nit=company_nit)
+    click.echo(f'Import job {job.id} (resume with: flask import resume {job.id})')
+    _print_result(run_import(job.id, workers=workers, batch_size=batch_size, progress=_print_progress))
+
+# Resume an import
+@imports_bp.cli.command('resume')
+@click.argument('job_id', type=int)
+@click.option('--workers', type=int, help='Validation processes (default: number of CPUs).')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Rows per transaction.')
+def resume_import_command(job_id, workers, batch_size):
+    """
+    Resume an interrupted import from its last committed batch (flask import resume <id>).
+    """
+    job = ImportJob.get_job_by_id(job_id)
+    if job is None or job.status == 'completed':
+        raise click.ClickException('No unfinished import with that ID')
+    click.echo(f'Resuming import job {job.id} after row {job.processed_rows}')
+    _print_result(run_import(job.id, workers=workers, batch_size=batch_size, progress=_print_progress))
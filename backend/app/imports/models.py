@@ -0,0 +1,133 @@
+from datetime import datetime
+from app import db
+
+
+class ImportJob(db.Model):
+    """
+    A bulk product import from a CSV or Excel file.
+
+    Rows are committed in batches together with the job's progress, so
+    `processed_rows` is always a safe point to resume from after a crash.
+
+    Attributes:
+        id (int): The unique identifier of the job (Primary key).
+        filename (str): The name of the imported file.
+        path (str): Where the file is stored while the job can still be resumed.
+        company_nit (str): The company assigned to rows without a company_nit column.
+        status (str): 'pending', 'running', 'completed' or 'failed'.
+        processed_rows (int): The number of data rows already committed (created, updated or rejected).
+        created (int): The number of products created.
+        updated (int): The number of existing products updated.
+        error_count (int): The number of rejected rows.
+        message (str): The error that stopped a failed job.
+        created_at (datetime): When the job was created.
+        updated_at (datetime): When the job last committed a batch.
+    """
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    company_nit = db.Column(db.String(50))
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    processed_rows = db.Column(db.Integer, nullable=False, default=0)
+    created = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    errors = db.relationship('ImportRowError', back_populates='job', lazy='dynamic', passive_deletes=True)
+
+    def __repr__(self):
+        """
+        String representation of the import job.
+        """
+        return f'<ImportJob {self.id} {self.status}>'
+
+    def to_dict(self):
+        """
+        Serializes the job's progress for the API.
+
+        Returns:
+            dict: The job as a JSON-compatible dictionary.
+        """
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'company_nit': self.company_nit,
+            'status': self.status,
+            'processed_rows': self.processed_rows,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+    @classmethod
+    def create_job(cls, filename, path, company_nit=None):
+        """
+        Creates a pending import job.
+
+        Args:
+            filename (str): The name of the file.
+            path (str): Where the file is stored.
+            company_nit (str, optional): The company of rows without a company_nit column.
+
+        Returns:
+            ImportJob: The new job.
+        """
+        job = cls(filename=filename, path=path, company_nit=company_nit)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @classmethod
+    def get_job_by_id(cls, job_id):
+        """
+        Fetches an import job by its ID.
+
+        Returns:
+            ImportJob: The job if found, otherwise None.
+        """
+        return db.session.get(cls, job_id)
+
+    def get_errors_page(self, page=1, per_page=100):
+        """
+        Retrieves one page of the rejected rows, in file order.
+
+        Returns:
+            Pagination: The ImportRowError objects of the page.
+        """
+        return self.errors.order_by(ImportRowError.row).paginate(page=page, per_page=per_page, error_out=False)
+
+
+class ImportRowError(db.Model):
+    """
+    A row rejected by an import job.
+
+    Attributes:
+        id (int): The unique identifier of the error (Primary key).
+        job_id (int): The import job.
+        row (int): The data row number in the file, starting at 1 after the header.
+        code (str): The product code of the row, if it had one.
+        message (str): Why the row was rejected.
+    """
+    __tablename__ = 'import_row_errors'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('import_jobs.id', ondelete='CASCADE'), nullable=False, index=True)
+    row = db.Column(db.Integer, nullable=False)
+    code = db.Column(db.String(100))
+    message = db.Column(db.String(500), nullable=False)
+
+    job = db.relationship('ImportJob', back_populates='errors')
+
+    def to_dict(self):
+        """
+        Serializes the error for the API.
+        """
+        return {'row': self.row, 'code': self.code, 'message': self.message}
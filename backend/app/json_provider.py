@@ -0,0 +1,23 @@
+from datetime import date
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that keeps the API's number and date formats for the typed columns.
+
+    Prices are stored as Decimal and written as JSON numbers (Flask's default is a
+    string); dates are written in ISO 8601 ('2024-01-31') instead of the HTTP date format.
+    """
+
+    @staticmethod
+    def default(o):
+        """
+        Serializes the types the standard JSON encoder doesn't know.
+        """
+        if isinstance(o, Decimal):
+            return float(o)
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
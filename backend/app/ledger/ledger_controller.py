@@ -0,0 +1,99 @@
+from datetime import datetime
+import click
+from flask import Blueprint, request, jsonify
+from app.ledger.models import BUCKETS, StockMovement, StockRollup
+from app.product.models import Product
+
+# Maximum page size of the movement listing
+MAX_PER_PAGE = 1000
+
+# Blueprint for the stock movement ledger
+ledger_bp = Blueprint('ledger_controller', __name__, url_prefix='/api/ledger', cli_group='ledger')
+
+
+def _get_datetime_arg(name):
+    """
+    Reads an optional ISO 8601 date or date-time query parameter ('2024-01-31' or '2024-01-31T08:00'), in UTC.
+
+    Raises:
+        ValueError: If the parameter is not a valid date.
+    """
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+# Get the stock movements of a product
+@ledger_bp.route('/products/<int:product_id>/movements', methods=['GET'])
+def get_product_movements(product_id):
+    """
+    Returns a page of a product's stock movements, newest first.
+
+    Query parameters:
+        page (int, optional): The page number, starting at 1. Defaults to 1.
+        per_page (int, optional): The page size, up to MAX_PER_PAGE. Defaults to 100.
+        from (str, optional): Only movements at or after this date or date-time.
+        to (str, optional): Only movements before this date or date-time.
+    """
+    if Product.get_product_by_id(product_id) is None:
+        return jsonify({'error': 'Product not found'}), 404
+
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 100, type=int), MAX_PER_PAGE)
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+    try:
+        start, end = _get_datetime_arg('from'), _get_datetime_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 dates or date-times'}), 400
+
+    pagination = StockMovement.get_movements_page(product_id, page=page, per_page=per_page, start=start, end=end)
+    return jsonify({
+        'product_id': product_id,
+        'movements': [movement.to_dict() for movement in pagination.items],
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }), 200
+
+# Get the stock history of a product
+@ledger_bp.route('/products/<int:product_id>/history', methods=['GET'])
+def get_product_history(product_id):
+    """
+    Returns a product's quantity over time, downsampled to hour, day or week buckets.
+
+    The series is read from the precomputed rollups, one row per bucket with
+    movements. A bucket missing from the series had no movements: the quantity
+    stayed at the previous bucket's close (or `start_quantity` for the first ones).
+
+    Query parameters:
+        bucket (str, optional): 'hour', 'day' or 'week'. Defaults to 'day'.
+        from (str, optional): Only buckets starting at or after this date or date-time.
+        to (str, optional): Only buckets starting before this date or date-time.
+    """
+    if Product.get_product_by_id(product_id) is None:
+        return jsonify({'error': 'Product not found'}), 404
+
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f'bucket must be one of {", ".join(BUCKETS)}'}), 400
+    try:
+        start, end = _get_datetime_arg('from'), _get_datetime_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be ISO 8601 dates or date-times'}), 400
+
+    series = StockRollup.get_series(product_id, bucket, start=start, end=end)
+    start_quantity = StockRollup.get_quantity_before(product_id, bucket, start) if start else None
+    return jsonify({
+        'product_id': product_id,
+        'bucket': bucket,
+        'start_quantity': start_quantity if start_quantity is not None else (series[0].open_quantity if series else None),
+        'series': [row.to_dict() for row in series]
+    }), 200
+
+# Recompute the rollups
+@ledger_bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """
+    Recompute the stock history rollups from the ledger (flask ledger rebuild-rollups).
+    """
+    click.echo(f'Wrote {StockRollup.rebuild()} rollup rows')
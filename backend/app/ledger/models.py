@@ -0,0 +1,346 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.routing import RoutingSession
+
+# Granularities of the precomputed history
+BUCKETS = ('hour', 'day', 'week')
+
+
+def bucket_start(moment, bucket):
+    """
+    The start of the hour, day or week (starting on Monday) containing a moment.
+
+    Args:
+        moment (datetime): The moment, in UTC.
+        bucket (str): 'hour', 'day' or 'week'.
+
+    Returns:
+        datetime: The start of the bucket.
+    """
+    if bucket == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+class StockMovement(db.Model):
+    """
+    Append-only ledger of the changes to a product's quantity, written in the
+    same transaction as the change.
+
+    Attributes:
+        id (int): The unique identifier of the movement (Primary key).
+        product_id (int): The product whose quantity changed.
+        warehouse_id (int): The warehouse of a warehouse adjustment, otherwise None.
+        quantity_change (int): The change in quantity; negative when stock left.
+        quantity (int): The product's quantity after the movement.
+        reason (str): 'create', 'update', 'adjust' or 'import'.
+        created_at (datetime): When the movement was recorded.
+    """
+    __tablename__ = 'stock_movements'
+    __table_args__ = (
+        # A product's movements are always read in time order
+        db.Index('ix_stock_movements_product_created', 'product_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id', ondelete='SET NULL'))
+    quantity_change = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        """
+        Serializes the movement for the API.
+        """
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'warehouse_id': self.warehouse_id,
+            'quantity_change': self.quantity_change,
+            'quantity': self.quantity,
+            'reason': self.reason,
+            'created_at': self.created_at.isoformat()
+        }
+
+    @classmethod
+    def get_movements_page(cls, product_id, page=1, per_page=100, start=None, end=None):
+        """
+        Retrieves one page of a product's movements, newest first.
+
+        Args:
+            start (datetime, optional): Only movements at or after this moment.
+            end (datetime, optional): Only movements before this moment.
+
+        Returns:
+            Pagination: The StockMovement objects of the page.
+        """
+        query = db.session.query(cls).filter(cls.product_id == product_id)
+        if start is not None:
+            query = query.filter(cls.created_at >= start)
+        if end is not None:
+            query = query.filter(cls.created_at < end)
+        query = query.order_by(cls.created_at.desc(), cls.id.desc())
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+    @classmethod
+    def record(cls, movements, connection=None):
+        """
+        Appends movements to the ledger and folds them into the rollups, in the current transaction.
+
+        Args:
+            movements (list[dict]): Movements with product_id, quantity_change, quantity,
+                reason and optionally warehouse_id, in the order they happened.
+            connection (Connection, optional): The connection to write with. Defaults to the session's.
+        """
+        if not movements:
+            return
+        connection = connection or db.session.connection()
+        now = datetime.utcnow()
+        rows = [dict({'warehouse_id': None, 'created_at': now}, **movement) for movement in movements]
+        connection.execute(cls.__table__.insert(), rows)
+        StockRollup.fold(rows, connection)
+
+
+class StockRollup(db.Model):
+    """
+    The movements of a product summarized per hour, day and week, maintained
+    together with the ledger so history queries read one row per bucket.
+
+    Buckets without movements have no row: the quantity is the `close_quantity`
+    of the previous bucket.
+
+    Attributes:
+        product_id (int): The product (primary key).
+        bucket (str): 'hour', 'day' or 'week' (primary key).
+        bucket_start (datetime): The start of the bucket, in UTC (primary key).
+        open_quantity (int): The quantity before the first movement of the bucket.
+        close_quantity (int): The quantity after the last movement of the bucket.
+        min_quantity (int): The lowest quantity during the bucket.
+        max_quantity (int): The highest quantity during the bucket.
+        quantity_in (int): The sum of the positive changes.
+        quantity_out (int): The sum of the negative changes, as a positive number.
+        movement_count (int): The number of movements.
+    """
+    __tablename__ = 'stock_rollups'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    bucket = db.Column(db.String(10), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    open_quantity = db.Column(db.Integer, nullable=False)
+    close_quantity = db.Column(db.Integer, nullable=False)
+    min_quantity = db.Column(db.Integer, nullable=False)
+    max_quantity = db.Column(db.Integer, nullable=False)
+    quantity_in = db.Column(db.BigInteger, nullable=False, default=0)
+    quantity_out = db.Column(db.BigInteger, nullable=False, default=0)
+    movement_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        """
+        Serializes the bucket for the API.
+        """
+        return {
+            'bucket_start': self.bucket_start.isoformat(),
+            'open': self.open_quantity,
+            'close': self.close_quantity,
+            'min': self.min_quantity,
+            'max': self.max_quantity,
+            'in': self.quantity_in,
+            'out': self.quantity_out,
+            'movements': self.movement_count
+        }
+
+    @classmethod
+    def get_series(cls, product_id, bucket, start=None, end=None):
+        """
+        Retrieves a product's buckets of one granularity in time order.
+
+        Args:
+            bucket (str): 'hour', 'day' or 'week'.
+            start (datetime, optional): Only buckets starting at or after this moment.
+            end (datetime, optional): Only buckets starting before this moment.
+
+        Returns:
+            list[StockRollup]: The buckets that had movements.
+        """
+        query = cls.query.filter(cls.product_id == product_id, cls.bucket == bucket)
+        if start is not None:
+            query = query.filter(cls.bucket_start >= start)
+        if end is not None:
+            query = query.filter(cls.bucket_start < end)
+        return query.order_by(cls.bucket_start).all()
+
+    @classmethod
+    def get_quantity_before(cls, product_id, bucket, start):
+        """
+        The product's quantity at a moment: the close of the last bucket before it, or None.
+        """
+        return db.session.scalar(
+            db.select(cls.close_quantity)
+            .where(cls.product_id == product_id, cls.bucket == bucket, cls.bucket_start < start)
+            .order_by(cls.bucket_start.desc())
+            .limit(1)
+        )
+
+    @staticmethod
+    def summarize(movements):
+        """
+        Folds movements into one summary row per (product, bucket, bucket start).
+
+        Args:
+            movements (iterable[dict]): Movements in the order they happened.
+
+        Returns:
+            dict: (product_id, bucket, bucket_start) -> rollup row.
+        """
+        rows = {}
+        for movement in movements:
+            after = movement['quantity']
+            change = movement['quantity_change']
+            before = after - change
+            for bucket in BUCKETS:
+                key = (movement['product_id'], bucket, bucket_start(movement['created_at'], bucket))
+                row = rows.get(key)
+                if row is None:
+                    row = rows[key] = {
+                        'product_id': key[0], 'bucket': key[1], 'bucket_start': key[2],
+                        'open_quantity': before, 'close_quantity': after,
+                        'min_quantity': min(before, after), 'max_quantity': max(before, after),
+                        'quantity_in': 0, 'quantity_out': 0, 'movement_count': 0
+                    }
+                row['close_quantity'] = after
+                row['min_quantity'] = min(row['min_quantity'], after)
+                row['max_quantity'] = max(row['max_quantity'], after)
+                row['quantity_in'] += max(change, 0)
+                row['quantity_out'] += max(-change, 0)
+                row['movement_count'] += 1
+        return rows
+
+    @classmethod
+    def fold(cls, movements, connection):
+        """
+        Adds movements to the rollups with one upsert per bucket touched.
+        """
+        rows = list(cls.summarize(movements).values())
+        table = cls.__table__
+
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+            excluded = insert.excluded
+            connection.execute(insert.on_conflict_do_update(
+                index_elements=['product_id', 'bucket', 'bucket_start'],
+                set_={
+                    'close_quantity': excluded.close_quantity,
+                    'min_quantity': db.case((excluded.min_quantity < table.c.min_quantity, excluded.min_quantity),
+                                            else_=table.c.min_quantity),
+                    'max_quantity': db.case((excluded.max_quantity > table.c.max_quantity, excluded.max_quantity),
+                                            else_=table.c.max_quantity),
+                    'quantity_in': table.c.quantity_in + excluded.quantity_in,
+                    'quantity_out': table.c.quantity_out + excluded.quantity_out,
+                    'movement_count': table.c.movement_count + excluded.movement_count
+                }
+            ), rows)
+            return
+
+        for row in rows:
+            key = db.and_(table.c.product_id == row['product_id'], table.c.bucket == row['bucket'],
+                          table.c.bucket_start == row['bucket_start'])
+            updated = connection.execute(table.update().where(key).values(
+                close_quantity=row['close_quantity'],
+                min_quantity=db.case((table.c.min_quantity > row['min_quantity'], row['min_quantity']),
+                                     else_=table.c.min_quantity),
+                max_quantity=db.case((table.c.max_quantity < row['max_quantity'], row['max_quantity']),
+                                     else_=table.c.max_quantity),
+                quantity_in=table.c.quantity_in + row['quantity_in'],
+                quantity_out=table.c.quantity_out + row['quantity_out'],
+                movement_count=table.c.movement_count + row['movement_count']
+            )).rowcount
+            if not updated:
+                connection.execute(table.insert(), row)
+
+    @classmethod
+    def rebuild(cls, batch_size=10000):
+        """
+        Recomputes every rollup from the ledger and commits.
+
+        Returns:
+            int: The number of rollup rows written.
+        """
+        db.session.execute(db.delete(cls))
+        movements = db.session.execute(
+            db.select(StockMovement.product_id, StockMovement.quantity_change, StockMovement.quantity,
+                      StockMovement.created_at)
+            .order_by(StockMovement.product_id, StockMovement.created_at, StockMovement.id)
+            .execution_options(yield_per=batch_size)
+        ).mappings()
+        rows = list(cls.summarize(movements).values())
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(cls.__table__.insert(), rows[start:start + batch_size])
+        db.session.commit()
+        return len(rows)
+
+
+def set_movement_context(product_id, reason, warehouse_id=None, quantity_change=None):
+    """
+    Labels the next quantity change of a product flushed in the current transaction,
+    e.g. as a warehouse adjustment.
+
+    Args:
+        product_id (int): The product.
+        reason (str): The reason recorded in the ledger.
+        warehouse_id (int, optional): The warehouse the change happened in.
+        quantity_change (int, optional): The exact change, when the caller knows it
+            better than the value the product had when it was loaded.
+    """
+    db.session.info.setdefault('stock_movement_context', {})[product_id] = {
+        'reason': reason, 'warehouse_id': warehouse_id, 'quantity_change': quantity_change
+    }
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def record_quantity_movements(session, flush_context):
+    """
+    Writes a movement for every product created with stock or whose quantity changed through the ORM.
+    """
+    context = session.info.get('stock_movement_context', {})
+    movements = []
+    for instance in list(session.new) + list(session.dirty):
+        if getattr(instance, '__tablename__', None) != 'products':
+            continue
+        if instance in session.new:
+            if instance.quantity:
+                movements.append({'product_id': instance.id, 'quantity_change': instance.quantity,
+                                  'quantity': instance.quantity, 'reason': 'create'})
+            continue
+        history = inspect(instance).attrs.quantity.history
+        if not history.has_changes() or not history.added or history.added[0] is None:
+            continue
+        before = history.deleted[0] if history.deleted else None
+        after = history.added[0]
+        if before is None or before == after:
+            continue
+        label = context.pop(instance.id, {})
+        movements.append({
+            'product_id': instance.id,
+            'warehouse_id': label.get('warehouse_id'),
+            'quantity_change': label.get('quantity_change') or after - before,
+            'quantity': after,
+            'reason': label.get('reason', 'update')
+        })
+    StockMovement.record(movements, session.connection())
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def clear_movement_context(session):
+    """
+    Forgets the movement labels once the transaction ends.
+    """
+    session.info.pop('stock_movement_context', None)
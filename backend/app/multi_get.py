@@ -0,0 +1,72 @@
+from flask import current_app, request, jsonify
+
+# Default maximum number of keys one multi-get request may ask for
+MAX_KEYS = 1000
+
+
+def get_requested_keys(name, convert=str):
+    """
+    Reads the keys of a multi-get request: a comma-separated query parameter
+    (`?ids=3,1,2`, which may be repeated) or, for POST requests with long
+    lists, a JSON list in the body (`{"ids": [3, 1, 2]}`).
+
+    Repeated keys are kept once, in the position where they first appear.
+
+    Args:
+        name (str): The parameter, e.g. 'ids' or 'nits'.
+        convert (callable, optional): Converts each key, e.g. `int`. Defaults to `str`.
+
+    Returns:
+        list: The keys in request order, or None if a GET request does not have the parameter.
+
+    Raises:
+        ValueError: If the list is missing from a POST body, is empty, has an invalid key
+            or has more than MULTI_GET_MAX_KEYS keys.
+    """
+    if request.method == 'POST':
+        values = (request.get_json(silent=True) or {}).get(name)
+        if not isinstance(values, list):
+            raise ValueError(f'{name} must be a list')
+    elif name in request.args:
+        values = [value for arg in request.args.getlist(name) for value in arg.split(',')]
+    else:
+        return None
+
+    keys = []
+    for value in values:
+        value = str(value).strip()
+        if not value:
+            continue
+        try:
+            keys.append(convert(value))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value in {name}: {value}') from None
+    keys = list(dict.fromkeys(keys))
+
+    limit = current_app.config.get('MULTI_GET_MAX_KEYS', MAX_KEYS)
+    if not keys:
+        raise ValueError(f'{name} must list at least one value')
+    if len(keys) > limit:
+        raise ValueError(f'{name} can list at most {limit} values')
+    return keys
+
+
+def multi_get_response(keys, records, key_of, serialize):
+    """
+    Builds the response of a multi-get request.
+
+    Args:
+        keys (list): The requested keys, in request order.
+        records (iterable): The records found by one IN query, in any order.
+        key_of (callable): Returns the key of a record.
+        serialize (callable): Serializes a record.
+
+    Returns:
+        tuple: The JSON response with the records found, in request order, and
+            the keys that were not found, and status code 200.
+    """
+    found = {key_of(record): record for record in records}
+    return jsonify({
+        'results': [serialize(found[key]) for key in keys if key in found],
+        'missing': [key for key in keys if key not in found]
+    }), 200
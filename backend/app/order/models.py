@@ -1,29 +1,32 @@
+from datetime import date, datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
 from app import db
+from app.soft_delete import SoftDeleteMixin
 
 
-class Order(db.Model):
+class Order(SoftDeleteMixin, db.Model):
     """
     Represents an order in the database, managing CRUD operations (create, read, update, delete).
     The class establishes a Many-to-One relationship with the Client entity and a Many-to-Many relationship with the Product entity.
     
     Attributes:
         id (int): The primary key, unique identifier for the order.
-        order_date (str): The date the order was placed.
+        order_date (date): The date the order was placed.
         client_id (int): The foreign key referencing the client associated with the order.
         client (Client): The client associated with the order.
         products (list): A list of products associated with the order.
     """
     __tablename__ = 'orders'
     id = db.Column(db.Integer, primary_key=True)
-    order_date = db.Column(db.String(50), nullable=False)
+    order_date = db.Column(db.Date, nullable=False, index=True)
 
     # Many-to-One relationship with client
-    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), index=True)
     client = db.relationship('Client', back_populates='orders')
 
     # Many-to-Many relationship with products
-    products = db.relationship('Product', secondary='order_product', back_populates='orders')
+    products = db.relationship('Product', secondary='order_product', back_populates='orders', passive_deletes=True)
 
     def __repr__(self):
         """
@@ -31,13 +34,30 @@ class Order(db.Model):
         """
         return f'<Order {self.id}>'
 
+    @validates('order_date')
+    def validate_order_date(self, key, order_date):
+        """
+        Converts the order date to a date, accepting ISO 8601 strings ('2024-01-31').
+
+        Raises:
+            ValueError: If the value is not a valid ISO 8601 date.
+        """
+        if isinstance(order_date, datetime):
+            return order_date.date()
+        if isinstance(order_date, date):
+            return order_date
+        try:
+            return datetime.fromisoformat(str(order_date)).date()
+        except ValueError:
+            raise ValueError(f'Invalid order date: {order_date}')
+
     @classmethod
     def create_order(cls, order_date, client_id):
         """
         Creates a new order in the database.
         
         Args:
-            order_date (str): The date the order was placed.
+            order_date (date | str): The date the order was placed.
             client_id (int): The ID of the client placing the order.
         
         Returns:
@@ -76,7 +96,7 @@ class Order(db.Model):
         Updates the details of an existing order.
         
         Args:
-            order_date (str, optional): The new order date.
+            order_date (date | str, optional): The new order date.
             client_id (int, optional): The new client ID associated with the order.
         
         Returns:
@@ -92,7 +112,7 @@ class Order(db.Model):
     @classmethod
     def delete_order(cls, order_id):
         """
-        Deletes an order from the database using its ID.
+        Soft-deletes an order using its ID. It is hard-deleted later by the purge job.
         
         Args:
             order_id (int): The ID of the order to delete.
@@ -102,7 +122,6 @@ class Order(db.Model):
         """
         order = cls.query.get(order_id)
         if order:
-            db.session.delete(order)
-            db.session.commit()
+            order.soft_delete()
             return True
         return False
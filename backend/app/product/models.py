@@ -1,21 +1,70 @@
+from decimal import Decimal, InvalidOperation
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload, validates
 from app import db
+from app.soft_delete import SoftDeleteMixin
+from app.changes.models import Change
+from app.ledger.models import StockMovement
+
+# Prices are stored with two decimals, up to 10 digits before the point
+PRICE_SCALE = Decimal('0.01')
+MAX_PRICE = Decimal('1e10')
+
+
+def cents_to_price(cents):
+    """
+    Converts an amount in integer cents to a Decimal price.
+
+    Args:
+        cents (int): The amount in cents, e.g. 1250.
+
+    Returns:
+        Decimal: The amount with two decimals, e.g. Decimal('12.50').
+    """
+    return Decimal(cents or 0).scaleb(-2)
+
+
+def parse_price(price):
+    """
+    Converts a price to a Decimal with two decimals.
+
+    Args:
+        price (Decimal | float | int | str): The price, e.g. 12.5 or '12.50'.
+
+    Returns:
+        Decimal: The price, e.g. Decimal('12.50').
+
+    Raises:
+        ValueError: If the price is not a number, is negative or is too large.
+    """
+    try:
+        value = Decimal(str(price).strip()).quantize(PRICE_SCALE)
+    except InvalidOperation:
+        raise ValueError(f'Invalid price: {price}')
+    if not value.is_finite() or value < 0 or value >= MAX_PRICE:
+        raise ValueError(f'Invalid price: {price}')
+    return value
 
 # Association table for the many-to-many relationship between products and categories
 product_category = db.Table(
     'product_category',
-    db.Column('product_id', db.Integer, db.ForeignKey('products.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    db.Column('product_id', db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True),
+    # The primary key is (product_id, category_id); browsing by category needs its own index
+    db.Index('ix_product_category_category_id', 'category_id')
 )
 
 # Association table for the many-to-many relationship between orders and products
 order_product = db.Table(
     'order_product',
-    db.Column('order_id', db.Integer, db.ForeignKey('orders.id'), primary_key=True),
-    db.Column('product_id', db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    db.Column('order_id', db.Integer, db.ForeignKey('orders.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('product_id', db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True),
+    # Cascading a product delete looks rows up by product_id, which the (order_id, product_id) key can't serve
+    db.Index('ix_order_product_product_id', 'product_id')
 )
 
-class Product(db.Model):
+class Product(SoftDeleteMixin, db.Model):
     """
     Represents a product in the database, including its attributes and relationships with other entities.
 
@@ -24,30 +73,41 @@ class Product(db.Model):
         code (str): The unique code assigned to the product.
         name (str): The name of the product.
         description (str): A textual description of the product.
-        price (float): The price of the product.
+        price (Decimal): The price of the product, with two decimals.
+        price_cents (int): The price in integer cents, computed by the database from price.
         quantity (int): The available quantity of the product in stock.
+        reorder_level (int): The quantity below which the product is low on stock; None uses the global threshold.
         company_nit (str): The tax identification number (NIT) of the company associated with the product.
         company (Company): The company related to the product (Many-to-One relationship).
         orders (list): The list of orders associated with the product (Many-to-Many relationship).
         categories (list): The list of categories to which the product belongs (Many-to-Many relationship).
+        deleted_at (datetime): When the product was soft-deleted, or None while it is active.
     """
     __tablename__ = 'products'
+    __table_args__ = (
+        # Codes only need to be unique among active products
+        SoftDeleteMixin.active_index('uq_products_code_active', 'code', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    code = db.Column(db.String(100), unique=True, nullable=False)
+    code = db.Column(db.String(100), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Numeric(12, 2), nullable=False)
+    # Integer copy of the price kept by the database, so valuations are exact integer sums
+    price_cents = db.Column(db.BigInteger, db.Computed('CAST(ROUND(price * 100) AS BIGINT)', persisted=True))
     quantity = db.Column(db.Integer, nullable=False)
+    reorder_level = db.Column(db.Integer)
 
     # Many-to-One relationship with Company (a product is associated with one company)
-    company_nit = db.Column(db.String(50), db.ForeignKey('companies.nit'))
+    # The database removes a company's products (and their association rows) when the company is deleted
+    company_nit = db.Column(db.String(50), db.ForeignKey('companies.nit', ondelete='CASCADE'), index=True)
     company = db.relationship('Company', back_populates='products')
 
     # Many-to-Many relationship with Orders (a product can be part of many orders)
-    orders = db.relationship('Order', secondary=order_product, back_populates='products')
+    orders = db.relationship('Order', secondary=order_product, back_populates='products', passive_deletes=True)
 
     # Many-to-Many relationship with Categories (a product can belong to many categories)
-    categories = db.relationship('Category', secondary=product_category, back_populates='products')
+    categories = db.relationship('Category', secondary=product_category, back_populates='products', passive_deletes=True)
 
     def __repr__(self):
         """
@@ -58,8 +118,15 @@ class Product(db.Model):
         """
         return f'<Product {self.name}>'
 
+    @validates('price')
+    def validate_price(self, key, price):
+        """
+        Converts the price to a Decimal with two decimals (see `parse_price`).
+        """
+        return parse_price(price)
+
     @classmethod
-    def create_product(cls, code, name, description, price, quantity, company_nit):
+    def create_product(cls, code, name, description, price, quantity, company_nit, reorder_level=None):
         """
         Creates and saves a new product to the database.
         
@@ -67,18 +134,104 @@ class Product(db.Model):
             code (str): The unique product code.
             name (str): The product's name.
             description (str): A description of the product.
-            price (float): The price of the product.
+            price (Decimal | float | str): The price of the product.
             quantity (int): The available quantity of the product.
             company_nit (str): The NIT of the company associated with the product.
+            reorder_level (int, optional): The quantity below which the product is low on stock.
         
         Returns:
             Product: The newly created product instance.
         """
-        product = cls(code=code, name=name, description=description, price=price, quantity=quantity, company_nit=company_nit)
+        product = cls(code=code, name=name, description=description, price=price, quantity=quantity,
+                      company_nit=company_nit, reorder_level=reorder_level)
         db.session.add(product)
         db.session.commit()
         return product
 
+    @classmethod
+    def upsert_by_code(cls, rows):
+        """
+        Inserts or updates a batch of products keyed on their code, with one
+        statement for the batch, and records the changes. Does not commit.
+
+        Uses `INSERT ... ON CONFLICT (code) DO UPDATE` against the partial unique
+        index of active codes; other databases update the existing codes and
+        insert the rest.
+
+        Args:
+            rows (list[dict]): Validated products with code, name, description,
+                price, quantity, company_nit and reorder_level. Codes must be unique.
+                The quantity of existing products stocked in warehouses is left unchanged.
+
+        Returns:
+            tuple: (number of products created, number of products updated).
+        """
+        from app.warehouse.models import StockLocation
+
+        codes = [row['code'] for row in rows]
+        current = db.session.execute(
+            db.select(cls.code, cls.quantity, cls.id, cls.company_nit).where(cls.code.in_(codes))
+        ).all()
+        previous = {code: quantity for code, quantity, _, _ in current}
+        existing = set(previous)
+        # The batch changes the summaries of the old and new companies and of the existing products' categories
+        stats = {
+            'companies': {row['company_nit'] for row in rows} | {company_nit for _, _, _, company_nit in current},
+            'products': [product_id for _, _, product_id, _ in current]
+        }
+        columns = ('name', 'description', 'price', 'company_nit', 'reorder_level')
+
+        # The quantity of products stocked in warehouses is the sum of their locations and is kept
+        located = db.exists().where(StockLocation.product_id == cls.id)
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert(cls.__table__)
+            values = {column: insert.excluded[column] for column in columns}
+            values['quantity'] = db.case((located, cls.quantity), else_=insert.excluded.quantity)
+            db.session.execute(insert.on_conflict_do_update(
+                index_elements=['code'],
+                index_where=cls.deleted_at.is_(None),
+                set_=values
+            ), rows, execution_options={'stats': stats})
+        else:
+            updated = [row for row in rows if row['code'] in existing]
+            if updated:
+                values = {column: db.bindparam(column) for column in columns}
+                values['quantity'] = db.case((located, cls.quantity), else_=db.bindparam('quantity'))
+                db.session.execute(
+                    db.update(cls.__table__)
+                    .where(cls.code == db.bindparam('match_code'), cls.deleted_at.is_(None))
+                    .values(values),
+                    [dict(row, match_code=row['code']) for row in updated],
+                    execution_options={'stats': stats}
+                )
+            created = [row for row in rows if row['code'] not in existing]
+            if created:
+                db.session.execute(cls.__table__.insert(), created, execution_options={'stats': stats})
+
+        created_codes = [code for code in codes if code not in existing]
+        if created_codes:
+            Change.record_query('product', 'create', db.select(cls.id).where(
+                cls.code.in_(created_codes), cls.deleted_at.is_(None)
+            ))
+        if existing:
+            Change.record_query('product', 'update', db.select(cls.id).where(
+                cls.code.in_(existing), cls.deleted_at.is_(None)
+            ))
+
+        # One ledger movement per product whose quantity the import changed
+        movements = [
+            {'product_id': product_id, 'quantity_change': quantity - previous.get(code, 0),
+             'quantity': quantity, 'reason': 'import'}
+            for product_id, code, quantity in db.session.execute(
+                db.select(cls.id, cls.code, cls.quantity).where(cls.code.in_(codes)).order_by(cls.id)
+            )
+            if quantity != previous.get(code, 0)
+        ]
+        StockMovement.record(movements)
+        return len(created_codes), len(existing)
+
     @classmethod
     def get_product_by_id(cls, product_id):
         """
@@ -102,7 +255,21 @@ class Product(db.Model):
         """
         return cls.query.all()
 
-    def update_product(self, code=None, name=None, description=None, price=None, quantity=None, company_nit=None):
+    @classmethod
+    def get_products_by_ids(cls, product_ids):
+        """
+        Fetches several products with one IN query, with their companies loaded in the same statement.
+
+        Args:
+            product_ids (list[int]): The IDs of the products to retrieve.
+
+        Returns:
+            list: The product instances found, in no particular order.
+        """
+        return cls.query.options(joinedload(cls.company)).filter(cls.id.in_(product_ids)).all()
+
+    def update_product(self, code=None, name=None, description=None, price=None, quantity=None, company_nit=None,
+                       reorder_level=None):
         """
         Updates the attributes of an existing product in the database.
         
@@ -110,9 +277,10 @@ class Product(db.Model):
             code (str, optional): The new product code.
             name (str, optional): The new product name.
             description (str, optional): The new product description.
-            price (float, optional): The new product price.
+            price (Decimal | float | str, optional): The new product price.
             quantity (int, optional): The new product quantity.
             company_nit (str, optional): The new company NIT.
+            reorder_level (int, optional): The new reorder level.
         
         Returns:
             Product: The updated product instance.
@@ -129,13 +297,15 @@ class Product(db.Model):
             self.quantity = quantity
         if company_nit:
             self.company_nit = company_nit
+        if reorder_level is not None:
+            self.reorder_level = reorder_level
         db.session.commit()
         return self
 
     @classmethod
     def delete_product(cls, product_id):
         """
-        Deletes a product from the database by its ID.
+        Soft-deletes a product by its ID. It is hard-deleted later by the purge job.
         
         Args:
             product_id (int): The ID of the product to delete.
@@ -145,7 +315,6 @@ class Product(db.Model):
         """
         product = cls.query.get(product_id)
         if product:
-            db.session.delete(product)
-            db.session.commit()
+            product.soft_delete()
             return True
         return False
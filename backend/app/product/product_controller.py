@@ -1,11 +1,33 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import IntegrityError
+from app import db
 from app.product.models import Product
+from app.warehouse.models import StockLocation
+from app.idempotency.decorators import idempotent
+from app.coalesce import coalesce
+from app.multi_get import get_requested_keys, multi_get_response
 
 # Creating a Blueprint for product-related API routes
 product_bp = Blueprint('product_controller', __name__, url_prefix='/api/products')
 
+def _product(product):
+    """
+    Serializes a product with the fields returned by the product routes.
+    """
+    return {
+        'id': product.id,
+        'code': product.code,
+        'name': product.name,
+        'description': product.description,
+        'price': product.price,
+        'quantity': product.quantity,
+        'company_nit': product.company_nit,
+        'company_name': product.company.name
+    }
+
 # Route to create a new product
 @product_bp.route('/', methods=['POST'])
+@idempotent
 def create_product():
     """
     Creates a new product by accepting data from the request body.
@@ -17,10 +39,11 @@ def create_product():
         - quantity: Available product quantity (required)
         - description: Product description (optional)
         - company_nit: Company NIT (optional)
+        - reorder_level: Quantity below which the product is low on stock (optional)
     
     Returns:
         - A JSON response containing the created product's details.
-        - Status code 201 if successful, 400 if required fields are missing.
+        - Status code 201 if successful, 400 if required fields are missing or the price is invalid.
     """
     data = request.get_json()
     
@@ -29,37 +52,39 @@ def create_product():
         return jsonify({'error': 'Missing required fields (code, name, price, quantity)'}), 400
 
     # Create the product in the database
-    product = Product.create_product(
-        code=data['code'],
-        name=data['name'],
-        description=data.get('description'),
-        price=data['price'],
-        quantity=data['quantity'],
-        company_nit=data.get('company_nit')  # This can be passed as a relationship when creating the product
-    )
+    try:
+        product = Product.create_product(
+            code=data['code'],
+            name=data['name'],
+            description=data.get('description'),
+            price=data['price'],
+            quantity=data['quantity'],
+            company_nit=data.get('company_nit'),  # This can be passed as a relationship when creating the product
+            reorder_level=data.get('reorder_level')
+        )
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
     
     # Return a response with the newly created product's details
-    return jsonify({
-        'id': product.id,
-        'code': product.code,
-        'name': product.name,
-        'description': product.description,
-        'price': product.price,
-        'quantity': product.quantity,
-        'company_nit': product.company_nit,
-        'company_name': product.company.name  # Get the company name via the company relationship
-    }), 201
+    return jsonify(_product(product)), 201
 
 # Route to get all products
 @product_bp.route('/', methods=['GET'])
+@coalesce(bypass=('ids',))
 def get_all_products():
     """
     Retrieves all products from the database and returns them as a list.
+
+    With `?ids=3,1,2` only those products are returned, as with POST /lookup.
     
     Returns:
         - A JSON response containing a list of all products.
         - Status code 200 if successful, 404 if no products are found.
     """
+    if 'ids' in request.args:
+        return _get_products_by_ids()
+
     products = Product.get_all_products()
     
     # If no products are found, return an error message
@@ -67,20 +92,41 @@ def get_all_products():
         return jsonify({'error': 'No products found'}), 404
 
     # Prepare a list of products with their details
-    products_list = [{
-        'id': product.id,
-        'code': product.code,
-        'name': product.name,
-        'description': product.description,
-        'price': product.price,
-        'quantity': product.quantity,
-        'company_nit': product.company_nit,
-        'company_name': product.company.name
-    } for product in products]
+    products_list = [_product(product) for product in products]
 
     # Return a JSON response containing the list of products
     return jsonify(products_list), 200
 
+def _get_products_by_ids():
+    """
+    Resolves the product IDs of a multi-get request with one IN query.
+
+    Returns:
+        - A JSON response with the products found, in request order, and the missing IDs.
+        - Status code 200 if successful, 400 if the IDs are invalid.
+    """
+    try:
+        product_ids = get_requested_keys('ids', int)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    products = Product.get_products_by_ids(product_ids)
+    return multi_get_response(product_ids, products, lambda product: product.id, _product)
+
+# Route to get several products by ID, for lists too long for ?ids=
+@product_bp.route('/lookup', methods=['POST'])
+def lookup_products():
+    """
+    Retrieves the products whose IDs are listed in the request body.
+
+    Expected data fields:
+        - ids: List of product IDs (required)
+
+    Returns:
+        - A JSON response with the products found, in request order, and the missing IDs.
+        - Status code 200 if successful, 400 if the IDs are missing or invalid.
+    """
+    return _get_products_by_ids()
+
 # Route to get a product by its ID
 @product_bp.route('/<int:product_id>', methods=['GET'])
 def get_product(product_id):
@@ -101,16 +147,7 @@ def get_product(product_id):
         return jsonify({'error': 'Product not found'}), 404
 
     # Return the product details in the response
-    return jsonify({
-        'id': product.id,
-        'code': product.code,
-        'name': product.name,
-        'description': product.description,
-        'price': product.price,
-        'quantity': product.quantity,
-        'company_nit': product.company_nit,
-        'company_name': product.company.name
-    })
+    return jsonify(_product(product))
 
 # Route to update a product's details
 @product_bp.route('/<int:product_id>', methods=['PUT'])
@@ -128,10 +165,12 @@ def update_product(product_id):
         - price: Product price (optional)
         - quantity: Available product quantity (optional)
         - company_nit: Company NIT (optional)
+        - reorder_level: Quantity below which the product is low on stock (optional)
     
     Returns:
         - A JSON response containing the updated product's details.
-        - Status code 200 if successful, 404 if the product is not found.
+        - Status code 200 if successful, 400 if the price is invalid, 404 if the product is not found,
+          409 if the quantity is managed per warehouse.
     """
     data = request.get_json()
     
@@ -142,27 +181,27 @@ def update_product(product_id):
     if not product:
         return jsonify({'error': 'Product not found'}), 404
 
+    # Once a product is stocked in warehouses its quantity is the sum of their stock
+    if data.get('quantity') and StockLocation.has_locations(product.id):
+        return jsonify({'error': 'The quantity of this product is managed per warehouse; use /api/warehouses/<id>/adjust'}), 409
+
     # Update the product's details
-    updated_product = product.update_product(
-        code=data.get('code'),
-        name=data.get('name'),
-        description=data.get('description'),
-        price=data.get('price'),
-        quantity=data.get('quantity'),
-        company_nit=data.get('company_nit')
-    )
+    try:
+        updated_product = product.update_product(
+            code=data.get('code'),
+            name=data.get('name'),
+            description=data.get('description'),
+            price=data.get('price'),
+            quantity=data.get('quantity'),
+            company_nit=data.get('company_nit'),
+            reorder_level=data.get('reorder_level')
+        )
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
 
     # Return the updated product details
-    return jsonify({
-        'id': updated_product.id,
-        'code': updated_product.code,
-        'name': updated_product.name,
-        'description': updated_product.description,
-        'price': updated_product.price,
-        'quantity': updated_product.quantity,
-        'company_nit': updated_product.company_nit,
-        'company_name': updated_product.company.name
-    })
+    return jsonify(_product(updated_product))
 
 # Route to delete a product by its ID
 @product_bp.route('/<int:product_id>', methods=['DELETE'])
@@ -185,3 +224,28 @@ def delete_product(product_id):
 
     # Return a success message if the product was deleted
     return jsonify({'message': 'Product deleted successfully'}), 200
+
+# Route to restore a deleted product
+@product_bp.route('/<int:product_id>/restore', methods=['POST'])
+def restore_product(product_id):
+    """
+    Restores a soft-deleted product.
+    
+    Args:
+        product_id (int): The ID of the product to restore.
+    
+    Returns:
+        - A JSON response indicating whether the product was restored.
+        - Status code 200 if successful, 404 if there is no deleted product with that ID,
+          409 if its code is now used by another product.
+    """
+    product = Product.get_deleted(product_id)
+    if not product:
+        return jsonify({'error': 'Deleted product not found'}), 404
+
+    try:
+        product.restore()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Product code already in use'}), 409
+    return jsonify({'message': 'Product restored successfully'}), 200
@@ -0,0 +1,229 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.auth.decorators import is_admin_request
+
+# Header an ADMIN sends to profile (and capture) one request
+PROFILE_HEADER = 'X-Profile'
+
+# Header returned with the ID of the stored capture
+CAPTURE_HEADER = 'X-Profile-Id'
+
+# Capture IDs: creation time in milliseconds and a random suffix
+CAPTURE_ID = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+
+def captures_folder():
+    """
+    The folder where the captures are stored (PROFILING_FOLDER, by default instance/profiles).
+    """
+    return current_app.config.get('PROFILING_FOLDER', os.path.join(current_app.instance_path, 'profiles'))
+
+
+def _capture_path(capture_id, extension):
+    """
+    The file of a capture; None for IDs that don't look like capture IDs.
+    """
+    if not CAPTURE_ID.match(capture_id):
+        return None
+    return os.path.join(captures_folder(), f'{capture_id}.{extension}')
+
+
+def list_captures():
+    """
+    Reads the metadata of the stored captures, newest first.
+
+    Returns:
+        list[dict]: The captures without their SQL statements.
+    """
+    folder = captures_folder()
+    if not os.path.isdir(folder):
+        return []
+    captures = []
+    for name in sorted(os.listdir(folder), reverse=True):
+        if name.endswith('.json'):
+            capture = get_capture(name[:-len('.json')])
+            if capture is not None:
+                capture.pop('sql', None)
+                captures.append(capture)
+    return captures
+
+
+def get_capture(capture_id):
+    """
+    Reads the metadata and SQL statements of a capture, or None if it does not exist.
+    """
+    path = _capture_path(capture_id, 'json')
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def get_capture_stats(capture_id, lines=60):
+    """
+    Renders the profile of a capture as text, sorted by cumulative time, or None if it does not exist.
+    """
+    path = _capture_path(capture_id, 'prof')
+    if path is None or not os.path.exists(path):
+        return None
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(lines)
+    return output.getvalue()
+
+
+def get_capture_file(capture_id):
+    """
+    The path of a capture's pstats file (readable with `python -m pstats` or snakeviz), or None.
+    """
+    path = _capture_path(capture_id, 'prof')
+    return path if path is not None and os.path.exists(path) else None
+
+
+def _should_profile():
+    """
+    Decides whether to profile the current request: always when an ADMIN asks for
+    it with the X-Profile header, otherwise for a PROFILING_SAMPLE_RATE fraction of requests.
+
+    Returns:
+        str: 'requested' or 'sampled', or None to leave the request alone.
+    """
+    if request.headers.get(PROFILE_HEADER) and is_admin_request():
+        return 'requested'
+    rate = current_app.config.get('PROFILING_SAMPLE_RATE', 0.01)
+    if rate and random.random() < rate:
+        return 'sampled'
+    return None
+
+
+def start_profile():
+    """
+    Starts profiling the request if it is sampled or requested.
+    """
+    reason = _should_profile()
+    if reason is None:
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active cProfile per process; skip while another request is profiled
+        return
+    g.profile = {'profiler': profiler, 'reason': reason, 'started_at': time.perf_counter(), 'sql': []}
+
+
+def _stop_profile():
+    """
+    Stops the request's profiler and returns its state, or None if the request isn't profiled.
+    """
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile['profiler'].disable()
+        profile['duration_ms'] = (time.perf_counter() - profile['started_at']) * 1000
+    return profile
+
+
+def _save_capture(profile, status_code):
+    """
+    Stores the profile and metadata of a request and removes the oldest captures over PROFILING_MAX_CAPTURES.
+
+    Returns:
+        str: The ID of the capture.
+    """
+    folder = captures_folder()
+    os.makedirs(folder, exist_ok=True)
+    capture_id = f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}'
+    profile['profiler'].dump_stats(os.path.join(folder, f'{capture_id}.prof'))
+    with open(os.path.join(folder, f'{capture_id}.json'), 'w') as file:
+        json.dump({
+            'id': capture_id,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': status_code,
+            'reason': profile['reason'],
+            'duration_ms': round(profile['duration_ms'], 3),
+            'sql_count': len(profile['sql']),
+            'sql_ms': round(sum(statement['duration_ms'] for statement in profile['sql']), 3),
+            'created_at': datetime.utcnow().isoformat(),
+            'sql': profile['sql']
+        }, file)
+
+    limit = current_app.config.get('PROFILING_MAX_CAPTURES', 100)
+    captures = sorted(name[:-len('.json')] for name in os.listdir(folder) if name.endswith('.json'))
+    for old in captures[:max(len(captures) - limit, 0)]:
+        for extension in ('json', 'prof'):
+            path = os.path.join(folder, f'{old}.{extension}')
+            if os.path.exists(path):
+                os.remove(path)
+    return capture_id
+
+
+def finish_profile(response):
+    """
+    Stops profiling and keeps the capture if the request was requested or slower
+    than PROFILING_SLOW_MS (500 by default).
+    """
+    profile = _stop_profile()
+    if profile is None:
+        return response
+    slow_ms = current_app.config.get('PROFILING_SLOW_MS', 500)
+    if profile['reason'] == 'requested' or profile['duration_ms'] >= slow_ms:
+        try:
+            response.headers[CAPTURE_HEADER] = _save_capture(profile, response.status_code)
+        except OSError:
+            current_app.logger.exception('Could not store the profile of %s', request.path)
+    return response
+
+
+def discard_profile(error=None):
+    """
+    Makes sure the profiler is stopped when a request ends without a response.
+    """
+    _stop_profile()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    """
+    Notes when a statement of a profiled request starts.
+    """
+    if has_request_context() and 'profile' in g:
+        conn.info.setdefault('profile_started_at', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    """
+    Records the SQL statements of a profiled request (without their parameters) and their duration.
+    """
+    if has_request_context() and 'profile' in g and conn.info.get('profile_started_at'):
+        started_at = conn.info['profile_started_at'].pop()
+        statements = g.profile['sql']
+        if len(statements) < current_app.config.get('PROFILING_MAX_STATEMENTS', 500):
+            statements.append({
+                'statement': statement,
+                'executemany': executemany,
+                'duration_ms': round((time.perf_counter() - started_at) * 1000, 3)
+            })
+
+
+def init_app(app):
+    """
+    Installs the profiling hooks when PROFILING_ENABLED is set. Off by default.
+    """
+    if not app.config.get('PROFILING_ENABLED', False):
+        return
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(discard_profile)
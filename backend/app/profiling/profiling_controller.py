@@ -0,0 +1,54 @@
+from flask import Blueprint, Response, request, jsonify, send_file
+from app.auth.decorators import admin_required
+from app.profiling.profiler import get_capture, get_capture_file, get_capture_stats, list_captures
+
+# Blueprint for the stored request profiles (ADMIN only)
+profiling_bp = Blueprint('profiling_controller', __name__, url_prefix='/api/admin/profiles')
+
+# List the captures
+@profiling_bp.route('', methods=['GET'])
+@admin_required
+def get_captures():
+    """
+    Lists the stored request profiles, newest first: path, status, duration and SQL time.
+    """
+    return jsonify(list_captures()), 200
+
+# Get a capture
+@profiling_bp.route('/<capture_id>', methods=['GET'])
+@admin_required
+def get_capture_detail(capture_id):
+    """
+    Returns a capture's metadata with the SQL statements the request ran.
+    """
+    capture = get_capture(capture_id)
+    if capture is None:
+        return jsonify({'error': 'Capture not found'}), 404
+    return jsonify(capture), 200
+
+# Download a capture's profile
+@profiling_bp.route('/<capture_id>/profile', methods=['GET'])
+@admin_required
+def download_capture(capture_id):
+    """
+    Downloads the profile of a capture.
+
+    Query parameters:
+        format (str, optional): 'pstats' for the binary file (open it with
+            `python -m pstats` or snakeviz) or 'text' for the top functions by
+            cumulative time. Defaults to 'pstats'.
+    """
+    output = request.args.get('format', 'pstats')
+    if output == 'text':
+        stats = get_capture_stats(capture_id, lines=request.args.get('lines', 60, type=int))
+        if stats is None:
+            return jsonify({'error': 'Capture not found'}), 404
+        return Response(stats, mimetype='text/plain')
+    if output != 'pstats':
+        return jsonify({'error': "format must be 'pstats' or 'text'"}), 400
+
+    path = get_capture_file(capture_id)
+    if path is None:
+        return jsonify({'error': 'Capture not found'}), 404
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'{capture_id}.prof')
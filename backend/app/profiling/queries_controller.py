@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify
+from app.auth.decorators import admin_required
+from app.profiling.slow_queries import query_stats
+
+# Columns the query stats can be sorted by
+SORT_COLUMNS = ('total_ms', 'count', 'mean_ms', 'max_ms', 'slow_count')
+
+# Maximum number of rows returned
+MAX_LIMIT = 500
+
+# Blueprint for the query statistics of this worker (ADMIN only)
+queries_bp = Blueprint('queries_controller', __name__, url_prefix='/api/admin/queries')
+
+# Get the hottest statements
+@queries_bp.route('', methods=['GET'])
+@admin_required
+def get_query_stats():
+    """
+    Returns the statements run by this worker grouped by fingerprint, hottest first.
+
+    Query parameters:
+        sort (str, optional): One of SORT_COLUMNS. Defaults to 'total_ms'.
+        limit (int, optional): The number of fingerprints, up to MAX_LIMIT. Defaults to 50.
+    """
+    sort = request.args.get('sort', 'total_ms')
+    limit = min(request.args.get('limit', 50, type=int), MAX_LIMIT)
+    if sort not in SORT_COLUMNS or limit < 1:
+        return jsonify({'error': f'sort must be one of {", ".join(SORT_COLUMNS)} and limit positive'}), 400
+    return jsonify(query_stats.top(sort=sort, limit=limit)), 200
+
+# Get the recent slow statements
+@queries_bp.route('/slow', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """
+    Returns the most recent statements slower than SLOW_QUERY_MS, with their route and parameter shapes.
+    """
+    limit = min(request.args.get('limit', 50, type=int), MAX_LIMIT)
+    return jsonify(query_stats.recent_slow(limit=limit)), 200
+
+# Reset the statistics
+@queries_bp.route('', methods=['DELETE'])
+@admin_required
+def reset_query_stats():
+    """
+    Clears the statistics of this worker.
+    """
+    query_stats.reset()
+    return jsonify({'message': 'Query statistics cleared'}), 200
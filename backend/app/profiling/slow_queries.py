@@ -0,0 +1,230 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache, partial
+from datetime import datetime
+from flask import request, has_request_context
+from sqlalchemy import event
+
+# Statements EXPLAIN can describe without running them
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+# Prefix that asks each database for the plan of a statement
+EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN ', 'mysql': 'EXPLAIN '}
+
+# Parenthesized placeholders, e.g. the expanded parameters of IN (...), however many there are
+PLACEHOLDER_LIST = re.compile(r'\(\s*(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))*\s*\)')
+
+# Numbered parameter names, e.g. code_1, id_1_2 from expanded IN parameters
+NUMBERED_NAME = re.compile(r'_\d+(_\d+)*\b')
+
+
+def normalize(statement):
+    """
+    Normalizes a statement so the same query with any number of IN parameters has one form.
+    """
+    statement = ' '.join(statement.split())
+    return PLACEHOLDER_LIST.sub('(...)', statement)
+
+
+def fingerprint(statement):
+    """
+    A short stable ID of a normalized statement.
+    """
+    return hashlib.sha1(NUMBERED_NAME.sub('_N', statement).encode()).hexdigest()[:16]
+
+
+@lru_cache(maxsize=4096)
+def _classify(statement):
+    """
+    The normalized form and fingerprint of a statement; statements repeat, so they are memoized.
+    """
+    normalized = normalize(statement)
+    return normalized, fingerprint(normalized)
+
+
+def parameter_shape(parameters, executemany):
+    """
+    Describes the bound parameters by name (or position) and type, never by value.
+
+    Returns:
+        dict: {'params': {name: type}} or {'params': [types]}, plus 'rows' for executemany.
+    """
+    rows = len(parameters) if executemany else None
+    sample = (parameters[0] if parameters else {}) if executemany else parameters
+    if isinstance(sample, dict):
+        shape = {name: type(value).__name__ for name, value in sample.items()}
+    else:
+        shape = [type(value).__name__ for value in (sample or ())]
+    return {'params': shape, 'rows': rows} if executemany else {'params': shape}
+
+
+def _origin():
+    """
+    The route that issued the current statement, or 'cli/background' outside requests.
+    """
+    if not has_request_context():
+        return {'endpoint': None, 'blueprint': None, 'route': 'cli/background'}
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return {'endpoint': request.endpoint, 'blueprint': request.blueprint, 'route': f'{request.method} {rule}'}
+
+
+class QueryStats:
+    """
+    Per-fingerprint timing of every statement run by this process, and the
+    most recent slow statements. Each worker process keeps its own stats.
+    """
+
+    def __init__(self, recent=200):
+        """
+        Initializes empty stats that keep the last `recent` slow statements.
+        """
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = deque(maxlen=recent)
+
+    def record(self, key, statement, duration_ms, origin, slow):
+        """
+        Adds one execution of a statement.
+
+        Returns:
+            bool: Whether this is the first slow execution of the fingerprint (the one to EXPLAIN).
+        """
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    'fingerprint': key, 'statement': statement, 'count': 0, 'total_ms': 0.0,
+                    'max_ms': 0.0, 'slow_count': 0, 'routes': Counter(), 'plan': None, 'last_seen': None
+                }
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['routes'][origin['route']] += 1
+            stats['last_seen'] = datetime.utcnow().isoformat()
+            if slow:
+                stats['slow_count'] += 1
+            return slow and stats['slow_count'] == 1
+
+    def add_slow(self, entry):
+        """
+        Remembers a slow statement.
+        """
+        with self._lock:
+            self._slow.append(entry)
+
+    def set_plan(self, key, plan):
+        """
+        Stores the EXPLAIN output of a fingerprint.
+        """
+        with self._lock:
+            if key in self._stats:
+                self._stats[key]['plan'] = plan
+
+    def top(self, sort='total_ms', limit=50):
+        """
+        The fingerprints with the highest `sort` value ('total_ms', 'count', 'max_ms', 'mean_ms' or 'slow_count').
+
+        Returns:
+            list[dict]: The stats, with the five routes that ran each statement most.
+        """
+        with self._lock:
+            rows = [dict(stats, mean_ms=stats['total_ms'] / stats['count'], routes=dict(stats['routes'].most_common(5)))
+                    for stats in self._stats.values()]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        for row in rows:
+            row['total_ms'] = round(row['total_ms'], 3)
+            row['mean_ms'] = round(row['mean_ms'], 3)
+            row['max_ms'] = round(row['max_ms'], 3)
+        return rows[:limit]
+
+    def recent_slow(self, limit=50):
+        """
+        The most recent slow statements, newest first.
+        """
+        with self._lock:
+            return list(reversed(self._slow))[:limit]
+
+    def reset(self):
+        """
+        Forgets every statistic and slow statement.
+        """
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+
+# Stats of this process
+query_stats = QueryStats()
+
+
+def _explain(app, conn, statement, parameters):
+    """
+    Runs EXPLAIN for a statement on the connection that ran it, with a raw DBAPI
+    cursor so the EXPLAIN itself isn't timed or logged.
+
+    Returns:
+        list[str]: The plan rows, or None if the database isn't supported or EXPLAIN failed.
+    """
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None or not EXPLAINABLE.match(statement):
+        return None
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [' | '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as error:
+        app.logger.warning('EXPLAIN failed for %s: %s', statement[:200], error)
+        return None
+    finally:
+        cursor.close()
+
+
+def start_timer(conn, cursor, statement, parameters, context, executemany):
+    """
+    Notes when a statement starts.
+    """
+    context._query_started_at = time.perf_counter()
+
+
+def record_query(app, conn, cursor, statement, parameters, context, executemany):
+    """
+    Adds the statement to the per-fingerprint stats; logs it (and EXPLAINs its
+    first occurrence) when it took longer than SLOW_QUERY_MS.
+    """
+    started_at = getattr(context, '_query_started_at', None)
+    if started_at is None:
+        return
+    duration_ms = (time.perf_counter() - started_at) * 1000
+    config = app.config
+    slow = duration_ms >= config.get('SLOW_QUERY_MS', 200)
+    normalized, key = _classify(statement)
+    origin = _origin()
+    first_slow = query_stats.record(key, normalized, duration_ms, origin, slow)
+    if not slow:
+        return
+
+    shape = parameter_shape(parameters, executemany)
+    app.logger.warning('Slow query %s (%.1f ms) from %s: %s %s',
+                       key, duration_ms, origin['route'], normalized[:500], shape)
+    query_stats.add_slow(dict(origin, fingerprint=key, statement=normalized, duration_ms=round(duration_ms, 3),
+                              at=datetime.utcnow().isoformat(), **shape))
+    if first_slow and config.get('SLOW_QUERY_EXPLAIN', False) and not executemany:
+        query_stats.set_plan(key, _explain(app, conn, statement, parameters))
+
+
+def init_app(app, engines):
+    """
+    Attaches the slow query log to the application's engines unless SLOW_QUERY_LOG_ENABLED is False.
+
+    Args:
+        app (Flask): The application.
+        engines (iterable[Engine]): The engines of the primary database and the binds.
+    """
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED', True):
+        return
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', start_timer)
+        event.listen(engine, 'after_cursor_execute', partial(record_query, app))
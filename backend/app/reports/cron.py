@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+# (name, lowest, highest) of the five fields of a cron expression
+FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day of month', 1, 31), ('month', 1, 12), ('day of week', 0, 7))
+
+# Shortcuts accepted instead of the five fields
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+# Schedules are searched up to this far ahead (e.g. '0 0 31 2 *' never runs)
+MAX_SEARCH_DAYS = 366 * 5
+
+
+def _parse_field(value, name, lowest, highest):
+    """
+    Parses one field of a cron expression: '*', 'a', 'a-b', with an optional '/step', or a comma-separated list.
+
+    Returns:
+        set[int]: The values the field matches.
+
+    Raises:
+        ValueError: If the field is invalid.
+    """
+    values = set()
+    for part in value.split(','):
+        expression, _, step = part.partition('/')
+        try:
+            step = int(step) if step else 1
+            if expression == '*':
+                start, end = lowest, highest
+            elif '-' in expression:
+                start, end = (int(bound) for bound in expression.split('-', 1))
+            else:
+                start = end = int(expression)
+        except ValueError:
+            raise ValueError(f'Invalid {name} field: {value}') from None
+        if step < 1 or start < lowest or end > highest or start > end:
+            raise ValueError(f'Invalid {name} field: {value}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A standard five-field cron schedule ('minute hour day-of-month month day-of-week'),
+    evaluated in UTC.
+
+    As in cron, when both the day of month and the day of week are restricted a
+    day matches if either of them does.
+    """
+
+    def __init__(self, expression):
+        """
+        Parses a cron expression, e.g. '0 7 * * 1-5' (07:00 on weekdays) or '@daily'.
+
+        Raises:
+            ValueError: If the expression is invalid.
+        """
+        self.expression = expression.strip()
+        fields = ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != len(FIELDS):
+            raise ValueError('A cron schedule has five fields: minute hour day-of-month month day-of-week')
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, *spec) for field, spec in zip(fields, FIELDS)
+        )
+        # Sunday is both 0 and 7
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _matches_day(self, day):
+        """
+        Whether the schedule runs on a date.
+        """
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        # Python's Monday is 0, cron's Sunday is 0
+        in_week = (day.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment):
+        """
+        The first time the schedule runs strictly after `moment`.
+
+        Args:
+            moment (datetime): A naive UTC datetime.
+
+        Returns:
+            datetime: The next run, with seconds set to zero.
+
+        Raises:
+            ValueError: If the schedule never runs (e.g. on February 31st).
+        """
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(MAX_SEARCH_DAYS):
+            if self._matches_day(day):
+                for hour in sorted(self.hours):
+                    for minute in sorted(self.minutes):
+                        candidate = datetime(day.year, day.month, day.day, hour, minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f'The schedule {self.expression} never runs')
@@ -0,0 +1,173 @@
+from datetime import datetime
+from app import db
+from app.email.mailer import parse_recipients
+from app.reports.cron import CronSchedule
+
+
+class ReportSubscription(db.Model):
+    """
+    A recurring inventory report of a company, emailed to a list of recipients
+    on a cron schedule (evaluated in UTC).
+
+    Attributes:
+        id (int): The unique identifier of the subscription (Primary key).
+        company_nit (str): The company whose inventory is reported.
+        recipients (list[str]): The email addresses the report is sent to.
+        schedule (str): The cron expression, e.g. '0 7 * * 1-5'.
+        active (bool): Whether the report is being sent.
+        next_run_at (datetime): When the report is due next.
+        last_run_at (datetime): When the report was last generated.
+        last_sent_at (datetime): When the report last reached all its recipients.
+        last_error (str): The error of the last run, or None if it succeeded.
+        created_at (datetime): When the subscription was created.
+    """
+    __tablename__ = 'report_subscriptions'
+    __table_args__ = (
+        # The scheduler looks for the active subscriptions that are due
+        db.Index('ix_report_subscriptions_due', 'active', 'next_run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_nit = db.Column(db.String(50), db.ForeignKey('companies.nit', ondelete='CASCADE'), nullable=False, index=True)
+    recipients = db.Column(db.JSON, nullable=False)
+    schedule = db.Column(db.String(100), nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    last_run_at = db.Column(db.DateTime)
+    last_sent_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    company = db.relationship('Company')
+
+    def __repr__(self):
+        """
+        String representation of the subscription.
+        """
+        return f'<ReportSubscription {self.id} {self.company_nit} {self.schedule}>'
+
+    def to_dict(self):
+        """
+        Serializes the subscription for the API.
+        """
+        return {
+            'id': self.id,
+            'company_nit': self.company_nit,
+            'recipients': self.recipients,
+            'schedule': self.schedule,
+            'active': self.active,
+            'next_run_at': self.next_run_at,
+            'last_run_at': self.last_run_at,
+            'last_sent_at': self.last_sent_at,
+            'last_error': self.last_error
+        }
+
+    @classmethod
+    def create_subscription(cls, company_nit, recipients, schedule, active=True):
+        """
+        Creates a subscription, due at the next time of its schedule.
+
+        Raises:
+            ValueError: If the recipients or the schedule are invalid.
+        """
+        subscription = cls(
+            company_nit=company_nit,
+            recipients=parse_recipients(recipients),
+            schedule=schedule,
+            active=active,
+            next_run_at=CronSchedule(schedule).next_after(datetime.utcnow())
+        )
+        db.session.add(subscription)
+        db.session.commit()
+        return subscription
+
+    @classmethod
+    def get_subscription_by_id(cls, subscription_id):
+        """
+        Fetches a subscription by its ID, or None if it does not exist.
+        """
+        return db.session.get(cls, subscription_id)
+
+    @classmethod
+    def get_subscriptions(cls, company_nit=None):
+        """
+        Retrieves the subscriptions, of one company or of all of them, by ID.
+        """
+        query = cls.query.order_by(cls.id)
+        if company_nit is not None:
+            query = query.filter_by(company_nit=company_nit)
+        return query.all()
+
+    def update_subscription(self, recipients=None, schedule=None, active=None):
+        """
+        Updates the recipients, schedule or state of the subscription. A new
+        schedule, or reactivating the subscription, moves its next run.
+
+        Raises:
+            ValueError: If the recipients or the schedule are invalid.
+        """
+        if recipients is not None:
+            self.recipients = parse_recipients(recipients)
+        if schedule is not None or (active and not self.active):
+            self.schedule = schedule or self.schedule
+            self.next_run_at = CronSchedule(self.schedule).next_after(datetime.utcnow())
+        if active is not None:
+            self.active = bool(active)
+        db.session.commit()
+        return self
+
+    def delete_subscription(self):
+        """
+        Deletes the subscription.
+        """
+        db.session.delete(self)
+        db.session.commit()
+
+    @classmethod
+    def claim_due(cls, now, limit=100):
+        """
+        Claims the active subscriptions due at `now` by moving each one to its
+        next run, so a subscription is sent once per run even with several
+        schedulers polling at the same time.
+
+        Args:
+            now (datetime): The current time (UTC).
+            limit (int, optional): The maximum number of subscriptions claimed. Defaults to 100.
+
+        Returns:
+            list[ReportSubscription]: The claimed subscriptions.
+        """
+        due = cls.query.filter(cls.active.is_(True), cls.next_run_at <= now).order_by(cls.next_run_at).limit(limit).all()
+        claimed = []
+        for subscription in due:
+            try:
+                next_run_at = CronSchedule(subscription.schedule).next_after(now)
+                error = None
+            except ValueError as schedule_error:
+                next_run_at, error = subscription.next_run_at, str(schedule_error)
+            # Only the scheduler that still sees the old next_run_at gets the subscription
+            result = db.session.execute(
+                db.update(cls)
+                .where(cls.id == subscription.id, cls.next_run_at == subscription.next_run_at)
+                .values(next_run_at=next_run_at, last_run_at=now, active=error is None, last_error=error)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1 and error is None:
+                claimed.append(subscription)
+        db.session.commit()
+        return claimed
+
+    @classmethod
+    def record_results(cls, results, now):
+        """
+        Stores the outcome of a run: the sending time of the subscriptions that
+        reached all their recipients and the error of the others.
+
+        Args:
+            results (dict): {subscription ID: error message, or None if it was sent}.
+            now (datetime): The time of the run.
+        """
+        for subscription_id, error in results.items():
+            values = {'last_error': error} if error else {'last_error': None, 'last_sent_at': now}
+            db.session.execute(db.update(cls).where(cls.id == subscription_id).values(**values))
+        db.session.commit()
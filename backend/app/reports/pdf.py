@@ -0,0 +1,108 @@
+import zlib
+from datetime import datetime
+
+# Landscape A4, in points
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595
+MARGIN = 36
+FONT_SIZE = 8
+LINE_HEIGHT = 11
+
+# Columns of the inventory report (as in the PDF rendered by the frontend): (title, width in characters)
+COLUMNS = (
+    ('ID', 6), ('Code', 14), ('Name', 28), ('Description', 40), ('Price', 12),
+    ('Quantity', 9), ('Company NIT', 14), ('Company Name', 24)
+)
+
+# Rows of the table that fit on one page, below the title and header
+ROWS_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT - 4
+
+
+def _escape(text):
+    """
+    Encodes text for a PDF string in WinAnsi (characters it lacks become '?').
+    """
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _cell(value, width):
+    """
+    Formats a value to a fixed-width column, truncating long values.
+    """
+    text = '' if value is None else ' '.join(str(value).split())
+    return text[:width - 1] + '~' if len(text) > width else text.ljust(width)
+
+
+def _page_stream(lines):
+    """
+    The content stream of a page: each line in Courier, top to bottom.
+    """
+    commands = [f'BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode()]
+    for line in lines:
+        commands.append(b'(' + _escape(line) + b') Tj T*')
+    commands.append(b'ET')
+    return zlib.compress(b'\n'.join(commands))
+
+
+def render_pdf(pages):
+    """
+    Writes a PDF document with one Courier font.
+
+    Args:
+        pages (list[list[str]]): The lines of text of each page.
+
+    Returns:
+        bytes: The PDF file.
+    """
+    # Objects 1-3 are the catalog, the page tree and the font; each page adds a page and its content
+    page_ids = [4 + 2 * index for index in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{" ".join(f"{page_id} 0 R" for page_id in page_ids)}] /Count {len(pages)} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    for page_id, lines in zip(page_ids, pages):
+        stream = _page_stream(lines)
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>'.encode()
+        )
+        objects.append(f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode() + stream + b'\nendstream')
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    output += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    output += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(output)
+
+
+def render_inventory_report(company, products, generated_at=None):
+    """
+    Renders the inventory report of a company as a PDF table, paginated.
+
+    Args:
+        company (Company): The company.
+        products (list[Product]): Its products.
+        generated_at (datetime, optional): The time printed on the report. Defaults to now (UTC).
+
+    Returns:
+        bytes: The PDF file.
+    """
+    generated_at = generated_at or datetime.utcnow()
+    header = ' '.join(_cell(title, width) for title, width in COLUMNS)
+    rows = [' '.join(_cell(value, width) for value, (_, width) in zip((
+        product.id, product.code, product.name, product.description, product.price,
+        product.quantity, product.company_nit, company.name
+    ), COLUMNS)) for product in products] or ['No products']
+
+    pages = []
+    for start in range(0, len(rows), ROWS_PER_PAGE):
+        title = (f'Inventory Report - {company.name} ({company.nit}) - '
+                 f'{generated_at:%Y-%m-%d %H:%M} UTC - page {len(pages) + 1}')
+        pages.append([title, '', header, '-' * len(header)] + rows[start:start + ROWS_PER_PAGE])
+    return render_pdf(pages)
@@ -0,0 +1,135 @@
+import io
+import click
+from flask import Blueprint, current_app, request, jsonify, send_file
+from app.auth.decorators import admin_required
+from app.company.models import Company
+from app.product.models import Product
+from app.reports.models import ReportSubscription
+from app.reports.pdf import render_inventory_report
+from app.reports.scheduler import run_due_reports, run_scheduler
+
+# Blueprint for the scheduled inventory reports (ADMIN only)
+reports_bp = Blueprint('reports_controller', __name__, url_prefix='/api/reports', cli_group='reports')
+
+# List the report subscriptions
+@reports_bp.route('/subscriptions', methods=['GET'])
+@admin_required
+def get_subscriptions():
+    """
+    Lists the report subscriptions, optionally of one company (?company_nit=).
+    """
+    subscriptions = ReportSubscription.get_subscriptions(company_nit=request.args.get('company_nit'))
+    return jsonify([subscription.to_dict() for subscription in subscriptions]), 200
+
+# Create a report subscription
+@reports_bp.route('/subscriptions', methods=['POST'])
+@admin_required
+def create_subscription():
+    """
+    Subscribes recipients to a company's inventory report.
+
+    Expected data fields:
+        - company_nit: The company (required)
+        - recipients: List of email addresses (required)
+        - schedule: Cron expression in UTC, e.g. '0 7 * * 1-5' or '@daily' (required)
+        - active: Whether the report is sent (optional, default true)
+
+    Returns:
+        JSON response with the subscription, status 201; 400 if a field is invalid, 404 if the company does not exist.
+    """
+    data = request.get_json()
+    if not data or not data.get('company_nit') or not data.get('recipients') or not data.get('schedule'):
+        return jsonify({'error': 'Missing required fields (company_nit, recipients, schedule)'}), 400
+    if Company.get_company_by_nit(data['company_nit']) is None:
+        return jsonify({'error': 'Company not found'}), 404
+
+    try:
+        subscription = ReportSubscription.create_subscription(
+            company_nit=data['company_nit'],
+            recipients=data['recipients'],
+            schedule=data['schedule'],
+            active=bool(data.get('active', True))
+        )
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify(subscription.to_dict()), 201
+
+# Get a report subscription
+@reports_bp.route('/subscriptions/<int:subscription_id>', methods=['GET'])
+@admin_required
+def get_subscription(subscription_id):
+    """
+    Returns a subscription with its next run and the result of the last one.
+    """
+    subscription = ReportSubscription.get_subscription_by_id(subscription_id)
+    if subscription is None:
+        return jsonify({'error': 'Subscription not found'}), 404
+    return jsonify(subscription.to_dict()), 200
+
+# Update a report subscription
+@reports_bp.route('/subscriptions/<int:subscription_id>', methods=['PUT'])
+@admin_required
+def update_subscription(subscription_id):
+    """
+    Updates the 'recipients', 'schedule' or 'active' fields of a subscription.
+    """
+    subscription = ReportSubscription.get_subscription_by_id(subscription_id)
+    if subscription is None:
+        return jsonify({'error': 'Subscription not found'}), 404
+
+    data = request.get_json() or {}
+    try:
+        subscription.update_subscription(
+            recipients=data.get('recipients'),
+            schedule=data.get('schedule'),
+            active=data.get('active')
+        )
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify(subscription.to_dict()), 200
+
+# Delete a report subscription
+@reports_bp.route('/subscriptions/<int:subscription_id>', methods=['DELETE'])
+@admin_required
+def delete_subscription(subscription_id):
+    """
+    Deletes a subscription.
+    """
+    subscription = ReportSubscription.get_subscription_by_id(subscription_id)
+    if subscription is None:
+        return jsonify({'error': 'Subscription not found'}), 404
+    subscription.delete_subscription()
+    return jsonify({'message': 'Subscription deleted successfully'}), 200
+
+# Preview a company's report
+@reports_bp.route('/companies/<string:nit>/inventory.pdf', methods=['GET'])
+@admin_required
+def preview_report(nit):
+    """
+    Renders the inventory report of a company as it is emailed.
+    """
+    company = Company.get_company_by_nit(nit)
+    if company is None:
+        return jsonify({'error': 'Company not found'}), 404
+    products = Product.query.filter_by(company_nit=nit).order_by(Product.id).all()
+    return send_file(io.BytesIO(render_inventory_report(company, products)), mimetype='application/pdf',
+                     download_name=f'inventory_report_{nit}.pdf')
+
+
+@reports_bp.cli.command('run')
+def run_command():
+    """
+    Send the reports that are due now.
+    """
+    click.echo(f'Processed {run_due_reports()} report subscriptions')
+
+
+@reports_bp.cli.command('worker')
+@click.option('--interval', default=None, type=float, help='Seconds between checks (REPORTS_POLL_SECONDS, 60).')
+def worker_command(interval):
+    """
+    Send the due reports continuously.
+    """
+    interval = interval or current_app.config.get('REPORTS_POLL_SECONDS', 60)
+    click.echo(f'Checking for due reports every {interval:g} seconds')
+    run_scheduler(current_app._get_current_object(), interval)
@@ -0,0 +1,116 @@
+import threading
+from datetime import datetime
+from botocore.exceptions import BotoCoreError, ClientError
+from flask import current_app
+from app.company.models import Company
+from app.product.models import Product
+from app.email.mailer import build_message, group_by_domain, send_raw
+from app.reports.models import ReportSubscription
+from app.reports.pdf import render_inventory_report
+
+# Subject and body of the report emails
+SUBJECT = 'Reporte de Inventario - {name}'
+BODY = 'Adjunto encontrarás el reporte de inventario de {name} ({nit}) en formato PDF.'
+
+
+def _send_company_report(company, subscriptions, now):
+    """
+    Renders a company's report once and sends it to the recipients of all its
+    due subscriptions, one message per recipient domain.
+
+    Returns:
+        dict: {subscription ID: error message, or None if all its recipients got the report}.
+    """
+    products = Product.query.filter_by(company_nit=company.nit).order_by(Product.id).all()
+    raw_message = build_message(
+        SUBJECT.format(name=company.name),
+        BODY.format(name=company.name, nit=company.nit),
+        attachment=render_inventory_report(company, products, now),
+        filename=f'inventory_report_{company.nit}_{now:%Y%m%d}.pdf'
+    )
+
+    # A recipient of several subscriptions of the company gets the report once
+    owners = {}
+    for subscription in subscriptions:
+        for address in subscription.recipients:
+            owners.setdefault(address, set()).add(subscription.id)
+
+    errors = {}
+    quota_error = None
+    for destinations in group_by_domain(owners):
+        error = quota_error
+        if error is None:
+            try:
+                send_raw(destinations, raw_message)
+            except RuntimeError as quota_used_up:
+                error = quota_error = str(quota_used_up)
+            except (BotoCoreError, ClientError) as ses_error:
+                error = str(ses_error)
+            if error is not None:
+                current_app.logger.warning('Report of %s not sent to %s: %s', company.nit, destinations, error)
+        if error is not None:
+            for address in destinations:
+                for subscription_id in owners[address]:
+                    errors.setdefault(subscription_id, error)
+    return {subscription.id: errors.get(subscription.id) for subscription in subscriptions}
+
+
+def run_due_reports(now=None):
+    """
+    Sends the reports of the subscriptions that are due. Each subscription is
+    claimed before its report is generated, so it is sent at most once per run
+    of its schedule; a failed send is recorded in `last_error` and not retried.
+
+    Args:
+        now (datetime, optional): The current time (UTC). Defaults to now.
+
+    Returns:
+        int: The number of subscriptions processed.
+    """
+    now = now or datetime.utcnow()
+    subscriptions = ReportSubscription.claim_due(now, limit=current_app.config.get('REPORTS_BATCH_SIZE', 100))
+    by_company = {}
+    for subscription in subscriptions:
+        by_company.setdefault(subscription.company_nit, []).append(subscription)
+
+    results = {}
+    for nit, company_subscriptions in by_company.items():
+        company = Company.get_company_by_nit(nit)
+        if company is None or company.is_deleted:
+            results.update((subscription.id, 'Company not found') for subscription in company_subscriptions)
+            continue
+        results.update(_send_company_report(company, company_subscriptions, now))
+    ReportSubscription.record_results(results, now)
+    return len(subscriptions)
+
+
+def run_scheduler(app, interval, stop=None):
+    """
+    Sends the due reports every `interval` seconds until `stop` is set.
+
+    Args:
+        app (Flask): The application.
+        interval (float): Seconds between checks.
+        stop (threading.Event, optional): Ends the loop when set. Defaults to running forever.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                processed = run_due_reports()
+                if processed:
+                    app.logger.info('Processed %d report subscriptions', processed)
+            except Exception:
+                app.logger.exception('Scheduled reports failed')
+        stop.wait(interval)
+
+
+def init_app(app):
+    """
+    Starts the in-process report scheduler when REPORTS_SCHEDULER_ENABLED is set.
+    Off by default; `flask reports worker` runs the same loop as a separate process.
+    """
+    if not app.config.get('REPORTS_SCHEDULER_ENABLED', False):
+        return
+    interval = app.config.get('REPORTS_POLL_SECONDS', 60)
+    threading.Thread(target=run_scheduler, args=(app, interval), name='report-scheduler', daemon=True).start()
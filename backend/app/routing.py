@@ -0,0 +1,209 @@
+import time
+from flask import current_app, g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from app.cache import TTLCache
+from app.throttling.storage import redis_client
+
+# Blueprints whose GET handlers are allowed to read from the replica
+REPLICA_BLUEPRINTS = ('product_controller', 'company_controller', 'category_controller', 'client_controller',
+                      'stats_controller')
+
+# Cookie used to pin a client to the primary right after it writes (read-your-writes)
+STICKY_COOKIE = 'db_primary_until'
+
+# HTTP methods considered read-only
+READ_METHODS = ('GET', 'HEAD')
+
+
+class MemoryPins:
+    """
+    Clients pinned to the primary, kept in this process. A client whose write
+    was served by another worker process is not pinned here.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty set of pins.
+        """
+        self._pins = TTLCache()
+
+    def pin(self, client, seconds):
+        """
+        Pins a client to the primary for `seconds`.
+        """
+        self._pins.set(client, True, seconds)
+
+    def is_pinned(self, client):
+        """
+        Whether the client is pinned to the primary.
+        """
+        return self._pins.get(client) is not None
+
+
+class RedisPins:
+    """
+    Clients pinned to the primary, shared by every worker through Redis.
+    """
+
+    def __init__(self, client, prefix='replica-pin:'):
+        """
+        Args:
+            client: A redis-py compatible client (e.g. `redis.Redis.from_url(...)` or `FakeRedis()`).
+            prefix (str, optional): Prefix of the pin keys. Defaults to 'replica-pin:'.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def pin(self, client, seconds):
+        """
+        Pins a client to the primary for `seconds`.
+        """
+        self.client.set(self.prefix + client, 1, px=int(seconds * 1000))
+
+    def is_pinned(self, client):
+        """
+        Whether the client is pinned to the primary.
+        """
+        return bool(self.client.exists(self.prefix + client))
+
+
+def create_pin_store(url):
+    """
+    Creates the pin store of REPLICA_PIN_STORAGE_URL: 'memory://' (in-process),
+    'redis://host:6379/0' (needs the redis package) or 'fakeredis://'.
+
+    Raises:
+        ValueError: If the URL is not supported or the redis package is missing.
+    """
+    if url == 'memory://':
+        return MemoryPins()
+    client = redis_client(url)
+    if client is None:
+        raise ValueError(f'Unsupported REPLICA_PIN_STORAGE_URL: {url}')
+    return RedisPins(client)
+
+
+def is_client_pinned(app, client, cookie_value=None):
+    """
+    Whether a client wrote recently and must read from the primary.
+
+    The pin is looked up by the client's identity (see `app.auth.decorators.client_key`),
+    which every client sends; the sticky cookie also counts for clients that send cookies.
+    An unreachable pin store pins the client, since the primary is always up to date.
+
+    Args:
+        app (Flask): The application.
+        client (str): The client key.
+        cookie_value (str, optional): The value of the sticky cookie.
+    """
+    try:
+        if float(cookie_value or 0) > time.time():
+            return True
+    except ValueError:
+        pass
+    try:
+        return app.extensions['replica_pins'].is_pinned(client)
+    except Exception:
+        app.logger.exception('Replica pin store failed; reading from the primary')
+        return True
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica bind and writes to the primary.
+
+    Reads are routed to the bind named by SQLALCHEMY_REPLICA_BIND only while the
+    current request has been marked as a replica read (see `route_request`).
+    Everything else, including any flush, goes to the primary database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        """
+        Select the engine for a statement, preferring the replica for routed reads.
+
+        Returns:
+            Engine: The replica engine for routed reads, otherwise the engine chosen
+            by Flask-SQLAlchemy's bind key resolution.
+        """
+        if bind is None and not self._flushing and has_request_context() and g.get('use_replica'):
+            engine = self._db.engines.get(g.get('replica_bind'))
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_write(session, flush_context):
+    """
+    Remember that the current request wrote to the primary, so the client gets pinned.
+    """
+    if has_request_context():
+        g.db_wrote = True
+
+
+event.listen(RoutingSession, 'after_flush', _mark_write)
+
+
+def route_request():
+    """
+    Decide whether the current request may read from the replica.
+
+    A request is routed to the replica when it is a GET/HEAD on one of the
+    configured blueprints, a replica bind is configured, and the client has not
+    written recently (see `is_client_pinned`). Reads of pinned clients are
+    flagged with `g.pinned_to_primary` even without a replica, so they are not
+    coalesced with reads that started before their write (see `app.coalesce`).
+    """
+    config = current_app.config
+    if request.method not in READ_METHODS or request.blueprint not in config['REPLICA_BLUEPRINTS']:
+        return
+
+    from app.auth.decorators import get_client_key  # app.auth needs the models, which import this module
+    app = current_app._get_current_object()
+    if is_client_pinned(app, get_client_key(), request.cookies.get(STICKY_COOKIE)):
+        g.pinned_to_primary = True
+        return
+
+    bind = config['SQLALCHEMY_REPLICA_BIND']
+    if bind in config.get('SQLALCHEMY_BINDS', {}):
+        g.use_replica = True
+        g.replica_bind = bind
+
+
+def pin_to_primary(response):
+    """
+    Pin the client to the primary after a write so its next reads see its own changes.
+
+    The pin is stored by client identity, since the frontend calls the API
+    cross-origin without credentials and never sends cookies back; the sticky
+    cookie is still set for clients that do.
+    """
+    if g.get('db_wrote'):
+        from app.auth.decorators import get_client_key
+        seconds = current_app.config['REPLICA_STICKY_SECONDS']
+        try:
+            current_app.extensions['replica_pins'].pin(get_client_key(), seconds)
+        except Exception:
+            current_app.logger.exception('Replica pin store failed; client not pinned')
+        response.set_cookie(STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True)
+    return response
+
+
+def init_app(app):
+    """
+    Register the read/write routing hooks on the application.
+
+    Configuration:
+        SQLALCHEMY_REPLICA_BIND (str): Key in SQLALCHEMY_BINDS of the read replica. Defaults to 'replica'.
+        REPLICA_STICKY_SECONDS (int): How long a client reads from the primary after writing. Defaults to 5.
+        REPLICA_BLUEPRINTS (tuple): Blueprint names whose GET handlers may use the replica.
+        REPLICA_PIN_STORAGE_URL (str): Where the pins of the clients that wrote are kept: 'memory://'
+            (default, per process), 'redis://...' (shared by all the processes, needs the redis package)
+            or 'fakeredis://'. Use Redis with several worker processes.
+    """
+    app.config.setdefault('SQLALCHEMY_REPLICA_BIND', 'replica')
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+    app.config.setdefault('REPLICA_BLUEPRINTS', REPLICA_BLUEPRINTS)
+    app.extensions['replica_pins'] = create_pin_store(app.config.get('REPLICA_PIN_STORAGE_URL', 'memory://'))
+    app.before_request(route_request)
+    app.after_request(pin_to_primary)
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.orm import with_loader_criteria
+from app import db
+from app.routing import RoutingSession
+
+
+class SoftDeleteMixin:
+    """
+    Mixin for models whose rows are marked as deleted instead of being removed.
+
+    Rows with a `deleted_at` timestamp are hidden from every ORM query by
+    `filter_deleted` and hard-deleted later, in batches, by `purge_deleted`.
+
+    Attributes:
+        deleted_at (datetime): When the row was deleted, or None while it is active.
+    """
+    deleted_at = db.Column(db.DateTime, index=True)
+
+    @classmethod
+    def active_index(cls, name, *columns, unique=False):
+        """
+        Builds a partial index that only covers active rows (WHERE deleted_at IS NULL).
+
+        Queries on active rows keep using a small index no matter how many
+        deleted rows are waiting to be purged.
+
+        Args:
+            name (str): The name of the index.
+            *columns (str): The indexed columns.
+            unique (bool, optional): Whether the columns must be unique among active rows.
+
+        Returns:
+            Index: The partial index, to be listed in `__table_args__`.
+        """
+        where = db.text('deleted_at IS NULL')
+        return db.Index(name, *columns, unique=unique, postgresql_where=where, sqlite_where=where)
+
+    @property
+    def is_deleted(self):
+        """
+        Whether the row has been soft-deleted.
+        """
+        return self.deleted_at is not None
+
+    def soft_delete(self, commit=True):
+        """
+        Marks the row as deleted.
+
+        Args:
+            commit (bool, optional): Whether to commit the session. Defaults to True.
+        """
+        self.deleted_at = datetime.utcnow()
+        if commit:
+            db.session.commit()
+
+    def restore(self):
+        """
+        Marks a soft-deleted row as active again.
+        """
+        self.deleted_at = None
+        db.session.commit()
+
+    @classmethod
+    def get_deleted(cls, key):
+        """
+        Retrieves a soft-deleted row by its primary key.
+
+        Args:
+            key: The primary key of the row.
+
+        Returns:
+            The row if it exists and is deleted, otherwise None.
+        """
+        row = db.session.get(cls, key, execution_options={'include_deleted': True})
+        return row if row is not None and row.is_deleted else None
+
+    @classmethod
+    def purge_deleted(cls, before, batch_size=1000):
+        """
+        Hard-deletes the rows soft-deleted before `before`, one committed batch at a time.
+
+        Args:
+            before (datetime): Rows deleted before this moment are purged.
+            batch_size (int, optional): The number of rows deleted per transaction. Defaults to 1000.
+
+        Returns:
+            int: The number of rows purged.
+        """
+        primary_key = cls.__mapper__.primary_key[0]
+        purged = 0
+        while True:
+            batch = db.select(primary_key).where(cls.deleted_at < before).limit(batch_size)
+            result = db.session.execute(
+                db.delete(cls).where(primary_key.in_(batch)),
+                # 'purge' tells the summary hooks that only already-deleted rows are removed
+                execution_options={'synchronize_session': False, 'purge': True}
+            )
+            db.session.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                return purged
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def filter_deleted(execute_state):
+    """
+    Hides soft-deleted rows from every ORM SELECT, including relationship loads.
+
+    Refreshes of already-loaded objects are left alone, and a query can opt out
+    with the `include_deleted` execution option.
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get('include_deleted', False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
+
+
+def purge_all(before, batch_size=1000):
+    """
+    Purges every soft-deleted model, children before parents.
+
+    Args:
+        before (datetime): Rows deleted before this moment are purged.
+        batch_size (int, optional): The number of rows deleted per transaction. Defaults to 1000.
+
+    Returns:
+        dict: The number of rows purged per table.
+    """
+    from app.order.models import Order
+    from app.product.models import Product
+    from app.category.models import Category
+    from app.client.models import Client
+    from app.company.models import Company
+    from app.users.models import User
+
+    return {
+        model.__tablename__: model.purge_deleted(before, batch_size=batch_size)
+        for model in (Order, Product, Category, Client, Company, User)
+    }
+
+
+# CLI commands: flask soft-delete purge
+soft_delete_cli = AppGroup('soft-delete', help='Manage soft-deleted rows.')
+
+
+@soft_delete_cli.command('purge')
+@click.option('--days', default=30, show_default=True, help='Purge rows deleted more than this many days ago.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows deleted per transaction.')
+def purge_command(days, batch_size):
+    """
+    Hard-delete rows that were soft-deleted more than DAYS days ago.
+    """
+    purged = purge_all(datetime.utcnow() - timedelta(days=days), batch_size=batch_size)
+    for table, count in purged.items():
+        print(f'{table}: purged {count} rows')
+
+
+def init_app(app):
+    """
+    Register the soft-delete CLI commands on the application.
+    """
+    app.cli.add_command(soft_delete_cli)
@@ -0,0 +1,293 @@
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.routing import RoutingSession
+from app.category.models import Category
+from app.company.models import Company
+from app.product.models import Product, product_category
+
+# Tables whose set-based writes make every summary stale
+SUMMARIZED_TABLES = ('products', 'product_category', 'companies', 'categories')
+
+# Columns of a summary row after its key
+SUMMARY_COLUMNS = ('product_count', 'total_quantity', 'total_value_cents', 'updated_at')
+
+
+def _write_summaries(model, key, name, rows, active, keys):
+    """
+    Replaces the summary rows of `keys` (or all of them) with `rows`, in the current transaction.
+
+    On PostgreSQL and SQLite the rows are upserted instead of deleted and
+    re-inserted: a missing row is created first and the rows are locked, in key
+    order, before they are recomputed, so concurrent writers of the same company
+    or category wait for each other and the second one recomputes from the
+    first one's committed changes (with READ COMMITTED each statement sees what
+    was committed before it started) instead of failing on the primary key.
+    Rows whose company or category is no longer active are deleted.
+
+    Args:
+        model (type): CompanyStats or CategoryStats.
+        key (str): The key column, e.g. 'company_nit'.
+        name (str): The column with the copy of the name, e.g. 'company_name'.
+        rows (Select): The recomputed rows: key, name and SUMMARY_COLUMNS.
+        active (Select): The key and name of the active companies or categories to write.
+        keys (list): The keys to recompute, or None for all of them.
+    """
+    column = model.__table__.c[key]
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('postgresql', 'sqlite'):
+        # Databases without ON CONFLICT rewrite the rows
+        delete = db.delete(model)
+        if keys is not None:
+            delete = delete.where(column.in_(keys))
+        db.session.execute(delete)
+        db.session.execute(model.__table__.insert().from_select([key, name, *SUMMARY_COLUMNS], rows))
+        return
+
+    insert = (postgresql if dialect == 'postgresql' else sqlite).insert
+    db.session.execute(insert(model.__table__).from_select([key, name], active).on_conflict_do_nothing())
+    locked = db.select(column).order_by(column).with_for_update()
+    if keys is not None:
+        locked = locked.where(column.in_(keys))
+    db.session.execute(locked)
+
+    statement = insert(model.__table__).from_select([key, name, *SUMMARY_COLUMNS], rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={column_name: statement.excluded[column_name] for column_name in (name, *SUMMARY_COLUMNS)}
+    ))
+    stale = db.delete(model).where(column.not_in(active.with_only_columns(active.selected_columns[0])))
+    if keys is not None:
+        stale = stale.where(column.in_(keys))
+    db.session.execute(stale)
+
+
+class CompanyStats(db.Model):
+    """
+    Summary of a company's active products, kept up to date in the same
+    transaction as the product changes so dashboards read one row per company.
+    Writers of the same company wait for each other on its row until they commit.
+
+    Attributes:
+        company_nit (str): The company (primary key).
+        company_name (str): A copy of the company's name.
+        product_count (int): The number of active products.
+        total_quantity (int): The sum of their quantities.
+        total_value_cents (int): The sum of price * quantity in cents.
+        updated_at (datetime): When the row was last recomputed.
+    """
+    __tablename__ = 'company_stats'
+
+    company_nit = db.Column(db.String(50), db.ForeignKey('companies.nit', ondelete='CASCADE'), primary_key=True)
+    company_name = db.Column(db.String(100), nullable=False)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    total_quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    total_value_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def get_all(cls):
+        """
+        Retrieves the summaries of every company, ordered by NIT.
+        """
+        return cls.query.order_by(cls.company_nit).all()
+
+    @classmethod
+    def get(cls, nit):
+        """
+        Retrieves the summary of a company, or None if the company does not exist.
+        """
+        return db.session.get(cls, nit)
+
+    @classmethod
+    def refresh(cls, nits=None):
+        """
+        Recomputes the summaries of some companies, or of all of them, with an
+        INSERT ... SELECT ... ON CONFLICT in the current transaction (see `_write_summaries`).
+
+        Args:
+            nits (iterable, optional): The NITs to recompute. Defaults to every company.
+        """
+        rows = (
+            db.select(
+                Company.nit,
+                Company.name,
+                db.func.count(Product.id),
+                db.func.coalesce(db.func.sum(Product.quantity), 0),
+                db.func.coalesce(db.func.sum(Product.price_cents * Product.quantity), 0),
+                db.literal(datetime.utcnow())
+            )
+            .outerjoin(Product, db.and_(Product.company_nit == Company.nit, Product.deleted_at.is_(None)))
+            .where(Company.deleted_at.is_(None))
+            .group_by(Company.nit, Company.name)
+        )
+        active = db.select(Company.nit, Company.name).where(Company.deleted_at.is_(None)).order_by(Company.nit)
+        if nits is not None:
+            nits = sorted(nits)
+            rows = rows.where(Company.nit.in_(nits))
+            active = active.where(Company.nit.in_(nits))
+        _write_summaries(cls, 'company_nit', 'company_name', rows, active, nits)
+
+
+class CategoryStats(db.Model):
+    """
+    Summary of the active products directly assigned to a category.
+
+    Attributes:
+        category_id (int): The category (primary key).
+        category_name (str): A copy of the category's name.
+        product_count (int): The number of active products.
+        total_quantity (int): The sum of their quantities.
+        total_value_cents (int): The sum of price * quantity in cents.
+        updated_at (datetime): When the row was last recomputed.
+    """
+    __tablename__ = 'category_stats'
+
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    category_name = db.Column(db.String(100), nullable=False)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    total_quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    total_value_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def get_all(cls):
+        """
+        Retrieves the summaries of every category, ordered by ID.
+        """
+        return cls.query.order_by(cls.category_id).all()
+
+    @classmethod
+    def refresh(cls, category_ids=None):
+        """
+        Recomputes the summaries of some categories, or of all of them, with an
+        INSERT ... SELECT ... ON CONFLICT in the current transaction (see `_write_summaries`).
+
+        Args:
+            category_ids (iterable, optional): The categories to recompute. Defaults to every category.
+        """
+        products = (
+            db.select(product_category.c.category_id, Product.quantity, Product.price_cents)
+            .join(Product, Product.id == product_category.c.product_id)
+            .where(Product.deleted_at.is_(None))
+            .subquery()
+        )
+        rows = (
+            db.select(
+                Category.id,
+                Category.name,
+                db.func.count(products.c.category_id),
+                db.func.coalesce(db.func.sum(products.c.quantity), 0),
+                db.func.coalesce(db.func.sum(products.c.price_cents * products.c.quantity), 0),
+                db.literal(datetime.utcnow())
+            )
+            .outerjoin(products, products.c.category_id == Category.id)
+            .where(Category.deleted_at.is_(None))
+            .group_by(Category.id, Category.name)
+        )
+        active = db.select(Category.id, Category.name).where(Category.deleted_at.is_(None)).order_by(Category.id)
+        if category_ids is not None:
+            category_ids = sorted(category_ids)
+            rows = rows.where(Category.id.in_(category_ids))
+            active = active.where(Category.id.in_(category_ids))
+        _write_summaries(cls, 'category_id', 'category_name', rows, active, category_ids)
+
+
+def rebuild():
+    """
+    Recomputes every summary row and commits.
+    """
+    CompanyStats.refresh()
+    CategoryStats.refresh()
+    db.session.commit()
+
+
+def _pending(session):
+    """
+    The summaries to recompute before the session's transaction commits.
+    """
+    return session.info.setdefault('stats_pending', {'companies': set(), 'categories': set(), 'products': set()})
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def collect_stale_stats(session, flush_context):
+    """
+    Collects the companies and categories whose summaries the flushed rows change.
+    """
+    pending = _pending(session)
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table == 'products':
+            state = inspect(instance)
+            history = state.attrs.company_nit.history
+            pending['companies'].update(nit for nit in (*history.deleted, instance.company_nit) if nit is not None)
+            categories = state.attrs.categories.history
+            pending['categories'].update(category.id for category in categories.added + categories.deleted)
+            if instance.id is not None:
+                pending['products'].add(instance.id)
+        elif table == 'companies':
+            pending['companies'].add(instance.nit)
+        elif table == 'categories':
+            pending['categories'].add(instance.id)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def collect_bulk_stale_stats(execute_state):
+    """
+    Collects the summaries a set-based write to the summarized tables makes stale.
+
+    The affected rows are never loaded, so the writer declares them with the
+    `stats` execution option: a dict with the 'companies' (NITs), 'categories'
+    and 'products' (IDs, whose categories are recomputed) it changes; an empty
+    dict for writes that change no summary. A write without the option marks
+    every summary as stale. Purges only remove rows the summaries already
+    exclude, so they are skipped.
+    """
+    if execute_state.execution_options.get('purge'):
+        return
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        table = getattr(execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) not in SUMMARIZED_TABLES:
+            return
+        scope = execute_state.execution_options.get('stats')
+        if scope is None:
+            execute_state.session.info['stats_pending_all'] = True
+            return
+        pending = _pending(execute_state.session)
+        for name in ('companies', 'categories', 'products'):
+            pending[name].update(scope.get(name, ()))
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def refresh_stale_stats(session):
+    """
+    Recomputes the stale summaries inside the committing transaction,
+    so they are always consistent with the products.
+    """
+    session.flush()
+    everything = session.info.pop('stats_pending_all', False)
+    pending = session.info.pop('stats_pending', None)
+    if everything:
+        CompanyStats.refresh()
+        CategoryStats.refresh()
+    elif pending:
+        if pending['products']:
+            # A product's price or quantity changes the summaries of all its categories
+            pending['categories'].update(session.scalars(
+                db.select(product_category.c.category_id)
+                .where(product_category.c.product_id.in_(pending['products']))
+            ))
+        if pending['companies']:
+            CompanyStats.refresh(pending['companies'])
+        if pending['categories']:
+            CategoryStats.refresh(pending['categories'])
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def discard_stale_stats(session):
+    """
+    Forgets the stale summaries of a rolled back transaction.
+    """
+    session.info.pop('stats_pending', None)
+    session.info.pop('stats_pending_all', None)
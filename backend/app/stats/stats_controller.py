@@ -0,0 +1,68 @@
+from flask import Blueprint, jsonify
+from app.product.models import cents_to_price
+from app.stats.models import CompanyStats, CategoryStats, rebuild
+
+# Blueprint for the dashboard summaries
+stats_bp = Blueprint('stats_controller', __name__, url_prefix='/api/stats', cli_group='stats')
+
+
+def _company_stats(stats):
+    """
+    Serializes a company summary.
+    """
+    return {
+        'nit': stats.company_nit,
+        'name': stats.company_name,
+        'product_count': stats.product_count,
+        'total_quantity': stats.total_quantity,
+        'total_value': cents_to_price(stats.total_value_cents),
+        'total_value_cents': stats.total_value_cents,
+        'updated_at': stats.updated_at.isoformat()
+    }
+
+# Get the summaries of every company
+@stats_bp.route('/companies', methods=['GET'])
+def get_companies_stats():
+    """
+    Retrieves the product count and stock value of every company.
+    Reads only the company_stats summary table.
+    """
+    return jsonify([_company_stats(stats) for stats in CompanyStats.get_all()]), 200
+
+# Get the summary of a company
+@stats_bp.route('/companies/<string:nit>', methods=['GET'])
+def get_company_stats(nit):
+    """
+    Retrieves the product count and stock value of a company by its NIT.
+    If the company does not exist, an error is returned.
+    """
+    stats = CompanyStats.get(nit)
+    if stats is None:
+        return jsonify({'error': 'Company not found'}), 404
+    return jsonify(_company_stats(stats)), 200
+
+# Get the summaries of every category
+@stats_bp.route('/categories', methods=['GET'])
+def get_categories_stats():
+    """
+    Retrieves the product count and stock value of every category.
+    Reads only the category_stats summary table.
+    """
+    return jsonify([{
+        'id': stats.category_id,
+        'name': stats.category_name,
+        'product_count': stats.product_count,
+        'total_quantity': stats.total_quantity,
+        'total_value': cents_to_price(stats.total_value_cents),
+        'total_value_cents': stats.total_value_cents,
+        'updated_at': stats.updated_at.isoformat()
+    } for stats in CategoryStats.get_all()]), 200
+
+# Rebuild the summaries
+@stats_bp.cli.command('rebuild')
+def rebuild_command():
+    """
+    Recompute every company and category summary (flask stats rebuild).
+    """
+    rebuild()
+    print(f'Rebuilt {len(CompanyStats.get_all())} company and {len(CategoryStats.get_all())} category summaries')
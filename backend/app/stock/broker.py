@@ -0,0 +1,230 @@
+import json
+import queue
+import threading
+from sqlalchemy import event, inspect
+from app.routing import RoutingSession
+
+
+class Subscription:
+    """
+    A subscriber's queue of encoded stock events for one company.
+
+    Attributes:
+        company_nit (str): The company the subscriber listens to.
+        events (Queue): Pending events, already encoded as Server-Sent Events.
+        closed (bool): Whether the broker dropped the subscriber.
+    """
+
+    def __init__(self, company_nit, max_pending):
+        """
+        Initializes an empty subscription.
+
+        Args:
+            company_nit (str): The company the subscriber listens to.
+            max_pending (int): How many undelivered events are kept before the subscriber is dropped.
+        """
+        self.company_nit = company_nit
+        self.events = queue.Queue(maxsize=max_pending)
+        self.closed = False
+
+
+class StockBroker:
+    """
+    In-process publish/subscribe hub for stock updates, keyed by company NIT.
+
+    Each event is encoded once and the same bytes are handed to every
+    subscriber, so publishing costs one queue insert per subscriber. A
+    subscriber that falls `max_pending` events behind is dropped and its
+    stream closed, so one slow client cannot hold memory for everyone; the
+    browser's EventSource reconnects on its own.
+
+    Only clients connected to this process are reached, so the stream should
+    be served by a single gevent or threaded worker.
+    """
+
+    def __init__(self, max_pending=100):
+        """
+        Initializes a broker without subscribers.
+
+        Args:
+            max_pending (int, optional): Undelivered events kept per subscriber. Defaults to 100.
+        """
+        self.max_pending = max_pending
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, company_nit):
+        """
+        Registers a subscriber for the stock updates of a company.
+
+        Args:
+            company_nit (str): The company to listen to.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        subscription = Subscription(company_nit, self.max_pending)
+        with self._lock:
+            self._subscriptions.setdefault(company_nit, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Removes a subscriber.
+
+        Args:
+            subscription (Subscription): The subscription to remove.
+        """
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.company_nit)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.company_nit]
+
+    def subscriber_count(self, company_nit=None):
+        """
+        Returns the number of subscribers of a company, or of all companies.
+        """
+        with self._lock:
+            if company_nit is not None:
+                return len(self._subscriptions.get(company_nit, ()))
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+    def company_nits(self):
+        """
+        Returns the NITs of the companies with subscribers.
+        """
+        with self._lock:
+            return set(self._subscriptions)
+
+    def publish(self, company_nit, data):
+        """
+        Sends a stock event to every subscriber of a company.
+
+        Args:
+            company_nit (str): The company the event belongs to.
+            data (dict): The event payload.
+        """
+        with self._lock:
+            subscribers = list(self._subscriptions.get(company_nit, ()))
+        if not subscribers:
+            return
+
+        encoded = f"event: stock\ndata: {json.dumps(data)}\n\n"
+        for subscription in subscribers:
+            try:
+                subscription.events.put_nowait(encoded)
+            except queue.Full:
+                self.unsubscribe(subscription)
+                _close(subscription)
+
+
+def _close(subscription):
+    """
+    Marks a dropped subscriber as closed and wakes up its stream.
+    """
+    subscription.closed = True
+    try:
+        subscription.events.get_nowait()
+        subscription.events.put_nowait(None)
+    except (queue.Empty, queue.Full):
+        pass
+
+
+# Broker shared by the application in this process
+broker = StockBroker()
+
+# Product columns whose changes are pushed to subscribers
+STOCK_COLUMNS = ('quantity', 'price')
+
+
+def _stock_events(session, product):
+    """
+    Builds the stock events of a flushed product: none if its stock, price,
+    visibility and company did not change. A product moved to another company
+    is a 'delete' for the previous one and a 'create' for the new one; a
+    restored product is a 'create'.
+    """
+    state = inspect(product)
+    deleted_changed = state.attrs.deleted_at.history.has_changes()
+    previous_nits = [nit for nit in state.attrs.company_nit.history.deleted if nit != product.company_nit]
+    if product in session.deleted or product.deleted_at is not None:
+        if product not in session.deleted and not deleted_changed:
+            return []  # Already hidden from the subscribers
+        operation = 'delete'
+    elif product in session.new or deleted_changed or previous_nits:
+        operation = 'create'
+    elif any(state.attrs[column].history.has_changes() for column in STOCK_COLUMNS):
+        operation = 'update'
+    else:
+        return []
+    data = {
+        'operation': operation,
+        'product_id': product.id,
+        'code': product.code,
+        'company_nit': product.company_nit,
+        'quantity': product.quantity,
+        'price': float(product.price)
+    }
+    moved = [dict(data, operation='delete', company_nit=nit) for nit in previous_nits if nit is not None]
+    return moved + [data]
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def collect_stock_events(session, flush_context):
+    """
+    Collects the stock events of the flushed products until the transaction ends.
+    """
+    pending = session.info.setdefault('stock_events', [])
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(instance, '__tablename__', None) == 'products':
+            pending.extend(_stock_events(session, instance))
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def collect_bulk_stock_changes(execute_state):
+    """
+    Collects the companies whose products a set-based write changes (imports,
+    company deletes and restores, warehouse total rebuilds).
+
+    The rows are never loaded, so the companies come from the `stats` execution
+    option the writer declares for the summaries (see `app.stats.models`).
+    Their subscribers get one 'refresh' event per company and reload the list.
+    """
+    if not (execute_state.is_insert or execute_state.is_update or execute_state.is_delete):
+        return
+    if execute_state.execution_options.get('purge'):
+        return  # Purged rows were already deleted for the subscribers
+    if getattr(getattr(execute_state.statement, 'table', None), 'name', None) != 'products':
+        return
+    scope = execute_state.execution_options.get('stats')
+    refresh = execute_state.session.info.setdefault('stock_refresh', set())
+    if scope is None:
+        refresh.add(None)  # Unknown companies: every subscriber reloads
+    else:
+        refresh.update(nit for nit in scope.get('companies', ()) if nit is not None)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def publish_stock_events(session):
+    """
+    Publishes the collected stock events once they are committed.
+    """
+    for data in session.info.pop('stock_events', []):
+        if data['company_nit'] is not None:
+            broker.publish(data['company_nit'], data)
+    refresh = session.info.pop('stock_refresh', set())
+    if None in refresh:
+        refresh = broker.company_nits()
+    for company_nit in refresh:
+        broker.publish(company_nit, {'operation': 'refresh', 'company_nit': company_nit})
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def discard_stock_events(session):
+    """
+    Drops the collected stock events of a rolled back transaction.
+    """
+    session.info.pop('stock_events', None)
+    session.info.pop('stock_refresh', None)
@@ -0,0 +1,44 @@
+import queue
+from flask import Blueprint, Response, current_app
+from app.stock.broker import broker
+
+# Blueprint for stock updates
+stock_bp = Blueprint('stock_controller', __name__, url_prefix='/api/stock')
+
+# Stream the stock updates of a company
+@stock_bp.route('/<string:nit>/stream', methods=['GET'])
+def stream_stock(nit):
+    """
+    Pushes the quantity and price changes of a company's products as Server-Sent Events.
+
+    Events are published by the product after-commit hooks, so only committed
+    changes are sent. A comment is sent every STOCK_STREAM_HEARTBEAT_SECONDS to
+    keep idle connections open. Each open stream holds a worker thread or
+    greenlet, so serve it with a threaded or gevent worker.
+
+    Returns:
+        A text/event-stream response with one 'stock' event per change.
+    """
+    heartbeat = current_app.config.get('STOCK_STREAM_HEARTBEAT_SECONDS', 15)
+    subscription = broker.subscribe(nit)
+
+    def events():
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.closed:
+                try:
+                    encoded = subscription.events.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                if encoded is None:
+                    break
+                yield encoded
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
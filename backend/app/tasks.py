@@ -0,0 +1,32 @@
+import threading
+from flask import current_app
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Runs `func(*args, **kwargs)` in a daemon thread inside an application context.
+
+    The thread gets its own database session, which is removed when the
+    application context ends. Errors are logged, since there is no request
+    to report them to.
+
+    Args:
+        func (callable): The function to run.
+        *args: Positional arguments for `func`.
+        **kwargs: Keyword arguments for `func`.
+
+    Returns:
+        Thread: The started thread.
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                app.logger.exception('Background task %s failed', func.__name__)
+
+    thread = threading.Thread(target=run, name=f'task-{func.__name__}', daemon=True)
+    thread.start()
+    return thread
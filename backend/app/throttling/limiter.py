@@ -0,0 +1,131 @@
+import math
+import re
+from flask import current_app, g, request, jsonify
+from app.auth.decorators import get_client_key
+from app.throttling.storage import create_storage
+
+# Budgets of the routes that need a tighter limit than RATELIMIT_DEFAULT, by endpoint or blueprint
+DEFAULT_BUDGETS = {
+    'auth.login': '10/minute',  # Password guessing
+    'product_controller.get_all_products': '60/minute',  # Reads the whole catalogue
+    'email_controller.send_email': '20/hour',  # Each request spends SES quota
+    'batch_controller.run_batch': '60/minute',  # On top of the budgets of its sub-requests
+}
+
+# Budget format: '<requests>/<period>' or '<requests>/<n> <period>s', e.g. '10/minute' or '100/15 minutes'
+BUDGET = re.compile(r'^\s*(\d+)\s*/\s*(\d+)?\s*(second|minute|hour|day)s?\s*$')
+
+PERIOD_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_budget(budget):
+    """
+    Parses a budget such as '10/minute' into a token bucket.
+
+    Returns:
+        tuple: (capacity in requests, refill rate in requests per second).
+
+    Raises:
+        ValueError: If the budget is not valid.
+    """
+    match = BUDGET.match(str(budget))
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f'Invalid rate limit budget: {budget}')
+    requests, periods, period = int(match.group(1)), int(match.group(2) or 1), match.group(3)
+    return requests, requests / (periods * PERIOD_SECONDS[period])
+
+
+def take_token(app, endpoint, blueprint, client):
+    """
+    Takes a token from the client's bucket for a route, whose budget is its
+    endpoint's, its blueprint's or RATELIMIT_DEFAULT.
+
+    Args:
+        app (Flask): The application with the limiter installed.
+        endpoint (str): The endpoint of the route.
+        blueprint (str): The blueprint of the route, or None.
+        client (str): The client key (see `app.auth.decorators.client_key`).
+
+    Returns:
+        tuple: (allowed, capacity, tokens left, refill rate), or None when the route
+        is unlimited or the storage failed (the request is then allowed).
+    """
+    budgets = app.extensions['ratelimit']['budgets']
+    scope = next((scope for scope in (endpoint, blueprint) if scope and scope in budgets), 'default')
+    capacity, rate = budgets[scope]
+    if capacity is None:
+        return None
+
+    storage = app.extensions['ratelimit']['storage']
+    try:
+        allowed, tokens = storage.take(f'{scope}:{client}', rate, capacity)
+    except Exception:
+        # An unreachable limiter store must not take the API down with it
+        app.logger.exception('Rate limit storage failed; request allowed')
+        return None
+    return allowed, capacity, tokens, rate
+
+
+def retry_after(tokens, rate):
+    """
+    Whole seconds until a bucket with `tokens` left holds a token again.
+    """
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+def check_rate_limit():
+    """
+    Takes a token from the client's bucket for the route, rejecting the request
+    with 429 and Retry-After when the bucket is empty.
+    """
+    if request.method == 'OPTIONS' or request.endpoint is None or request.endpoint == 'static':
+        return None
+    taken = take_token(current_app, request.endpoint, request.blueprint, get_client_key())
+    if taken is None:
+        return None
+
+    allowed, capacity, tokens, rate = taken
+    g.rate_limit = (capacity, int(tokens))
+    if allowed:
+        return None
+    seconds = retry_after(tokens, rate)
+    response = jsonify({'error': 'Too many requests', 'retry_after': seconds})
+    response.headers['Retry-After'] = str(seconds)
+    return response, 429
+
+
+def add_rate_limit_headers(response):
+    """
+    Tells the client the size of its bucket and the requests left in it.
+    """
+    if 'rate_limit' in g:
+        capacity, remaining = g.rate_limit
+        response.headers['X-RateLimit-Limit'] = str(capacity)
+        response.headers['X-RateLimit-Remaining'] = str(remaining)
+    return response
+
+
+def init_app(app):
+    """
+    Installs the per-client rate limiter.
+
+    Configuration:
+        RATELIMIT_ENABLED (bool): Whether requests are limited. Defaults to True.
+        RATELIMIT_DEFAULT (str): The budget of the routes without one of their own. Defaults to '600/minute'.
+        RATELIMIT_BUDGETS (dict): Budgets by endpoint ('auth.login') or blueprint ('product_controller'),
+            added to DEFAULT_BUDGETS; None leaves a route unlimited.
+        RATELIMIT_STORAGE_URL (str): 'memory://' (default, per process), 'redis://...' (shared by all the
+            processes, needs the redis package) or 'fakeredis://' (the Redis storage on an in-process fake).
+    """
+    if not app.config.get('RATELIMIT_ENABLED', True):
+        return
+    budgets = {'default': app.config.get('RATELIMIT_DEFAULT', '600/minute')}
+    budgets.update(DEFAULT_BUDGETS)
+    budgets.update(app.config.get('RATELIMIT_BUDGETS', {}))
+    app.extensions['ratelimit'] = {
+        'budgets': {scope: (None, None) if budget is None else parse_budget(budget)
+                    for scope, budget in budgets.items()},
+        'storage': create_storage(app.config.get('RATELIMIT_STORAGE_URL', 'memory://'))
+    }
+    app.before_request(check_rate_limit)
+    app.after_request(add_rate_limit_headers)
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import deque
+from flask import current_app, g, request, jsonify
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.batch.executor import SUBREQUEST_ENVIRON
+from app.routing import RoutingSession
+
+# Key of session.info holding when the session started waiting for a connection
+WAIT_STARTED = 'pool_wait_started'
+
+
+class PoolWaitMonitor:
+    """
+    Average time the sessions of this process waited for a database connection
+    over the last `window` seconds.
+    """
+
+    def __init__(self, window=1.0):
+        """
+        Args:
+            window (float, optional): Seconds of observations averaged. Defaults to 1.
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._waits = deque()
+        self._total = 0.0
+
+    def observe(self, seconds, now=None):
+        """
+        Records a wait for a connection.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._waits.append((now, seconds))
+            self._total += seconds
+            self._expire(now)
+
+    def average(self, now=None):
+        """
+        The average wait in seconds within the window, or 0 without recent waits.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            return self._total / len(self._waits) if self._waits else 0.0
+
+    def _expire(self, now):
+        """
+        Drops the observations older than the window.
+        """
+        while self._waits and self._waits[0][0] < now - self.window:
+            self._total -= self._waits.popleft()[1]
+        if not self._waits:
+            self._total = 0.0
+
+
+# Pool waits of this process
+monitor = PoolWaitMonitor()
+
+# Requests being served by this process
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _start_wait(orm_execute_state):
+    """
+    Stamps when a statement asks for a connection; the session checks one out right after this event.
+    """
+    orm_execute_state.session.info.setdefault(WAIT_STARTED, time.perf_counter())
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def _end_wait(session, transaction, connection):
+    """
+    Records the wait once the session holds its connection.
+    """
+    started = session.info.pop(WAIT_STARTED, None)
+    if started is not None:
+        monitor.observe(time.perf_counter() - started)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _clear_wait(session, transaction):
+    """
+    Forgets the stamp of statements that ran on a connection the session already held.
+    """
+    if transaction.parent is None:
+        session.info.pop(WAIT_STARTED, None)
+
+
+def pool_saturated(app):
+    """
+    Whether the average connection wait of this process is over LOAD_SHED_WAIT_MS.
+    """
+    return monitor.average() * 1000 > app.config.get('LOAD_SHED_WAIT_MS', 500)
+
+
+def _overloaded(message):
+    """
+    503 response asking the client to come back after LOAD_SHED_RETRY_AFTER seconds.
+    """
+    retry_after = current_app.config.get('LOAD_SHED_RETRY_AFTER', 2)
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+
+def shed_load():
+    """
+    Rejects the request with 503 while the database pool is saturated (the
+    average connection wait is over LOAD_SHED_WAIT_MS) or, with
+    LOAD_SHED_MAX_IN_FLIGHT, while this process serves that many requests.
+    """
+    global _in_flight
+    if request.environ.get(SUBREQUEST_ENVIRON):
+        # The batch request was already admitted and holds the slot
+        return None
+    if pool_saturated(current_app):
+        return _overloaded('Service overloaded, database connections are busy')
+
+    max_in_flight = current_app.config.get('LOAD_SHED_MAX_IN_FLIGHT', 0)
+    if max_in_flight:
+        with _in_flight_lock:
+            if _in_flight >= max_in_flight:
+                return _overloaded('Service overloaded, too many requests in progress')
+            _in_flight += 1
+        g.in_flight = True
+    return None
+
+
+def release_slot(error=None):
+    """
+    Frees the in-flight slot of the request.
+    """
+    global _in_flight
+    if g.pop('in_flight', False):
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def handle_pool_timeout(error):
+    """
+    A request that gave up waiting for a connection (pool_timeout) is an overload, not a server error.
+    """
+    monitor.observe(current_app.config.get('LOAD_SHED_WAIT_MS', 500) / 1000 * 2)
+    return _overloaded('Service overloaded, no database connection available')
+
+
+def init_app(app):
+    """
+    Installs the load shedding hooks.
+
+    Configuration:
+        LOAD_SHED_ENABLED (bool): Whether requests are shed. Defaults to True.
+        LOAD_SHED_WAIT_MS (float): Average pool wait, in milliseconds, over which requests are shed. Defaults to 500.
+        LOAD_SHED_WINDOW (float): Seconds of pool waits averaged. Defaults to 1.
+        LOAD_SHED_MAX_IN_FLIGHT (int): Requests served at once by a process; 0 (default) for no limit.
+        LOAD_SHED_RETRY_AFTER (int): Retry-After of the 503 responses, in seconds. Defaults to 2.
+    """
+    if not app.config.get('LOAD_SHED_ENABLED', True):
+        return
+    monitor.window = app.config.get('LOAD_SHED_WINDOW', 1.0)
+    app.before_request(shed_load)
+    app.teardown_request(release_slot)
+    app.register_error_handler(PoolTimeoutError, handle_pool_timeout)
@@ -0,0 +1,193 @@
+import threading
+import time
+
+# Atomic token bucket for Redis: KEYS[1] = bucket, ARGV = rate, capacity, cost, now.
+# Returns {1 if taken else 0, tokens left as a string (Lua numbers become integers in replies)}
+TOKEN_BUCKET_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local rate, capacity, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local taken = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    taken = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {taken, tostring(tokens)}
+"""
+
+
+def _refill(tokens, updated_at, rate, capacity, now):
+    """
+    The tokens of a bucket at `now`, refilled at `rate` per second up to `capacity`.
+    """
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class MemoryStorage:
+    """
+    Token buckets kept in this process. Each worker process limits on its own,
+    so with N workers a client can get up to N times its budget.
+    """
+
+    # Idle buckets are dropped when there are more than this many
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        """
+        Initializes an empty set of buckets.
+        """
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, rate, capacity, cost=1):
+        """
+        Takes `cost` tokens from a bucket that starts full.
+
+        Args:
+            key (str): The bucket.
+            rate (float): Tokens added per second.
+            capacity (float): The size of the bucket (the allowed burst).
+            cost (float, optional): The tokens taken. Defaults to 1.
+
+        Returns:
+            tuple: (taken, tokens left).
+        """
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, rate, capacity, now)
+            taken = tokens >= cost
+            if taken:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+        return taken, tokens
+
+    def _prune(self, now, idle_seconds=3600):
+        """
+        Drops the buckets that haven't been used for `idle_seconds` (they would be full again).
+        """
+        self._buckets = {key: state for key, state in self._buckets.items() if now - state[1] < idle_seconds}
+
+
+class RedisStorage:
+    """
+    Token buckets shared by every worker through Redis (or any server that
+    runs Redis Lua scripts), updated atomically by TOKEN_BUCKET_SCRIPT.
+    """
+
+    def __init__(self, client, prefix='ratelimit:'):
+        """
+        Args:
+            client: A redis-py compatible client (e.g. `redis.Redis.from_url(...)` or `FakeRedis()`).
+            prefix (str, optional): Prefix of the bucket keys. Defaults to 'ratelimit:'.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def take(self, key, rate, capacity, cost=1):
+        """
+        Takes `cost` tokens from a bucket that starts full (see `MemoryStorage.take`).
+        """
+        taken, tokens = self.client.eval(TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, rate, capacity, cost, time.time())
+        return bool(int(taken)), float(tokens)
+
+
+class FakeRedis:
+    """
+    In-process stand-in for a Redis client that only runs TOKEN_BUCKET_SCRIPT
+    and expiring SET/EXISTS, for tests and local development of the Redis
+    storages without a server.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty fake database.
+        """
+        self._lock = threading.Lock()
+        self.data = {}
+        self.expires_at = {}
+
+    def set(self, key, value, px=None):
+        """
+        Stores a value, expiring after `px` milliseconds if given.
+        """
+        with self._lock:
+            self.data[key] = value
+            if px is None:
+                self.expires_at.pop(key, None)
+            else:
+                self.expires_at[key] = time.time() + px / 1000
+        return True
+
+    def exists(self, key):
+        """
+        1 if the key holds an unexpired value, else 0.
+        """
+        with self._lock:
+            if key in self.expires_at and self.expires_at[key] <= time.time():
+                del self.data[key], self.expires_at[key]
+            return int(key in self.data)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        """
+        Runs TOKEN_BUCKET_SCRIPT with the same arguments and reply as Redis would.
+
+        Raises:
+            ValueError: For any other script.
+        """
+        if script != TOKEN_BUCKET_SCRIPT or numkeys != 1:
+            raise ValueError('FakeRedis only runs the token bucket script')
+        key, rate, capacity, cost, now = keys_and_args[0], *(float(arg) for arg in keys_and_args[1:])
+        with self._lock:
+            state = self.data.get(key, {})
+            tokens = _refill(float(state.get('tokens', capacity)), float(state.get('updated_at', now)), rate, capacity, now)
+            taken = 0
+            if tokens >= cost:
+                tokens -= cost
+                taken = 1
+            self.data[key] = {'tokens': tokens, 'updated_at': now}
+        return [taken, str(tokens).encode()]
+
+
+def redis_client(url):
+    """
+    Connects to the Redis server of a 'redis://host:6379/0' URL (needs the redis
+    package), or creates a FakeRedis for 'fakeredis://'.
+
+    Returns:
+        The client, or None if the URL is not a Redis URL.
+
+    Raises:
+        ValueError: If the redis package is missing.
+    """
+    if url == 'fakeredis://':
+        return FakeRedis()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError(f'The Redis URL {url} requires the redis package')
+        return redis.Redis.from_url(url)
+    return None
+
+
+def create_storage(url):
+    """
+    Creates the bucket storage of RATELIMIT_STORAGE_URL: 'memory://' (in-process),
+    'redis://host:6379/0' (needs the redis package) or 'fakeredis://'.
+
+    Raises:
+        ValueError: If the URL is not supported or the redis package is missing.
+    """
+    if url == 'memory://':
+        return MemoryStorage()
+    client = redis_client(url)
+    if client is None:
+        raise ValueError(f'Unsupported RATELIMIT_STORAGE_URL: {url}')
+    return RedisStorage(client)
@@ -2,6 +2,7 @@ from enum import Enum
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_sqlalchemy import SQLAlchemy
 from app import db
+from app.soft_delete import SoftDeleteMixin
 
 # Enum for user roles
 class RoleEnum(Enum):
@@ -16,7 +17,7 @@ class RoleEnum(Enum):
     USER = 'USER'
 
 # User model class for handling user data in the database
-class User(db.Model):
+class User(SoftDeleteMixin, db.Model):
     """
     User model representing the 'users' table in the database.
     
@@ -28,11 +29,15 @@ class User(db.Model):
         - roles (str): A comma-separated string of roles assigned to the user.
     """
     __tablename__ = 'users'
+    __table_args__ = (
+        # Emails only need to be unique among active users
+        SoftDeleteMixin.active_index('uq_users_email_active', 'email', unique=True),
+    )
 
     # Define the columns in the 'users' table
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(120), nullable=False)
     password = db.Column(db.String(200), nullable=False)
     roles = db.Column(db.String(50), nullable=False)  # Stored as a comma-separated string for simplicity
 
@@ -144,7 +149,7 @@ class User(db.Model):
     @classmethod
     def delete_user(cls, user_id):
         """
-        Deletes a user from the database by their ID.
+        Soft-deletes a user by their ID. It is hard-deleted later by the purge job.
 
         Args:
             user_id (int): The ID of the user to delete.
@@ -154,8 +159,7 @@ class User(db.Model):
         """
         user = cls.query.get(user_id)
         if user:
-            db.session.delete(user)
-            db.session.commit()
+            user.soft_delete()
             return True
         return False
 
@@ -0,0 +1,239 @@
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.ledger.models import set_movement_context
+from app.product.models import Product
+
+
+class Warehouse(db.Model):
+    """
+    A place where stock is kept.
+
+    Attributes:
+        id (int): The unique identifier of the warehouse (Primary key).
+        name (str): The unique name of the warehouse.
+        address (str): The address of the warehouse.
+        created_at (datetime): When the warehouse was created.
+    """
+    __tablename__ = 'warehouses'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    address = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        """
+        String representation of the warehouse.
+        """
+        return f'<Warehouse {self.name}>'
+
+    def to_dict(self):
+        """
+        Serializes the warehouse for the API.
+        """
+        return {'id': self.id, 'name': self.name, 'address': self.address}
+
+    @classmethod
+    def create_warehouse(cls, name, address=None):
+        """
+        Creates a new warehouse.
+
+        Raises:
+            IntegrityError: If the name is already in use.
+        """
+        warehouse = cls(name=name, address=address)
+        db.session.add(warehouse)
+        db.session.commit()
+        return warehouse
+
+    @classmethod
+    def get_all_warehouses(cls):
+        """
+        Retrieves every warehouse, ordered by name.
+        """
+        return cls.query.order_by(cls.name).all()
+
+    @classmethod
+    def get_warehouse_by_id(cls, warehouse_id):
+        """
+        Fetches a warehouse by its ID, or None if it does not exist.
+        """
+        return db.session.get(cls, warehouse_id)
+
+    def get_stock_page(self, page=1, per_page=20):
+        """
+        Retrieves one page of the active products stocked in the warehouse, by product ID.
+
+        Returns:
+            Pagination: (StockLocation, Product) rows.
+        """
+        query = (
+            db.session.query(StockLocation, Product)
+            .join(Product, Product.id == StockLocation.product_id)
+            .filter(StockLocation.warehouse_id == self.id)
+            .order_by(StockLocation.product_id)
+        )
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+
+class StockLocation(db.Model):
+    """
+    The quantity of a product held in one warehouse.
+
+    Once a product has stock locations, `Product.quantity` is the sum of them,
+    maintained by `adjust` in the same transaction. The stock a product had
+    before it was first stocked in a warehouse is placed in that warehouse.
+
+    Attributes:
+        product_id (int): The product (primary key).
+        warehouse_id (int): The warehouse (primary key).
+        quantity (int): The quantity in the warehouse, never negative.
+    """
+    __tablename__ = 'stock_locations'
+    __table_args__ = (
+        db.CheckConstraint('quantity >= 0', name='ck_stock_locations_quantity'),
+        # The primary key serves a product's locations; listing a warehouse needs the reverse order
+        db.Index('ix_stock_locations_warehouse_product', 'warehouse_id', 'product_id'),
+    )
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+    warehouse = db.relationship('Warehouse')
+
+    @classmethod
+    def get_locations(cls, product_id):
+        """
+        Retrieves the stock locations of a product, by warehouse ID.
+        """
+        return cls.query.filter_by(product_id=product_id).order_by(cls.warehouse_id).all()
+
+    @classmethod
+    def has_locations(cls, product_id):
+        """
+        Whether the quantity of a product is managed per warehouse.
+        """
+        return db.session.scalar(db.select(db.exists().where(cls.product_id == product_id)))
+
+    @classmethod
+    def _ensure(cls, product_id, warehouse_id):
+        """
+        Creates the location of a product in a warehouse if it is missing. The
+        first location of a product receives the quantity the product already had.
+        """
+        located = db.exists().where(cls.product_id == product_id)
+        rows = db.select(
+            Product.id, db.literal(warehouse_id), db.case((located, 0), else_=Product.quantity)
+        ).where(Product.id == product_id)
+        insert = cls.__table__.insert()
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = (postgresql if dialect == 'postgresql' else sqlite).insert(cls.__table__)
+            db.session.execute(insert.from_select(['product_id', 'warehouse_id', 'quantity'], rows)
+                               .on_conflict_do_nothing())
+        elif db.session.get(cls, (product_id, warehouse_id)) is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert.from_select(['product_id', 'warehouse_id', 'quantity'], rows))
+            except IntegrityError:
+                pass  # Created by a concurrent request
+
+    @classmethod
+    def _add(cls, product_id, warehouse_id, quantity):
+        """
+        Adds a (possibly negative) quantity to a location with one guarded UPDATE.
+
+        Raises:
+            ValueError: If the location would go below zero.
+        """
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.product_id == product_id, cls.warehouse_id == warehouse_id, cls.quantity + quantity >= 0)
+            .values(quantity=cls.quantity + quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            raise ValueError(f'Insufficient stock in warehouse {warehouse_id}')
+
+    @classmethod
+    def adjust(cls, product, warehouse_id, quantity):
+        """
+        Adds stock to (or removes it from) a warehouse and updates the product's
+        total in the same transaction, then commits.
+
+        The product row is locked first so concurrent changes to the same product
+        are applied one after the other. The location is updated in SQL, never read
+        and written back, and the total is recomputed from the locations.
+
+        Args:
+            product (Product): The product.
+            warehouse_id (int): The warehouse.
+            quantity (int): The quantity to add; negative to remove.
+
+        Raises:
+            ValueError: If the warehouse does not hold enough stock. Nothing is changed.
+        """
+        cls._lock(product)
+        cls._ensure(product.id, warehouse_id)
+        cls._add(product.id, warehouse_id, quantity)
+        set_movement_context(product.id, 'adjust', warehouse_id=warehouse_id, quantity_change=quantity)
+        # Changes to the product's locations are serialized by the lock, so their sum is exact;
+        # assigning it through the ORM lets the product go through the flush hooks (changes, stock stream, stats)
+        product.quantity = db.session.scalar(
+            db.select(db.func.sum(cls.quantity)).where(cls.product_id == product.id)
+        )
+        db.session.commit()
+
+    @classmethod
+    def transfer(cls, product, from_warehouse_id, to_warehouse_id, quantity):
+        """
+        Moves stock of a product between two warehouses in one transaction, then commits.
+        The product's total does not change.
+
+        Raises:
+            ValueError: If the source warehouse does not hold enough stock. Nothing is changed.
+        """
+        cls._lock(product)
+        cls._ensure(product.id, from_warehouse_id)
+        cls._add(product.id, from_warehouse_id, -quantity)
+        cls._ensure(product.id, to_warehouse_id)
+        cls._add(product.id, to_warehouse_id, quantity)
+        db.session.commit()
+
+    @staticmethod
+    def _lock(product):
+        """
+        Locks the product row until the transaction ends (a no-op on SQLite, which locks the whole database).
+        """
+        db.session.execute(db.select(Product.id).where(Product.id == product.id).with_for_update())
+
+    @classmethod
+    def rebuild_totals(cls):
+        """
+        Recomputes the quantity of every product with stock locations from them, and commits.
+
+        Returns:
+            int: The number of products updated.
+        """
+        total = (
+            db.select(db.func.sum(cls.quantity))
+            .where(cls.product_id == Product.id)
+            .scalar_subquery()
+        )
+        drifted = db.and_(db.exists().where(cls.product_id == Product.id), Product.quantity != total)
+        rows = db.session.execute(db.select(Product.id, Product.company_nit).where(drifted)).all()
+        result = db.session.execute(
+            db.update(Product)
+            .where(drifted)
+            .values(quantity=total)
+            .execution_options(synchronize_session=False, stats={
+                'companies': {company_nit for _, company_nit in rows},
+                'products': [product_id for product_id, _ in rows]
+            })
+        )
+        db.session.commit()
+        return result.rowcount
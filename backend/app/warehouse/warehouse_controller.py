@@ -0,0 +1,194 @@
+import click
+from flask import Blueprint, request, jsonify
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.product.models import Product
+from app.warehouse.models import Warehouse, StockLocation
+
+# Maximum page size of the stock listing
+MAX_PER_PAGE = 100
+
+# Blueprint for warehouses and their stock
+warehouse_bp = Blueprint('warehouse_controller', __name__, url_prefix='/api/warehouses', cli_group='warehouses')
+
+
+def _integer_field(data, field):
+    """
+    Reads an integer field of a JSON body, or None if it is missing or not an integer.
+    """
+    value = data.get(field)
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    return value
+
+
+def _stock_response(product):
+    """
+    The total quantity of a product and its quantity per warehouse.
+    """
+    return {
+        'product_id': product.id,
+        'quantity': product.quantity,
+        'locations': [{
+            'warehouse_id': location.warehouse_id,
+            'warehouse_name': location.warehouse.name,
+            'quantity': location.quantity
+        } for location in StockLocation.get_locations(product.id)]
+    }
+
+# Create a warehouse
+@warehouse_bp.route('/', methods=['POST'])
+def create_warehouse():
+    """
+    Creates a warehouse. Requires 'name'; 'address' is optional.
+
+    Returns:
+        JSON response with the warehouse, status 201; 409 if the name is in use.
+    """
+    data = request.get_json()
+    if not data or not data.get('name'):
+        return jsonify({'error': 'Missing required field: name'}), 400
+
+    try:
+        warehouse = Warehouse.create_warehouse(name=data['name'], address=data.get('address'))
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'A warehouse with this name already exists'}), 409
+    return jsonify(warehouse.to_dict()), 201
+
+# Get all warehouses
+@warehouse_bp.route('/', methods=['GET'])
+def get_warehouses():
+    """
+    Lists every warehouse.
+    """
+    return jsonify([warehouse.to_dict() for warehouse in Warehouse.get_all_warehouses()]), 200
+
+# Get the stock of a warehouse
+@warehouse_bp.route('/<int:warehouse_id>/stock', methods=['GET'])
+def get_warehouse_stock(warehouse_id):
+    """
+    Returns a page of the products stocked in a warehouse with their quantity there.
+
+    Query parameters:
+        page (int, optional): The page number, starting at 1. Defaults to 1.
+        per_page (int, optional): The page size, up to MAX_PER_PAGE. Defaults to 20.
+    """
+    warehouse = Warehouse.get_warehouse_by_id(warehouse_id)
+    if warehouse is None:
+        return jsonify({'error': 'Warehouse not found'}), 404
+
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE)
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+
+    pagination = warehouse.get_stock_page(page=page, per_page=per_page)
+    return jsonify({
+        'warehouse': warehouse.to_dict(),
+        'products': [{
+            'id': product.id,
+            'code': product.code,
+            'name': product.name,
+            'company_nit': product.company_nit,
+            'quantity': location.quantity,
+            'total_quantity': product.quantity
+        } for location, product in pagination.items],
+        'page': pagination.page,
+        'per_page': pagination.per_page,
+        'total': pagination.total,
+        'pages': pagination.pages
+    }), 200
+
+# Add or remove stock in a warehouse
+@warehouse_bp.route('/<int:warehouse_id>/adjust', methods=['POST'])
+def adjust_stock(warehouse_id):
+    """
+    Adds stock of a product to a warehouse, or removes it with a negative quantity.
+    The product's total quantity is updated in the same transaction.
+
+    Expected data fields:
+        - product_id: The product (required)
+        - quantity: The quantity to add; negative to remove (required, non-zero)
+
+    Returns:
+        JSON response with the product's stock per warehouse; 409 if the warehouse
+        does not hold enough stock.
+    """
+    data = request.get_json()
+    product_id = _integer_field(data or {}, 'product_id')
+    quantity = _integer_field(data or {}, 'quantity')
+    if product_id is None or not quantity:
+        return jsonify({'error': 'product_id and a non-zero integer quantity are required'}), 400
+
+    if Warehouse.get_warehouse_by_id(warehouse_id) is None:
+        return jsonify({'error': 'Warehouse not found'}), 404
+    product = Product.get_product_by_id(product_id)
+    if product is None:
+        return jsonify({'error': 'Product not found'}), 404
+
+    try:
+        StockLocation.adjust(product, warehouse_id, quantity)
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 409
+    return jsonify(_stock_response(product)), 200
+
+# Move stock between warehouses
+@warehouse_bp.route('/transfer', methods=['POST'])
+def transfer_stock():
+    """
+    Moves stock of a product from one warehouse to another in one transaction.
+
+    Expected data fields:
+        - product_id: The product (required)
+        - from_warehouse_id: The warehouse the stock leaves (required)
+        - to_warehouse_id: The warehouse the stock arrives at (required)
+        - quantity: The quantity to move (required, positive)
+
+    Returns:
+        JSON response with the product's stock per warehouse; 409 if the source
+        warehouse does not hold enough stock.
+    """
+    data = request.get_json() or {}
+    product_id = _integer_field(data, 'product_id')
+    from_id = _integer_field(data, 'from_warehouse_id')
+    to_id = _integer_field(data, 'to_warehouse_id')
+    quantity = _integer_field(data, 'quantity')
+    if None in (product_id, from_id, to_id, quantity) or quantity <= 0:
+        return jsonify({'error': 'product_id, from_warehouse_id, to_warehouse_id and a positive quantity are required'}), 400
+    if from_id == to_id:
+        return jsonify({'error': 'from_warehouse_id and to_warehouse_id must be different'}), 400
+
+    for warehouse_id in (from_id, to_id):
+        if Warehouse.get_warehouse_by_id(warehouse_id) is None:
+            return jsonify({'error': f'Warehouse {warehouse_id} not found'}), 404
+    product = Product.get_product_by_id(product_id)
+    if product is None:
+        return jsonify({'error': 'Product not found'}), 404
+
+    try:
+        StockLocation.transfer(product, from_id, to_id, quantity)
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 409
+    return jsonify(_stock_response(product)), 200
+
+# Get the stock of a product per warehouse
+@warehouse_bp.route('/products/<int:product_id>', methods=['GET'])
+def get_product_stock(product_id):
+    """
+    Returns the total quantity of a product and its quantity in each warehouse.
+    """
+    product = Product.get_product_by_id(product_id)
+    if product is None:
+        return jsonify({'error': 'Product not found'}), 404
+    return jsonify(_stock_response(product)), 200
+
+# Recompute the product totals
+@warehouse_bp.cli.command('rebuild-totals')
+def rebuild_totals_command():
+    """
+    Recompute the quantity of the products with stock locations (flask warehouses rebuild-totals).
+    """
+    click.echo(f'Updated {StockLocation.rebuild_totals()} products')
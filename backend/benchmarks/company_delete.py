@@ -0,0 +1,159 @@
+"""
+Benchmark for deleting a company with a large catalog.
+
+Compares three ways of deleting a company whose products are linked to
+categories and orders:
+
+    orm-cascade  The original behaviour: every product is loaded, its
+                 category/order links are loaded and removed, and the
+                 product is deleted row by row.
+    db-cascade   One DELETE of the company row, the database removes the
+                 products and links with ON DELETE CASCADE.
+    soft-delete  Company.delete_company: the company and its products are
+                 marked as deleted with one UPDATE.
+    batched      Company.delete_company_in_batches: products soft-deleted in
+                 committed batches, as done by background deletes.
+    purge        Company.delete_company followed by the purge job, which
+                 hard-deletes the rows in batches.
+
+Each scenario runs on a fresh SQLite file.
+
+Usage (from the backend directory):
+    python -m benchmarks.company_delete --products 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from app import create_app, db
+from app.category.models import Category
+from app.company.models import Company
+from app.order.models import Order
+from app.product.models import Product, order_product, product_category
+from app.soft_delete import purge_all
+
+NIT = 'BENCH-1'
+CHUNK = 10000
+
+
+def make_config(path):
+    """
+    Builds a configuration object pointing at a SQLite file.
+
+    Args:
+        path (str): The SQLite file to use.
+
+    Returns:
+        type: The configuration class.
+    """
+    class BenchmarkConfig:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    return BenchmarkConfig
+
+
+def seed(products):
+    """
+    Creates one company with `products` products, each linked to a category and an order.
+
+    Args:
+        products (int): The number of products to create.
+    """
+    db.session.add(Company(nit=NIT, name='Benchmark company'))
+    db.session.add(Category(id=1, name='Benchmark category', path='/1/'))
+    db.session.commit()
+    db.session.execute(db.insert(Order), [{'id': 1, 'order_date': date(2024, 1, 1)}])
+
+    for start in range(1, products + 1, CHUNK):
+        ids = range(start, min(start + CHUNK, products + 1))
+        db.session.execute(db.insert(Product), [{
+            'id': i, 'code': f'BENCH-{i}', 'name': f'Product {i}', 'price': 1.0,
+            'quantity': 1, 'company_nit': NIT
+        } for i in ids])
+        db.session.execute(product_category.insert(), [{'product_id': i, 'category_id': 1} for i in ids])
+        db.session.execute(order_product.insert(), [{'order_id': 1, 'product_id': i} for i in ids])
+    db.session.commit()
+
+
+def orm_cascade_delete():
+    """
+    Deletes the company the way the ORM cascade did before passive deletes.
+    """
+    company = db.session.get(Company, NIT)
+    for product in company.products:
+        product.categories.clear()
+        product.orders.clear()
+    db.session.flush()  # The link rows went first, one lazy load per product and collection
+    for product in company.products:
+        db.session.delete(product)
+    db.session.delete(company)
+    db.session.commit()
+
+
+def db_cascade_delete():
+    """
+    Deletes the company row and lets the database cascade to its products.
+    """
+    db.session.execute(db.delete(Company).where(Company.nit == NIT))
+    db.session.commit()
+
+
+def soft_delete_and_purge():
+    """
+    Soft-deletes the company and immediately runs the purge job.
+    """
+    Company.delete_company(NIT)
+    purge_all(datetime.utcnow() + timedelta(seconds=1))
+
+
+SCENARIOS = {
+    'orm-cascade': orm_cascade_delete,
+    'db-cascade': db_cascade_delete,
+    'soft-delete': lambda: Company.delete_company(NIT),
+    'batched': lambda: Company.delete_company_in_batches(NIT),
+    'purge': soft_delete_and_purge,
+}
+
+
+def run(name, products):
+    """
+    Seeds a fresh database and times one deletion scenario.
+
+    Args:
+        name (str): The scenario to run.
+        products (int): The size of the catalog.
+
+    Returns:
+        float: The deletion time in seconds.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(make_config(os.path.join(directory, 'bench.db')))
+        with app.app_context():
+            seed(products)
+            db.session.expunge_all()
+
+            started = time.perf_counter()
+            SCENARIOS[name]()
+            elapsed = time.perf_counter() - started
+
+            remaining = Product.query.filter_by(company_nit=NIT).count()
+            assert remaining == 0, f'{name} left {remaining} active products behind'
+            db.engine.dispose()
+        return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20000, help='Number of products in the catalog')
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='Scenario to run (default: all)')
+    args = parser.parse_args()
+
+    for name in args.scenario or SCENARIOS:
+        elapsed = run(name, args.products)
+        print(f'{name:12} {args.products:>8} products  {elapsed:8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Fan-out benchmark for the stock update stream.
+
+Starts the application on a threaded WSGI server, opens many concurrent
+connections to /api/stock/<nit>/stream from a single selector-driven client
+thread, then commits a series of quantity changes through the ORM. Each change
+goes through the after-commit hook and the broker to every subscriber.
+
+Reports, per event, the time until the first and the last subscriber received
+it, plus the memory used by the process.
+
+Usage (from the backend directory):
+    python -m benchmarks.stock_fanout --subscribers 1000 --events 50
+"""
+import argparse
+import json
+import os
+import re
+import resource
+import selectors
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.company.models import Company
+from app.product.models import Product
+from app.stock.broker import broker
+
+NIT = 'BENCH-1'
+EVENT = re.compile(rb'data: (\{.*?\})\n')
+
+
+def make_config(path):
+    """
+    Builds a configuration object pointing at a SQLite file.
+    """
+    class BenchmarkConfig:
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    return BenchmarkConfig
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """
+    Request handler that does not log every connection.
+    """
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Subscribers(threading.Thread):
+    """
+    Holds `count` SSE connections and records when each event reaches each one.
+    """
+
+    def __init__(self, port, count):
+        super().__init__(daemon=True)
+        self.selector = selectors.DefaultSelector()
+        self.received = {}  # quantity -> list of arrival times
+        self.lock = threading.Lock()
+        request = f'GET /api/stock/{NIT}/stream HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode()
+        for _ in range(count):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(request)
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, data=bytearray())
+        self.running = True
+
+    def run(self):
+        while self.running:
+            for key, _ in self.selector.select(timeout=0.1):
+                chunk = key.fileobj.recv(65536)
+                arrived = time.perf_counter()
+                if not chunk:
+                    self.selector.unregister(key.fileobj)
+                    continue
+                buffer = key.data
+                buffer.extend(chunk)
+                for match in EVENT.finditer(buffer):
+                    quantity = json.loads(match.group(1))['quantity']
+                    with self.lock:
+                        self.received.setdefault(quantity, []).append(arrived)
+                last = buffer.rfind(b'\n\n')
+                if last != -1:
+                    del buffer[:last + 2]
+
+    def close(self):
+        self.running = False
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at `fraction` (0-1) of the sorted values.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=1000, help='Concurrent SSE connections')
+    parser.add_argument('--events', type=int, default=50, help='Quantity changes to publish')
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between changes')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(make_config(os.path.join(directory, 'bench.db')))
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        with app.app_context():
+            db.session.add(Company(nit=NIT, name='Benchmark company'))
+            product = Product(code='BENCH-P', name='Product', price=1.0, quantity=0, company_nit=NIT)
+            db.session.add(product)
+            db.session.commit()
+
+            started = time.perf_counter()
+            subscribers = Subscribers(server.server_port, args.subscribers)
+            subscribers.start()
+            while broker.subscriber_count(NIT) < args.subscribers:
+                time.sleep(0.05)
+            print(f'{args.subscribers} subscribers connected in {time.perf_counter() - started:.2f} s')
+
+            sent = {}
+            for quantity in range(1, args.events + 1):
+                product.quantity = quantity
+                sent[quantity] = time.perf_counter()
+                db.session.commit()
+                time.sleep(args.interval)
+            time.sleep(1)
+
+        subscribers.close()
+        server.shutdown()
+
+    first, last, delivered = [], [], 0
+    for quantity, sent_at in sent.items():
+        arrivals = subscribers.received.get(quantity, [])
+        delivered += len(arrivals)
+        if arrivals:
+            first.append(min(arrivals) - sent_at)
+            last.append(max(arrivals) - sent_at)
+
+    expected = args.subscribers * args.events
+    print(f'delivered {delivered}/{expected} events')
+    if last:
+        print(f'first subscriber  p50 {statistics.median(first) * 1000:7.2f} ms')
+        print(f'last subscriber   p50 {statistics.median(last) * 1000:7.2f} ms   '
+              f'p99 {percentile(last, 0.99) * 1000:7.2f} ms   max {max(last) * 1000:7.2f} ms')
+    print(f'max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
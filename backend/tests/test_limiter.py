@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from app import create_app, db
+from app.async_api import AsyncAPI
+from app.throttling import storage as storage_module
+from app.throttling.storage import FakeRedis, MemoryStorage, RedisStorage, create_storage
+
+
+class LimitedConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    RATELIMIT_STORAGE_URL = 'fakeredis://'
+    RATELIMIT_BUDGETS = {'company_controller.get_all_companies': '2/minute'}
+    LOAD_SHED_ENABLED = False
+    COALESCE_ENABLED = False
+
+
+class Clock:
+    """
+    Stands in for the time module of the storages.
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(storage_module, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def app():
+    app = create_app(LimitedConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_fakeredis_url_creates_redis_storage():
+    storage = create_storage('fakeredis://')
+    assert isinstance(storage, RedisStorage)
+    assert isinstance(storage.client, FakeRedis)
+
+
+def test_fakeredis_storage_empties_and_refills_bucket(clock):
+    storage = create_storage('fakeredis://')
+    assert storage.take('client', rate=1, capacity=2) == (True, 1.0)
+    assert storage.take('client', rate=1, capacity=2) == (True, 0.0)
+    assert storage.take('client', rate=1, capacity=2) == (False, 0.0)
+    assert storage.take('other', rate=1, capacity=2) == (True, 1.0)
+
+    clock.now += 1.5
+    assert storage.take('client', rate=1, capacity=2) == (True, 0.5)
+    clock.now += 60
+    assert storage.take('client', rate=1, capacity=2) == (True, 1.0)
+
+
+def test_fakeredis_storage_matches_memory_storage(clock):
+    memory, redis = MemoryStorage(), create_storage('fakeredis://')
+    for step in (0, 0, 0, 0.2, 0.5, 0, 3, 0, 0):
+        clock.now += step
+        assert redis.take('client', rate=2, capacity=3) == memory.take('client', rate=2, capacity=3)
+
+
+def test_fakeredis_rejects_other_scripts():
+    with pytest.raises(ValueError):
+        FakeRedis().eval('return 1', 0)
+
+
+def test_unsupported_storage_url():
+    with pytest.raises(ValueError):
+        create_storage('memcached://localhost')
+
+
+def test_route_budget_returns_429_per_client(app):
+    client = app.test_client()
+    for remaining in ('1', '0'):
+        response = client.get('/api/companies/')
+        assert response.status_code != 429
+        assert response.headers['X-RateLimit-Limit'] == '2'
+        assert response.headers['X-RateLimit-Remaining'] == remaining
+
+    response = client.get('/api/companies/')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['error'] == 'Too many requests'
+
+    # Another client has a bucket of its own, and other routes use RATELIMIT_DEFAULT
+    assert client.get('/api/companies/', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code != 429
+    assert client.get('/api/products/').status_code != 429
+
+
+def test_async_reads_spend_the_flask_bucket(app):
+    client = app.test_client()
+    client.get('/api/companies/')
+    client.get('/api/companies/')
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': '/api/companies/', 'raw_path': b'/api/companies/', 'root_path': '',
+        'query_string': b'', 'headers': [], 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    asyncio.run(AsyncAPI(app)(scope, receive, send))
+
+    assert messages[0]['status'] == 429
+    headers = dict(messages[0]['headers'])
+    assert headers[b'x-ratelimit-remaining'] == b'0'
+    assert int(headers[b'retry-after']) >= 1
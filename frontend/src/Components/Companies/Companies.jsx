@@ -8,11 +8,13 @@ import {
   createCompany,
   updateCompany,
   deleteCompany,
+  fetchCompanyStats,
 } from './api/companiesApi';
 import './Companies.css';
 
 const Companies = () => {
   const [companies, setCompanies] = useState([]);
+  const [stats, setStats] = useState({});
   const [editingId, setEditingId] = useState(null);
   const navigate = useNavigate();
 
@@ -45,9 +47,19 @@ const Companies = () => {
     }
   }, []);
 
+  const loadStats = useCallback(async () => {
+    try {
+      const data = await fetchCompanyStats();
+      setStats(Object.fromEntries(data.map((item) => [item.nit, item])));
+    } catch (error) {
+      console.error('Error loading company stats:', error);
+    }
+  }, []);
+
   useEffect(() => {
     loadCompanies();
-  }, [loadCompanies]);
+    loadStats();
+  }, [loadCompanies, loadStats]);
 
   const addOrUpdateCompany = async (company) => {
     try {
@@ -61,6 +73,7 @@ const Companies = () => {
         const newCompany = await createCompany(company);
         setCompanies((prev) => [...prev, newCompany]);
       }
+      loadStats();
     } catch (error) {
       console.error('Error saving company:', error);
     }
@@ -99,6 +112,7 @@ const Companies = () => {
         />
         <CompaniesGrid
           companies={companies}
+          stats={stats}
           onDelete={deleteCompanyHandler}
           onEdit={editCompanyHandler}
         />
@@ -1,13 +1,14 @@
 import React from 'react';
 import CompanyItem from './CompanyItem';
 
-const CompaniesGrid = ({ companies, onDelete, onEdit }) => {
+const CompaniesGrid = ({ companies, stats, onDelete, onEdit }) => {
   return (
     <div className="companies-row">
       {companies.map((company) => (
         <CompanyItem
           key={company.nit}
           company={company}
+          stats={stats[company.nit]}
           onDelete={onDelete}
           onEdit={onEdit}
         />
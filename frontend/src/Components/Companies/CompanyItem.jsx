@@ -1,12 +1,18 @@
 import React from 'react';
 
-const CompanyItem = ({ company, onDelete, onEdit }) => {
+const CompanyItem = ({ company, stats, onDelete, onEdit }) => {
   return (
     <div className="company-item">
       <h2>{company.name}</h2>
       <p><strong>NIT:</strong> {company.nit}</p>
       <p><strong>Address:</strong> {company.address}</p>
       <p><strong>Phone:</strong> {company.phone}</p>
+      {stats && (
+        <>
+          <p><strong>Products:</strong> {stats.product_count}</p>
+          <p><strong>Stock value:</strong> {stats.total_value}</p>
+        </>
+      )}
       <div className="company-header">
         <button onClick={() => onEdit(company.nit)}>✏️</button>
         <button onClick={() => onDelete(company.nit)}>🗑️</button>
@@ -1,4 +1,5 @@
 const BASE_URL = "http://127.0.0.1:5000/api/companies/";
+const STATS_URL = "http://127.0.0.1:5000/api/stats/companies";
 
 const getAuthHeaders = () => {
   const token = localStorage.getItem("jwt");
@@ -65,3 +66,11 @@ export const fetchActiveCompanies = async () => {
   if (!response.ok) throw new Error("Error fetching active companies");
   return response.json();
 };
+
+export const fetchCompanyStats = async () => {
+  const response = await fetch(STATS_URL, {
+    headers: getAuthHeaders(),
+  });
+  if (!response.ok) throw new Error("Error fetching company stats");
+  return response.json();
+};
@@ -8,6 +8,26 @@ import { jwtDecode } from "jwt-decode";
 const BASE_URL = 'http://127.0.0.1:5000/api/products/';
 const COMPANIES_URL = 'http://127.0.0.1:5000/api/companies/';
 const EMAIL_URL = 'http://127.0.0.1:5000/api/email/';
+const STOCK_URL = 'http://127.0.0.1:5000/api/stock/';
+
+// Milliseconds between checks of a background email job
+const EMAIL_POLL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Polls an email job until every recipient has a result
+const waitForEmailJob = async (jobId) => {
+  while (true) {
+    const response = await fetch(`${EMAIL_URL}jobs/${jobId}`, {
+      method: 'GET',
+      headers: getAuthHeaders(),
+    });
+    if (!response.ok) throw new Error('Error checking email job');
+    const job = await response.json();
+    if (job.status === 'completed' || job.status === 'failed') return job;
+    await sleep(EMAIL_POLL_MS);
+  }
+};
 
 const getAuthHeaders = () => {
   const token = localStorage.getItem('jwt');
@@ -60,6 +80,11 @@ const InventoryView = () => {
         method: 'GET',
         headers: getAuthHeaders(),
       });
+      // No products, or the company was deleted
+      if (response.status === 404) {
+        setProducts([]);
+        return;
+      }
       if (!response.ok) throw new Error('Error fetching products');
       const data = await response.json();
       setProducts(data);
@@ -68,6 +93,31 @@ const InventoryView = () => {
     }
   };
 
+  // Recibe en vivo los cambios de cantidad y precio de la empresa seleccionada
+  useEffect(() => {
+    if (!selectedCompany) return undefined;
+
+    const source = new EventSource(`${STOCK_URL}${selectedCompany}/stream`);
+    source.addEventListener('stock', (event) => {
+      const change = JSON.parse(event.data);
+      // New products and bulk changes (imports, company deletes) reload the list
+      if (change.operation === 'create' || change.operation === 'refresh') {
+        fetchProducts(selectedCompany);
+        return;
+      }
+      setProducts((current) =>
+        change.operation === 'delete'
+          ? current.filter((product) => product.id !== change.product_id)
+          : current.map((product) =>
+              product.id === change.product_id
+                ? { ...product, quantity: change.quantity, price: change.price }
+                : product
+            )
+      );
+    });
+    return () => source.close();
+  }, [selectedCompany]);
+
   const fetchCompanies = async () => {
     try {
       const response = await fetch(COMPANIES_URL, {
@@ -144,7 +194,19 @@ const InventoryView = () => {
       });
 
       if (!response.ok) throw new Error('Error sending email');
-      alert('Email sent successfully!');
+      const job = await waitForEmailJob((await response.json()).id);
+
+      // Report each recipient the email could not be sent to
+      const failures = job.results
+        .filter((result) => result.status === 'failed')
+        .map((result) => `${result.email}: ${result.error}`);
+      if (failures.length === 0) {
+        alert('Email sent successfully!');
+      } else if (job.sent > 0) {
+        alert(`Email sent to ${job.sent} of ${job.results.length} recipients. Failed:\n${failures.join('\n')}`);
+      } else {
+        alert(`Failed to send email.\n${failures.join('\n')}`);
+      }
     } catch (error) {
       console.error('Error sending email:', error);
       alert('Failed to send email.');